@@ -0,0 +1,106 @@
+"""제목 자동 완성 속도: 제목 수가 많을 때 입력 한 글자마다 걸리는 시간
+
+사용법: python benchmarks/bench_autocomplete.py [제목 수]
+무작위 한글/영문 제목으로 TitleIndex를 만들고, 제목을 한 낱자씩 입력하는 것처럼 접두어를 조회한다.
+결과가 전체를 훑어 고른 것과 같은지도 확인한다.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system.autocomplete import TitleIndex, to_choseong, to_jamo
+
+
+def make_title(rng: random.Random) -> str:
+    syllables = "가나다라마바사아자차카타파하한글위키문서편집역사검색도움말대문틀분류사용자토론"
+    words = ["OpenWiki", "wiki", "guide", "help", "list"]
+    parts = []
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.8:
+            parts.append("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))))
+        else:
+            parts.append(rng.choice(words))
+    return " ".join(parts)
+
+
+def brute_force(documents: dict, query: str) -> list:
+    """전체 문서를 훑어 검색어에 맞는 문서를 점수 순으로"""
+    prefix = to_jamo(query)
+    matches = [doc_id for doc_id, info in documents.items()
+               if any(key.startswith(prefix) for key in TitleIndex.document_keys(doc_id, info["title"]))]
+    matches.sort(key=lambda doc_id: TitleIndex.scores(documents[doc_id])["popular"], reverse=True)
+    return matches
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    rng = random.Random(1)
+    documents = {}
+    while len(documents) < count:
+        title = make_title(rng)
+        namespace = rng.choice(["", "", "", "도움말/", "사용자/"])
+        documents[namespace + title] = {
+            "title": title,
+            "revision_count": rng.randint(1, 500),
+            "last_modified": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00",
+        }
+
+    index = TitleIndex()
+    start = time.perf_counter()
+    index.reset(documents)
+    print(f"{count} titles, {len(index.keys)} keys, built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    # 실제 제목을 낱자 단위로 입력하는 순서 ("한" -> "ㅎ", "하", "한")
+    samples = rng.sample(sorted(documents), 200)
+    keystrokes = []
+    for doc_id in samples:
+        title = documents[doc_id]["title"]
+        typed = ""
+        for char in title:
+            jamo = to_jamo(char)
+            for length in range(1, len(jamo) + 1):
+                keystrokes.append(typed + jamo[:length])
+            typed += char
+        keystrokes.append(to_choseong(title)[:2])
+
+    for label in ("cold", "warm"):
+        timings = []
+        for query in keystrokes:
+            start = time.perf_counter()
+            index.suggest(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{label}: {len(timings)} lookups, median {timings[len(timings) // 2]:.3f} ms, "
+              f"p99 {timings[int(len(timings) * 0.99)]:.3f} ms, max {timings[-1]:.3f} ms")
+
+    # 편집(점수 변경)과 새 문서를 반영한 뒤에도 캐시가 맞는지 확인
+    start = time.perf_counter()
+    for number, doc_id in enumerate(rng.sample(sorted(documents), 1000)):
+        documents[doc_id]["revision_count"] += rng.randint(1, 50)
+        documents[doc_id]["last_modified"] = f"2027-01-01T00:{number // 60:02d}:{number % 60:02d}"
+        index.update(doc_id, documents[doc_id])
+        new_id = f"새 문서 {number}"
+        documents[new_id] = {"title": new_id, "revision_count": 1, "last_modified": "2027-02-01T00:00:00"}
+        index.update(new_id, documents[new_id])
+    print(f"2000 updates in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    mismatches = 0
+    for query in ["ㅎ", "한", "ㅇ", "위키", "ㅎㄱ", "o", "open", "새", "도움말/"] + keystrokes[:300:7]:
+        got = [entry["id"] for entry in index.suggest(query, limit=10)]
+        expected = brute_force(documents, query)
+        scores = lambda ids: sorted(TitleIndex.scores(documents[doc_id])["popular"] for doc_id in ids)
+        exact = [doc_id for doc_id in expected if to_jamo(documents[doc_id]["title"]) == to_jamo(query)]
+        if exact:
+            continue  # 제목이 똑같은 문서는 점수와 상관없이 앞에 온다
+        if scores(got) != scores(expected[:10]):
+            print(f"Warning: suggestions for {query!r} differ from a full scan")
+            mismatches += 1
+    if not mismatches:
+        print("suggestions match a full scan")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""리비전 저장 방식 비교: 텍스트 레코드 vs 압축 프레임(codec="zlib")
+
+사용법: python benchmarks/bench_codec.py [리비전 수] [문서 줄 수]
+긴 이력을 가진 문서를 만들어 파일 크기, 전체 이력 읽기, 현재 내용만 읽기, 이력 목록(메타데이터)만 읽는 시간을 잰다.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system.document import Document
+
+
+def build_document(revisions: int, line_count: int) -> Document:
+    """DocumentManager가 저장하는 것과 같은 방식(체크포인트 포함)으로 긴 이력을 만든다"""
+    rng = random.Random(1)
+    words = ["위키", "문서", "편집", "리비전", "OpenWiki", "링크", "틀", "검색", "example", "내용"]
+    lines = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 12))) for _ in range(line_count)]
+    doc = Document("bench")
+    doc.add_content("\n".join(lines), "user0", "127.0.0.1")
+    previous = list(lines)
+    for number in range(revisions - 1):
+        action = rng.random()
+        if action < 0.1:
+            # 되돌리기: 바로 전 판으로
+            lines, previous = previous, lines
+        else:
+            previous = list(lines)
+            for _ in range(rng.randint(1, 3)):
+                position = rng.randrange(len(lines))
+                if action < 0.7:
+                    lines[position] = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+                elif action < 0.85:
+                    lines.insert(position, " ".join(rng.choice(words) for _ in range(rng.randint(3, 12))))
+                elif len(lines) > 10:
+                    del lines[position]
+        doc.update_content("\n".join(lines), f"user{number % 7}", "127.0.0.1")
+        if doc.needs_checkpoint():
+            doc.add_checkpoint()
+    return doc
+
+
+def timed(function, repeat: int = 3) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    revisions = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    line_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    doc = build_document(revisions, line_count)
+    directory = tempfile.mkdtemp(prefix="openwiki-codec-")
+    print(f"document: {revisions} revisions, {line_count} lines, {len(doc.checkpoints)} checkpoints")
+    results = {}
+    for codec_name in (None, "zlib"):
+        path = os.path.join(directory, f"{codec_name or 'text'}.opwi")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(doc.to_opwi(codec_name))
+        loaded = Document.load(path)
+        if loaded.content != doc.content or loaded.revision_count != doc.revision_count:
+            print(f"Warning: {codec_name or 'text'} did not round trip")
+        results[codec_name] = (
+            os.path.getsize(path),
+            timed(lambda: Document.load(path)),
+            timed(lambda: Document.load(path, history=False)),
+            timed(lambda: sum(1 for _ in Document.iter_revisions(path))),
+        )
+        os.remove(path)
+    os.rmdir(directory)
+
+    for codec_name, (size, full, tail, metadata) in results.items():
+        print(f"{codec_name or 'text':5s} {size / 1024:9.1f} KB | full load {full:7.1f} ms | "
+              f"current only {tail:6.1f} ms | revision list {metadata:6.1f} ms")
+    text, compressed = results[None], results["zlib"]
+    print(f"size {text[0] / compressed[0]:.1f}x smaller, full load {text[1] / compressed[1]:.1f}x, "
+          f"revision list {text[3] / compressed[3]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""리비전 diff 속도 비교: 예전 difflib.Differ 기반 diff_lines vs rev_system.diff
+
+사용법: python benchmarks/bench_diff.py [줄 수] [반복 횟수]
+비슷한 줄이 많은 문서에서 Differ는 몇 분씩 걸리므로 LEGACY_TIMEOUT 초가 지나면 중단하고 "> N s"로 표시한다.
+"""
+import difflib
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system import diff
+
+LEGACY_TIMEOUT = 60
+
+
+def legacy_diff_lines(old_text: str, new_text: str):
+    """예전 Document.diff_lines 그대로 (비교용)"""
+    old_lines = old_text.splitlines()
+    new_lines = new_text.splitlines()
+    differ = difflib.Differ()
+    diff_result = list(differ.compare(old_lines, new_lines))
+
+    changes = []
+    for i, line in enumerate(diff_result):
+        if line.startswith("+ "):
+            changes.append({f"+{i}|{len(line[2:])}": line[2:]})
+        elif line.startswith("- "):
+            changes.append({f"-{i}|{len(line[2:])}": line[2:]})
+    return changes
+
+
+def make_page(line_count: int, rng: random.Random, distinct: int) -> list:
+    """distinct 가 작을수록 비슷한(같은) 줄이 많은 문서"""
+    words = ["위키", "문서", "편집", "리비전", "OpenWiki", "링크", "틀", "검색", "example", "-----", ""]
+    pool = [" ".join(rng.choice(words) for _ in range(rng.randint(0, 8))) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(line_count)]
+
+
+def edit_page(lines: list, rng: random.Random, edits: int) -> list:
+    lines = list(lines)
+    for _ in range(edits):
+        position = rng.randrange(len(lines) + 1)
+        action = rng.random()
+        if action < 0.4 and position < len(lines):
+            lines[position] = lines[position] + " (수정)"
+        elif action < 0.7:
+            lines[position:position] = [f"새 줄 {rng.random()}"]
+        else:
+            del lines[position:position + rng.randint(1, 5)]
+    return lines
+
+
+def measure(function, old_text: str, new_text: str, repeat: int) -> float:
+    """한 번 비교하는 데 걸린 평균 시간(ms)"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(old_text, new_text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def _measure_worker(function, old_text: str, new_text: str, repeat: int, results):
+    results.put(measure(function, old_text, new_text, repeat))
+
+
+def measure_with_limit(function, old_text: str, new_text: str, repeat: int, timeout: float):
+    """별도 프로세스에서 측정하고, timeout 안에 끝나지 않으면 None"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure_worker, args=(function, old_text, new_text, repeat, results))
+    process.start()
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+        return None
+    return results.get()
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    rng = random.Random(1)
+    scenarios = [
+        ("few edits, mostly unique lines", line_count * 2, 20),
+        ("few edits, many similar lines", 50, 20),
+        ("many edits, many similar lines", 50, line_count // 20),
+    ]
+    print(f"page: {line_count} lines, {repeat} runs each")
+    for name, distinct, edits in scenarios:
+        old_lines = make_page(line_count, rng, distinct)
+        old_text = "\n".join(old_lines)
+        new_text = "\n".join(edit_page(old_lines, rng, edits))
+
+        changes = diff.diff(old_text, new_text)
+        if diff.apply(old_text, changes) != new_text:
+            print(f"Warning: round trip failed for {name}")
+        legacy = measure_with_limit(legacy_diff_lines, old_text, new_text, repeat, LEGACY_TIMEOUT)
+        current = measure(diff.diff, old_text, new_text, repeat)
+        if legacy is None:
+            legacy_text, speedup = f"> {LEGACY_TIMEOUT} s", f"> {LEGACY_TIMEOUT * 1000 / current:.0f}x"
+        else:
+            legacy_text, speedup = f"{legacy:.1f} ms", f"{legacy / current:.1f}x"
+        print(f"{name:32s} Differ {legacy_text:>10s} | diff {current:7.1f} ms ({speedup}), {len(changes)} ops")
+
+
+if __name__ == "__main__":
+    main()
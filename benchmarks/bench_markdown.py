@@ -0,0 +1,95 @@
+"""Markdown 렌더링 캐시(opwiparser.markdown_cache) 속도와 결과 확인
+
+사용법: python benchmarks/bench_markdown.py [섹션 수] [무작위 검사 수]
+  markdown.markdown: 캐시 없이 문서 전체를 렌더링
+  cold: 빈 캐시로 렌더링 (블록으로 나누고 해시하는 비용 포함, Markdown 객체를 만드는 시간 제외)
+  warm: 같은 문서를 다시 렌더링 (메모리 캐시)
+  one block edited: 한 문단만 고친 문서를 렌더링
+  disk: 새 프로세스처럼 메모리 캐시가 빈 상태에서 디스크 캐시로 렌더링
+무작위로 조합한 문서를 블록으로 나눠 렌더링한 결과가 문서 전체를 렌더링한 결과와 같은지도 확인한다.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+import markdown
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from opwiparser.markdown_cache import MarkdownCache
+
+PIECES = ["문단 *강조* 내용", "다른 **굵은** 줄", "# 제목", "## 소제목", "* 항목", "- 항목", "1. 하나", "2. 둘",
+          "    코드", "\t탭 코드", "> 인용", "   * 들여쓴 항목", "---", "제목\n====", "  두 칸", "[[위키 링크]]",
+          "* a\n* b", "1. x\n    이어짐", "> q\n게으른 줄", "문단\n* 목록?", "    ", "\t", "줄\r\n바꿈", "```",
+          "[참조]: http://example.com", "<div>", "10. 열", "문단\n    게으른 코드"]
+
+
+def build_document(sections: int, rng: random.Random) -> str:
+    words = ["위키", "문서", "편집", "리비전", "OpenWiki", "링크", "틀", "검색", "example", "내용"]
+    parts = []
+    for number in range(sections):
+        parts.append(f"## 섹션 {number}")
+        for _ in range(rng.randint(1, 4)):
+            parts.append(" ".join(rng.choice(words) for _ in range(rng.randint(10, 40))))
+        parts.append("\n".join(f"* {rng.choice(words)} {rng.choice(words)}" for _ in range(rng.randint(2, 6))))
+    return "\n\n".join(parts)
+
+
+def timed(function, repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def check(runs: int):
+    rng = random.Random(0)
+    cache = MarkdownCache()
+    for run in range(runs):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            parts.append(rng.choice(PIECES))
+            parts.append(rng.choice(["\n", "\n\n", "\n\n\n", "\n \n"]))
+        text = "".join(parts)
+        if cache.render(text) != markdown.markdown(text):
+            print(f"Warning: rendered HTML differs (run {run}): {text!r}")
+            sys.exit(1)
+    print(f"{runs} documents ok, {cache.stats()}")
+
+
+def main():
+    sections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    check(runs)
+
+    rng = random.Random(1)
+    text = build_document(sections, rng)
+    position = text.index("섹션 1\n\n") + len("섹션 1\n\n")
+    edited = text[:position] + "고친 " + text[position:]
+    directory = tempfile.mkdtemp(prefix="openwiki-markdown-")
+    db_path = os.path.join(directory, "markdown.db")
+
+    print(f"{sections} sections, {len(text)} chars")
+    print(f"  markdown.markdown  {timed(lambda: markdown.markdown(text)):8.2f} ms")
+    # markdown.markdown은 부를 때마다 Markdown 객체를 새로 만들지만 캐시는 하나를 다시 쓰므로, 만드는 시간은 빼고 잰다
+    fresh = [MarkdownCache() for _ in range(5)]
+    print(f"  cold               {timed(lambda: fresh.pop().render(text)):8.2f} ms")
+    cache = MarkdownCache(db_path)
+    cache.render(text)
+    print(f"  warm               {timed(lambda: cache.render(text)):8.2f} ms")
+    print(f"  one block edited   {timed(lambda: cache.render(edited), repeat=1):8.2f} ms")
+    cache.close()
+    print(f"  disk               {timed(lambda: MarkdownCache(db_path).render(text)):8.2f} ms")
+
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
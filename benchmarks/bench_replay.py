@@ -0,0 +1,93 @@
+"""리비전 재생 속도: 이력 길이에 따른 내용 재구성 시간
+
+사용법: python benchmarks/bench_replay.py [문서 줄 수] [최대 리비전 수]
+체크포인트 없이 리비전만 있는 문서를 처음부터 재생하는 시간을 잰다.
+  split/join: 예전처럼 리비전마다 내용 전체를 줄로 나누고 다시 합치는 방식 (diff.apply)
+  LineBuffer: rev_system.replay의 줄 목록을 그 자리에서 고치고 마지막에 한 번 합치는 방식
+  Document.load: 파일에서 읽기(JSON 해석, 체크섬 확인 포함)까지 한 전체 시간
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system import diff, replay
+from rev_system.document import Document
+
+
+def build_history(line_count: int, revisions: int) -> list:
+    """revisions개의 내용 목록. 리비전마다 몇 줄을 고치거나 넣거나 지운다"""
+    rng = random.Random(1)
+    words = ["위키", "문서", "편집", "리비전", "OpenWiki", "링크", "틀", "검색", "example", "내용"]
+    lines = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 12))) for _ in range(line_count)]
+    texts = ["\n".join(lines)]
+    for _ in range(revisions - 1):
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(lines))
+            action = rng.random()
+            if action < 0.6:
+                lines[position] = " ".join(rng.choice(words) for _ in range(rng.randint(3, 12)))
+            elif action < 0.8 or len(lines) < line_count // 2:
+                lines.insert(position, " ".join(rng.choice(words) for _ in range(rng.randint(3, 12))))
+            else:
+                del lines[position]
+        texts.append("\n".join(lines))
+    return texts
+
+
+def timed(function, repeat: int = 3) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def replay_split_join(history: list) -> str:
+    text = ""
+    for changes in history:
+        text = diff.apply(text, changes)
+    return text
+
+
+def replay_buffer(history: list) -> str:
+    buffer = replay.LineBuffer()
+    for changes in history:
+        buffer.apply(changes)
+    return buffer.text
+
+
+def main():
+    line_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    max_revisions = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    lengths = [length for length in (100, 500, 1000, 2000, 5000, 10000, 20000) if length <= max_revisions]
+    texts = build_history(line_count, lengths[-1])
+    history = [diff.diff("", texts[0])] + [diff.diff(old, new) for old, new in zip(texts, texts[1:])]
+    directory = tempfile.mkdtemp(prefix="openwiki-replay-")
+    print(f"page: {line_count} lines, no checkpoints")
+    for length in lengths:
+        doc = Document("bench")
+        for number, changes in enumerate(history[:length]):
+            doc.revisions.append({"username": f"user{number % 7}", "ip_address": "127.0.0.1",
+                                  "timestamp": None, "changes": changes})
+        path = os.path.join(directory, f"{length}.opwi")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(doc.to_opwi())
+        if replay_buffer(history[:length]) != texts[length - 1] or Document.load(path).content != texts[length - 1]:
+            print(f"Warning: replay of {length} revisions differs")
+        split_join = timed(lambda: replay_split_join(history[:length]))
+        buffer = timed(lambda: replay_buffer(history[:length]))
+        load = timed(lambda: Document.load(path))
+        print(f"{length:6d} revisions | split/join {split_join:8.1f} ms | LineBuffer {buffer:7.1f} ms "
+              f"({split_join / buffer:4.1f}x, {buffer * 1000 / length:5.1f} us/rev) | Document.load {load:8.1f} ms")
+        os.remove(path)
+    os.rmdir(directory)
+
+
+if __name__ == "__main__":
+    main()
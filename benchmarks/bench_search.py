@@ -0,0 +1,76 @@
+"""전문 검색 색인(rev_system.search_index) 속도: 문서 수가 많을 때 검색어 하나에 걸리는 시간
+
+사용법: python benchmarks/bench_search.py [문서 수] [문서당 단어 수] [--keep 색인.db]
+합성 위키(benchmarks/wikigen.py)와 같은 단어로 문서를 만들어 색인하고, 검색어 종류별로 시간을 잰다.
+  no hit: 색인에 없는 단어 / common: 거의 모든 문서에 있는 단어 / two words: 흔한 두 단어
+  one syllable: 한 글자 한글 / title substring: 단어 중간의 제목 부분 문자열 ("enwik" -> "OpenWiki")
+--keep: 만든 색인을 이 파일에 남기고, 파일이 이미 있으면 다시 만들지 않고 쓴다.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import wikigen
+from rev_system.search_index import SearchIndex
+
+QUERIES = [
+    ("no hit", "없는말"),
+    ("common", "wiki"),
+    ("two words", "page edit"),
+    ("hangul word", "리비전"),
+    ("one syllable", "위"),
+    ("title substring", "enwik"),
+    ("page 5", "문서"),
+]
+
+
+def build(path: str, count: int, words: int):
+    rng = random.Random(0)
+    vocabulary = wikigen.HANGUL_WORDS + wikigen.ASCII_WORDS
+    index = SearchIndex(path)
+    started = time.perf_counter()
+    for number in range(count):
+        title = f"{rng.choice(vocabulary)} {rng.choice(vocabulary)} {number}"
+        content = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(words // 2, words * 3 // 2)))
+        index.update(f"doc{number}", title, content)
+    print(f"{count} documents indexed in {time.perf_counter() - started:.1f}s")
+    return index
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="search index benchmark")
+    arg_parser.add_argument("documents", type=int, nargs="?", default=100000)
+    arg_parser.add_argument("words", type=int, nargs="?", default=300, help="문서당 평균 단어 수")
+    arg_parser.add_argument("--keep", help="색인을 남길 파일 (있으면 다시 만들지 않는다)")
+    args = arg_parser.parse_args()
+    directory = None
+    if args.keep:
+        path = os.path.abspath(args.keep)
+        index = SearchIndex(path) if os.path.exists(path) else build(path, args.documents, args.words)
+    else:
+        directory = tempfile.mkdtemp(prefix="openwiki-search-")
+        index = build(os.path.join(directory, "search.db"), args.documents, args.words)
+
+    for name, query in QUERIES:
+        page = 5 if name == "page 5" else 1
+        durations = []
+        for _ in range(20):
+            started = time.perf_counter()
+            total, results = index.search(query, page=page)
+            durations.append((time.perf_counter() - started) * 1000)
+        print(f"  {name:16} {query!r:10} {statistics.median(durations):9.2f} ms median  "
+              f"{max(durations):9.2f} ms max  total {total}, {len(results)} shown")
+    index.close()
+    if directory is not None:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""위키 문법 처리 속도 비교: 예전 줄 단위 정규식(parseline) vs 한 번에 훑는 토크나이저
+
+사용법: python benchmarks/bench_tokenizer.py [문서 크기(KB)] [반복 횟수]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from opwiparser import tokenizer
+
+
+def legacy_parseline(text: str) -> str:
+    """예전 opwiparser.parser.parseline 그대로 (비교용)"""
+    redirect_pattern = r"\[\[redirect:(.+?)\]\]"
+    if match := re.search(redirect_pattern, text):
+        rep = f'<meta http-equiv="refresh" content="0;url=/doc/{match.group(1)}">'
+        text = re.sub(redirect_pattern, rep, text)
+
+    link_pattern = r"\[\[(.+?)\]\]"
+    if match := re.search(link_pattern, text):
+        rep = f'<a class="doclink" href="/doc/{match.group(1)}">{match.group(1)}</a>'
+        text = re.sub(link_pattern, rep, text)
+
+    template_pattern = r"\{template:(.+?)\}"
+    if match := re.search(template_pattern, text):
+        file_path = match.group(1)
+        try:
+            with open(file_path, "r", encoding="utf-8") as template_file:
+                rep = template_file.read()
+                text = re.sub(template_pattern, rep, text)
+        except FileNotFoundError:
+            text = re.sub(template_pattern, f"[Error: {file_path} not found]", text)
+
+    return text
+
+
+def legacy_parse(text: str) -> str:
+    return "\n".join(legacy_parseline(line) for line in text.split("\n"))
+
+
+def tokenizer_parse(text: str) -> str:
+    return tokenizer.render(tokenizer.tokenize(text))
+
+
+def make_document(size_kb: int, seed: int = 1) -> str:
+    """링크가 섞인 위키 문서를 만든다 (한 줄에 링크는 최대 하나: 예전 구현과 결과가 같도록)"""
+    rng = random.Random(seed)
+    words = ["위키", "문서", "편집", "리비전", "OpenWiki", "링크", "틀", "검색", "가나다", "example"]
+    lines = []
+    size = 0
+    while size < size_kb * 1024:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(5, 20)))
+        if rng.random() < 0.3:
+            line += f" [[{rng.choice(words)}{rng.randint(1, 100)}]]"
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return "\n".join(lines)
+
+
+def measure(function, text: str, repeat: int) -> float:
+    """MB/s"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(text)
+    elapsed = time.perf_counter() - start
+    return len(text.encode("utf-8")) * repeat / elapsed / (1024 * 1024)
+
+
+def main():
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    text = make_document(size_kb)
+
+    if legacy_parse(text) != tokenizer_parse(text):
+        print("Warning: legacy and tokenizer output differ")
+
+    legacy = measure(legacy_parse, text, repeat)
+    current = measure(tokenizer_parse, text, repeat)
+    tokenize_only = measure(tokenizer.tokenize, text, repeat)
+    print(f"document: {size_kb} KB x {repeat}")
+    print(f"legacy parseline : {legacy:8.2f} MB/s")
+    print(f"tokenizer+render : {current:8.2f} MB/s ({current / legacy:.1f}x)")
+    print(f"tokenize only    : {tokenize_only:8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""OpenWiki 전체 벤치마크: 합성 위키(benchmarks/wikigen.py)를 만들어 주요 작업의 시간을 잰다
+
+사용법: python benchmarks/bench_wiki.py [wikigen.py 옵션] [--repeat 3] [--samples 50] [--workers N]
+                                       [--output 결과.json] [--compare 기준.json] [--threshold 1.25]
+                                       [--memory] [--keep 폴더]
+
+  load_index_cold: 빈 인덱스로 DocumentManager 만들기 (pages 폴더를 모두 읽는다)
+  load_index: 인덱스가 있을 때 DocumentManager.load_index()
+  convert_wiki_docs: 출력과 Markdown 캐시가 없는 상태에서 전체 변환
+  convert_wiki_docs_force: Markdown 캐시가 있는 상태에서 build_all(force=True)
+  convert_wiki_docs_incremental: 바뀐 문서가 없을 때 build_all()
+  update_document: 문서 하나 고치기 (파일 쓰기, 인덱스, 검색 색인 포함)
+  get_document: 캐시에 없는 문서를 전체 이력과 함께 읽기 / get_document_cached: 캐시에 있는 문서
+  search, doc: Flask 테스트 클라이언트로 /search, /doc 요청
+항목마다 호출별 시간의 중앙값, 평균, p95, 최소, 최대(ms)를 출력한다.
+
+--output: 결과와 옵션, 환경을 JSON으로 저장한다. --compare: 예전 결과와 중앙값을 비교해
+threshold배보다 (그리고 0.5ms보다) 더 느려진 항목을 알리고 종료 코드 1로 끝낸다.
+--memory: 항목마다 tracemalloc으로 Python 메모리의 최대 사용량(peak_kib)을 잰다. 재는 동안은 느려지므로
+이 모드의 시간은 다른 결과와 비교하지 않는다.
+Flask 항목은 OPENWIKI_ROOT를 합성 위키 폴더로 정한 뒤 main.py를 불러오므로 저장소의 파일은 건드리지 않는다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from urllib.parse import quote
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import wikigen
+from opwiparser import parser
+from opwiparser.builder import WikiBuilder
+from opwiparser.markdown_cache import MarkdownCache
+from opwiparser.render_queue import RenderQueue
+from rev_system.cache import DocumentCache
+from rev_system.document import DocumentManager
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULT_VERSION = 1
+# 이보다 작은 차이는 측정 잡음으로 보고 느려졌다고 하지 않는다 (ms)
+NOISE_MS = 0.5
+
+
+class Suite:
+    def __init__(self, memory: bool):
+        self.memory = memory
+        self.results = {}
+
+    def run(self, name: str, function, times: int = 1, setup=None):
+        """function(i)를 times번 부르고 각 호출 시간을 기록. setup(i)는 재지 않는다"""
+        durations = []
+        peak = 0
+        for i in range(times):
+            if setup is not None:
+                setup(i)
+            if self.memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            function(i)
+            durations.append((time.perf_counter() - started) * 1000)
+            if self.memory:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+        durations.sort()
+        result = {
+            "count": len(durations),
+            "median_ms": statistics.median(durations),
+            "mean_ms": statistics.fmean(durations),
+            "p95_ms": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+            "min_ms": durations[0],
+            "max_ms": durations[-1],
+        }
+        if self.memory:
+            result["peak_kib"] = peak // 1024
+        self.results[name] = result
+        line = (f"  {name:32} {result['median_ms']:10.2f} ms median  {result['p95_ms']:10.2f} ms p95  "
+                f"({result['count']}x)")
+        if self.memory:
+            line += f"  {result['peak_kib']:8d} KiB peak"
+        print(line)
+
+
+def remove(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# 결과를 비교할 때 같아야 하는 옵션
+COMPARABLE_OPTIONS = ("pages", "page_size", "revisions", "namespaces", "hangul", "links", "templates", "seed",
+                      "samples", "workers", "memory")
+
+
+def compare(results: dict, options: dict, baseline_path: str, threshold: float) -> bool:
+    """예전 결과와 중앙값 비교를 출력. 느려진 항목이 있으면 True"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    different = [name for name in COMPARABLE_OPTIONS if baseline["options"].get(name) != options.get(name)]
+    if different:
+        print(f"Warning: options differ from the baseline: {', '.join(different)}")
+    baseline = baseline["results"]
+    regressed = False
+    print(f"compared with {baseline_path} (median, threshold {threshold:.2f}x)")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"  {name:32} (new)")
+            continue
+        ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("inf")
+        slower = ratio > threshold and result["median_ms"] - before["median_ms"] > NOISE_MS
+        regressed = regressed or slower
+        print(f"  {name:32} {before['median_ms']:10.2f} -> {result['median_ms']:10.2f} ms  {ratio:6.2f}x"
+              f"{'  REGRESSION' if slower else ''}")
+    return regressed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="OpenWiki benchmark suite")
+    wikigen.add_arguments(arg_parser)
+    arg_parser.add_argument("--repeat", type=int, default=3, help="전체 작업(인덱스 읽기, 변환)을 반복하는 횟수")
+    arg_parser.add_argument("--samples", type=int, default=50, help="문서 단위 작업(편집, 읽기, 요청)의 횟수")
+    arg_parser.add_argument("--workers", type=int, default=None, help="변환 프로세스 수 (기본: CPU 수)")
+    arg_parser.add_argument("--output", help="결과를 저장할 JSON 파일")
+    arg_parser.add_argument("--compare", help="비교할 예전 결과 JSON 파일")
+    arg_parser.add_argument("--threshold", type=float, default=1.25, help="이 배수보다 느려지면 알린다")
+    arg_parser.add_argument("--memory", action="store_true", help="항목마다 Python 메모리 최대 사용량을 잰다")
+    arg_parser.add_argument("--keep", help="합성 위키를 지우지 않고 이 폴더에 만든다")
+    args = arg_parser.parse_args()
+    # main.py를 불러오면 작업 폴더가 바뀌므로 경로는 미리 절대 경로로 바꿔 둔다
+    for name in ("output", "compare"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    base_path = os.path.abspath(args.keep) if args.keep else tempfile.mkdtemp(prefix="openwiki-bench-")
+    index_path = os.path.join(base_path, "index")
+    output_path = os.path.join(base_path, "output")
+    markdown_path = os.path.join(index_path, "markdown.db")
+    rng = random.Random(args.seed)
+    suite = Suite(args.memory)
+    try:
+        summary = wikigen.from_arguments(args).generate(base_path)
+        doc_ids = summary.pop("doc_ids")
+        print(f"{summary['pages']} pages, {summary['revisions']} revisions, {summary['bytes'] / 1024:.0f} KiB "
+              f"generated in {summary['seconds']:.2f}s ({base_path})")
+
+        suite.run("load_index_cold", lambda i: DocumentManager(base_path).search_index.close(), args.repeat,
+                  setup=lambda i: remove(index_path))
+        manager = DocumentManager(base_path)
+        suite.run("load_index", lambda i: manager.load_index(), args.repeat)
+
+        builder = WikiBuilder(manager.pages_path, output_path, os.path.join(ROOT, "templates", "base.html"),
+                              os.path.join(index_path, "build_manifest.json"), args.workers,
+                              os.path.join(index_path, "links.db"), markdown_path)
+
+        def clean_build(i):
+            for path in (output_path, markdown_path,
+                         markdown_path + "-wal", markdown_path + "-shm"):
+                remove(path)
+            parser.markdown_cache.close()
+            parser.markdown_cache = MarkdownCache(markdown_path)
+
+        suite.run("convert_wiki_docs", lambda i: builder.build_all(force=True), args.repeat, setup=clean_build)
+        suite.run("convert_wiki_docs_force", lambda i: builder.build_all(force=True), args.repeat)
+        suite.run("convert_wiki_docs_incremental", lambda i: builder.build_all(), args.repeat)
+
+        edits = []
+        for i in range(args.samples):
+            doc_id = rng.choice(doc_ids)
+            edits.append((doc_id, i))
+        suite.run("update_document", lambda i: manager.update_document(
+            edits[i][0], manager.get_document(edits[i][0], history=False).content + f"\n\n벤치마크 편집 {i}",
+            "bench", "127.0.0.1"), args.samples)
+
+        reads = [rng.choice(doc_ids) for _ in range(args.samples)]
+
+        def clear_cache(i):
+            manager.cache = DocumentCache()
+
+        suite.run("get_document", lambda i: manager.get_document(reads[i]), args.samples, setup=clear_cache)
+        # get_document 항목은 호출마다 캐시를 비웠으므로, 읽을 문서를 모두 캐시에 넣어 둔 뒤 잰다
+        manager.cache = DocumentCache()
+        for doc_id in reads:
+            manager.get_document(doc_id)
+        before = manager.cache.stats()
+        suite.run("get_document_cached", lambda i: manager.get_document(reads[i]), args.samples)
+        after = manager.cache.stats()
+        hits = after["hits"] - before["hits"]
+        misses = after["misses"] - before["misses"]
+        hit_ratio = hits / (hits + misses) if hits + misses else 0.0
+        suite.results["get_document_cached"]["hit_ratio"] = hit_ratio
+        if hit_ratio < 1.0:
+            print(f"Warning: get_document_cached hit ratio {hit_ratio:.2f} ({misses} misses)")
+            sys.exit(1)
+
+        # main.py는 불러올 때 OPENWIKI_ROOT 아래에 인덱스를 열므로 합성 위키를 가리키게 한 뒤 불러온다.
+        # Flask 앱은 모듈 전역 객체를 쓰므로 위에서 만든 객체로 바꿔 끼운다
+        os.environ["OPENWIKI_ROOT"] = base_path
+        import main as app_module
+        app_module.doc_manager = manager
+        app_module.builder = builder
+        app_module.render_queue = RenderQueue(builder)
+        client = app_module.app.test_client()
+        words = wikigen.HANGUL_WORDS + wikigen.ASCII_WORDS
+        queries = [" ".join(rng.sample(words, rng.randint(1, 2))) for _ in range(args.samples)]
+
+        def request(url: str):
+            response = client.get(url)
+            response.close()
+            if response.status_code != 200:
+                print(f"Warning: {url} returned {response.status_code}")
+
+        suite.run("search", lambda i: request(f"/search?query={quote(queries[i])}"), args.samples)
+        suite.run("doc", lambda i: request(f"/doc/{quote(reads[i])}"), args.samples)
+        app_module.render_queue.wait(timeout=60)
+    finally:
+        if not args.keep:
+            shutil.rmtree(base_path, ignore_errors=True)
+
+    result = {
+        "version": RESULT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": vars(args),
+        "wiki": summary,
+        "results": suite.results,
+    }
+    try:
+        import resource
+        result["max_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        pass
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"results saved to {args.output}")
+    if args.compare and compare(suite.results, vars(args), args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
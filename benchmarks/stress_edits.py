@@ -0,0 +1,93 @@
+"""여러 프로세스/스레드가 같은 문서를 동시에 편집할 때의 처리량
+
+사용법: python benchmarks/stress_edits.py [--processes 4] [--threads 4] [--edits 25] [--documents 3] [--optimistic]
+
+--optimistic 이면 편집을 시작할 때의 리비전 수(base_revision)를 넘기고, 충돌하면 다시 읽어 재시도한다.
+리비전이 사라지지 않는지는 tests/test_revisions.py 에서 확인한다.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system.document import DocumentManager, EditConflict
+
+
+def editor(base_path: str, worker: int, threads: int, edits: int, documents: int, optimistic: bool, results):
+    manager = DocumentManager(base_path)
+    counts = {}
+    conflicts = 0
+    lock = threading.Lock()
+
+    def run(thread: int):
+        nonlocal conflicts
+        for edit in range(edits):
+            doc_id = f"doc{(worker + thread + edit) % documents}"
+            content = f"worker {worker} thread {thread} edit {edit}"
+            while True:
+                base_revision = None
+                if optimistic:
+                    manager.refresh_index()
+                    base_revision = manager.get_document(doc_id, history=False).revision_count
+                try:
+                    manager.update_document(doc_id, content, f"w{worker}t{thread}", "127.0.0.1", base_revision)
+                    break
+                except EditConflict:
+                    with lock:
+                        conflicts += 1
+            with lock:
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+
+    workers = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    results.put((counts, conflicts))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="concurrent edit stress test")
+    arg_parser.add_argument("--processes", type=int, default=4)
+    arg_parser.add_argument("--threads", type=int, default=4)
+    arg_parser.add_argument("--edits", type=int, default=25, help="스레드 하나가 하는 편집 수")
+    arg_parser.add_argument("--documents", type=int, default=3)
+    arg_parser.add_argument("--optimistic", action="store_true")
+    args = arg_parser.parse_args()
+
+    base_path = tempfile.mkdtemp(prefix="openwiki-stress-")
+    try:
+        manager = DocumentManager(base_path)
+        for number in range(args.documents):
+            manager.create_document(f"doc{number}", "initial", "setup", "127.0.0.1")
+
+        started = time.perf_counter()
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=editor, args=(base_path, worker, args.threads, args.edits,
+                                                                  args.documents, args.optimistic, results))
+                     for worker in range(args.processes)]
+        for process in processes:
+            process.start()
+        total = conflicts = 0
+        for _ in processes:
+            counts, worker_conflicts = results.get()
+            conflicts += worker_conflicts
+            total += sum(counts.values())
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        print(f"{total} edits by {args.processes} processes x {args.threads} threads in {elapsed:.2f}s "
+              f"({total / elapsed:.0f} edits/s, {conflicts} conflicts retried)")
+    finally:
+        shutil.rmtree(base_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""합성 위키 생성기
+
+사용법: python benchmarks/wikigen.py <폴더> [--pages 200] [--page-size 2000] [--revisions 5] [--namespaces 3]
+                                         [--hangul 0.7] [--links 0.03] [--templates 0.2] [--seed 0]
+
+<폴더>/pages 아래에 .opwi 문서를, <폴더>/wiki_templates 아래에 틀 파일을 만든다. 같은 옵션과 시드면 같은 내용이 나온다.
+  --page-size: 문서 하나의 평균 글자 수 (문서마다 절반에서 1.5배 사이)
+  --revisions: 문서마다의 리비전 수 (첫 판 포함). 판마다 몇 줄을 고치거나 넣거나 지운다
+  --namespaces: 네임스페이스 수. 첫 번째는 최상위 폴더이다
+  --hangul: 단어 중 한글 단어의 비율 (나머지는 영문)
+  --links: 단어 하나가 [[링크]]일 확률. 링크의 10%는 없는 문서를 가리킨다
+  --templates: 문서가 {template:...} 틀을 포함할 확률
+파일은 DocumentManager를 거치지 않고 Document.to_opwi()로 바로 쓴다 (fsync 없이). 인덱스는 처음 여는
+DocumentManager가 pages 폴더를 훑어 만든다.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system.document import Document
+
+HANGUL_WORDS = ["위키", "문서", "편집", "리비전", "링크", "틀", "검색", "내용", "역사", "과학", "한국어", "사전",
+                "도움말", "토론", "분류", "사용자", "대문", "최근", "바뀜", "설명", "예시", "정리", "기록", "자료"]
+ASCII_WORDS = ["wiki", "page", "edit", "revision", "link", "template", "search", "content", "history",
+               "science", "example", "OpenWiki", "markdown", "index", "cache", "render", "python", "flask"]
+# 없는 문서를 가리키는 링크의 비율
+MISSING_LINK_RATIO = 0.1
+# 만드는 틀 파일 수
+TEMPLATE_FILES = 10
+
+
+class WikiGenerator:
+    def __init__(self, pages: int = 200, page_size: int = 2000, revisions: int = 5, namespaces: int = 3,
+                 hangul: float = 0.7, links: float = 0.03, templates: float = 0.2, seed: int = 0):
+        self.pages = pages
+        self.page_size = page_size
+        self.revisions = max(1, revisions)
+        self.namespaces = max(1, namespaces)
+        self.hangul = hangul
+        self.links = links
+        self.templates = templates
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.doc_ids = []
+        self.template_paths = []
+
+    def word(self) -> str:
+        return self.rng.choice(HANGUL_WORDS if self.rng.random() < self.hangul else ASCII_WORDS)
+
+    def namespace_names(self) -> list:
+        """첫 번째는 최상위 폴더("")"""
+        return [""] + [f"이름공간{number}" if self.rng.random() < self.hangul else f"namespace{number}"
+                       for number in range(1, self.namespaces)]
+
+    def title(self, number: int) -> str:
+        return f"{self.word()} {self.word()} {number}"
+
+    def sentence(self) -> str:
+        words = []
+        for _ in range(self.rng.randint(6, 20)):
+            if self.rng.random() < self.links:
+                target = (f"{self.word()} 없는 문서 {self.rng.randrange(1000)}"
+                          if self.rng.random() < MISSING_LINK_RATIO else self.rng.choice(self.doc_ids))
+                words.append(f"[[{target}]]")
+            else:
+                words.append(self.word())
+        return " ".join(words) + "."
+
+    def line(self) -> str:
+        """Markdown 문단, 목록 항목, 제목 중 하나"""
+        kind = self.rng.random()
+        if kind < 0.1:
+            return f"## {self.word()} {self.word()}"
+        if kind < 0.3:
+            return f"* {self.sentence()}"
+        return self.sentence()
+
+    def content(self) -> list:
+        size = int(self.page_size * self.rng.uniform(0.5, 1.5))
+        lines = [f"# {self.word()} {self.word()}", ""]
+        length = 0
+        while length < size:
+            line = self.line()
+            lines.extend([line, ""])
+            length += len(line) + 2
+        if self.template_paths and self.rng.random() < self.templates:
+            lines.insert(2, f"{{template:{self.rng.choice(self.template_paths)}}}")
+        return lines
+
+    def edit(self, lines: list) -> list:
+        lines = list(lines)
+        for _ in range(self.rng.randint(1, 3)):
+            position = self.rng.randrange(len(lines))
+            action = self.rng.random()
+            if action < 0.6:
+                lines[position] = self.line()
+            elif action < 0.85 or len(lines) < 4:
+                lines.insert(position, self.line())
+            else:
+                del lines[position]
+        return lines
+
+    def generate(self, base_path: str) -> dict:
+        """base_path에 위키를 만들고 요약 {"pages", "revisions", "bytes", "seconds", "doc_ids"}를 반환"""
+        started = time.perf_counter()
+        pages_path = os.path.join(base_path, "pages")
+        # 링크가 앞으로 만들 문서도 가리킬 수 있도록 문서 ID를 먼저 정한다
+        namespaces = self.namespace_names()
+        names = []
+        for number in range(self.pages):
+            namespace = self.rng.choice(namespaces)
+            title = self.title(number)
+            names.append((namespace, title))
+            self.doc_ids.append(f"{namespace}/{title}".strip("/"))
+
+        template_path = os.path.join(base_path, "wiki_templates")
+        os.makedirs(template_path, exist_ok=True)
+        for number in range(TEMPLATE_FILES):
+            path = os.path.join(template_path, f"틀{number}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"<div class=\"template\">{self.sentence()}</div>")
+            self.template_paths.append(os.path.abspath(path))
+
+        revisions = 0
+        total_bytes = 0
+        for namespace, title in names:
+            doc = Document(title, namespace)
+            lines = self.content()
+            doc.add_content("\n".join(lines), "generator", "127.0.0.1")
+            for number in range(1, self.revisions):
+                lines = self.edit(lines)
+                doc.update_content("\n".join(lines), f"user{number % 7}", "127.0.0.1")
+                if doc.needs_checkpoint():
+                    doc.add_checkpoint()
+            revisions += doc.revision_count
+            directory = os.path.join(pages_path, namespace)
+            os.makedirs(directory, exist_ok=True)
+            data = doc.to_opwi().encode("utf-8")
+            with open(os.path.join(directory, f"{title}.opwi"), "wb") as f:
+                f.write(data)
+            total_bytes += len(data)
+        return {"pages": self.pages, "revisions": revisions, "bytes": total_bytes,
+                "seconds": time.perf_counter() - started, "doc_ids": list(self.doc_ids)}
+
+
+def add_arguments(arg_parser: argparse.ArgumentParser):
+    arg_parser.add_argument("--pages", type=int, default=200)
+    arg_parser.add_argument("--page-size", type=int, default=2000, help="문서 하나의 평균 글자 수")
+    arg_parser.add_argument("--revisions", type=int, default=5, help="문서마다의 리비전 수")
+    arg_parser.add_argument("--namespaces", type=int, default=3)
+    arg_parser.add_argument("--hangul", type=float, default=0.7, help="한글 단어의 비율")
+    arg_parser.add_argument("--links", type=float, default=0.03, help="단어가 링크일 확률")
+    arg_parser.add_argument("--templates", type=float, default=0.2, help="문서가 틀을 포함할 확률")
+    arg_parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args) -> WikiGenerator:
+    return WikiGenerator(args.pages, args.page_size, args.revisions, args.namespaces, args.hangul,
+                         args.links, args.templates, args.seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="synthetic wiki generator")
+    arg_parser.add_argument("path", help="위키를 만들 폴더")
+    add_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    summary = from_arguments(args).generate(args.path)
+    print(f"{summary['pages']} pages, {summary['revisions']} revisions, {summary['bytes'] / 1024:.0f} KiB "
+          f"in {summary['seconds']:.2f}s -> {os.path.abspath(args.path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,165 +1,295 @@
-import markdown
+import argparse
 import os
-import shutil
 import json
-from flask import Flask, render_template, jsonify, request, redirect, url_for
+import time
+from flask import Flask, g, render_template, jsonify, request, redirect, url_for, send_file, stream_with_context
+from werkzeug.security import safe_join
 from opwiparser import parser
-from rev_system.document import DocumentManager
+from opwiparser.builder import WikiBuilder
+from opwiparser.render_queue import RenderQueue
+from rev_system import diff, metrics
+from rev_system.document import DocumentManager, EditConflict
+from rev_system.listing import MAX_LIST_PAGE
+from rev_system.revision_index import MAX_HISTORY_PAGE
+from rev_system.search_index import MAX_PER_PAGE
 
 # 현재 디렉토리로 이동
 print("run on", os.path.dirname(os.path.realpath(__file__)))
 os.chdir(os.path.dirname(os.path.realpath(__file__)))
+# 문서(pages), 인덱스(index), 변환한 HTML(templates/doc)을 둘 폴더. 기본은 main.py가 있는 폴더
+DATA_PATH = os.environ.get("OPENWIKI_ROOT", ".")
 
-def convert_wiki_docs():
-    """위키 문서(.opwi)를 HTML로 변환 (네임스페이스 폴더 유지)"""
-    print("Converting wiki documents...")
-
-    templates_path = "./templates/doc"
-    
-    # 기존 변환된 문서 삭제 후 재생성
-    if os.path.exists(templates_path):
-        shutil.rmtree(templates_path)
-    os.makedirs(templates_path, exist_ok=True)
-
-    # 기본 템플릿 읽기
-    with open("./templates/base.html", "r", encoding="utf-8") as file:
-        base_template = file.read()
-
-    for root, _, files in os.walk("./pages"):
-        for doc in files:
-            if doc.endswith(".opwi"):
-                opwi_filepath = os.path.join(root, doc)
+builder = WikiBuilder(os.path.join(DATA_PATH, "pages"), os.path.join(DATA_PATH, "templates", "doc"),
+                      manifest_path=os.path.join(DATA_PATH, "index", "build_manifest.json"),
+                      links_path=os.path.join(DATA_PATH, "index", "links.db"),
+                      markdown_cache_path=os.path.join(DATA_PATH, "index", "markdown.db"))
+# 편집 후 HTML 변환은 백그라운드에서 처리
+render_queue = RenderQueue(builder)
+# 아직 한 번도 변환되지 않은 새 문서를 열 때 변환을 기다리는 최대 시간(초)
+RENDER_WAIT = 5.0
+# 변경 이력 한 페이지의 기본 리비전 수
+HISTORY_PAGE = 50
+# /api/docs 한 페이지의 기본 문서 수
+DOCS_PAGE = 100
 
-                # 네임스페이스 유지하면서 변환된 HTML 파일 저장 경로 설정
-                relative_path = os.path.relpath(opwi_filepath, "./pages")
-                html_filename = os.path.splitext(relative_path)[0] + ".html"
-                html_output_path = os.path.join(templates_path, html_filename)
-
-                # 변환된 HTML 파일의 폴더 생성
-                os.makedirs(os.path.dirname(html_output_path), exist_ok=True)
+def convert_wiki_docs(force: bool = False):
+    """위키 문서(.opwi)를 HTML로 변환 (네임스페이스 폴더 유지)
+    force가 아니면 빌드 매니페스트를 보고 바뀐 문서만 변환"""
+    print("Converting wiki documents...")
+    report = builder.build_all(force=force)
+    print(f"Conversion complete! {report.summary()}")
 
-                with open(opwi_filepath, "r", encoding="utf-8") as file:
-                    content = file.read()
-                    # OPWI 파싱 및 HTML 변환
-                    html_content = parser.parse_opwi(content)
-                    wiki_content = parser.parse(html_filename.replace(".html", ""), html_content, base_template)
+# Flask 애플리케이션 설정
+app = Flask(__name__, static_url_path='/static')
+# 앞단 웹 서버(nginx/Apache)가 파일을 직접 보내도록 하려면 OPENWIKI_X_SENDFILE=1
+app.config["USE_X_SENDFILE"] = os.environ.get("OPENWIKI_X_SENDFILE") == "1"
+# 리비전을 압축 프레임으로 저장하려면 OPENWIKI_CODEC=zlib (rev_system.codec). 비워 두면 텍스트 레코드
+doc_manager = DocumentManager(DATA_PATH, codec=os.environ.get("OPENWIKI_CODEC") or None)
 
-                with open(html_output_path, "w", encoding="utf-8") as staticfile:
-                    staticfile.write(wiki_content)
+# 요청별 처리 시간과 상태 값 (/metrics). OPENWIKI_METRICS=0이면 재지 않는다
+request_seconds = metrics.registry.histogram("openwiki_http_request_seconds", "Time spent handling HTTP requests",
+                                             ("endpoint", "method", "status"))
+metrics.registry.gauge("openwiki_render_queue_depth", "Documents waiting for or in HTML conversion",
+                       render_queue.depth)
+metrics.registry.gauge("openwiki_render_queue", "Render queue counters", render_queue.stats, label="stat")
+metrics.registry.gauge("openwiki_documents", "Documents in the index", lambda: len(doc_manager.index["documents"]))
+metrics.registry.gauge("openwiki_document_cache", "Parsed document cache counters", doc_manager.cache_stats,
+                       label="stat")
+metrics.registry.gauge("openwiki_markdown_cache", "Markdown block cache counters", parser.markdown_cache.stats,
+                       label="stat")
+metrics.registry.gauge("openwiki_template_cache", "Template cache counters", parser.template_resolver.stats,
+                       label="stat")
+# OPENWIKI_PROFILE=1이면 호출 스택 표본을 모은다 (/metrics/profile)
+if metrics.profiler is not None:
+    metrics.profiler.start()
 
-                print(f"Converted: {opwi_filepath} -> {html_output_path}")
+if metrics.enabled:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
 
-    print("Conversion complete!")
+    @app.after_request
+    def record_request_time(response):
+        started = g.pop("request_started", None)
+        if started is not None:
+            request_seconds.observe(time.perf_counter() - started, request.endpoint or "unmatched",
+                                    request.method, response.status_code)
+        return response
 
-# Flask 애플리케이션 설정
-app = Flask(__name__, static_url_path='/static')
-doc_manager = DocumentManager()
+@app.before_request
+def refresh_index():
+    """다른 워커 프로세스가 바꾼 문서 인덱스 항목을 반영"""
+    doc_manager.refresh_index()
 
 @app.route('/')
 @app.route('/home')
 def home():
     return redirect(url_for('doc', docname='오픈위키/대문'))
 
+# 클라이언트가 받을 수 있으면 빌드 때 미리 압축해 둔 파일을 보낸다 (선호 순서)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+def send_page(filepath: str, stat: os.stat_result):
+    """변환된 HTML을 템플릿 엔진을 거치지 않고 파일 그대로 전송.
+    ETag/Last-Modified로 조건부 요청에 304를 돌려주고, 파일 전송은 wsgi.file_wrapper(sendfile)에 맡긴다."""
+    etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    for encoding, suffix in PRECOMPRESSED:
+        if not request.accept_encodings[encoding]:
+            continue
+        try:
+            compressed = os.stat(filepath + suffix)
+        except OSError:
+            continue
+        # HTML보다 먼저 만들어진 압축 파일은 예전 내용이므로 쓰지 않는다
+        if compressed.st_mtime_ns < stat.st_mtime_ns:
+            continue
+        response = send_file(filepath + suffix, mimetype="text/html", etag=f"{etag}-{encoding}",
+                             last_modified=stat.st_mtime, max_age=0, conditional=True)
+        response.headers["Content-Encoding"] = encoding
+        break
+    else:
+        response = send_file(filepath, mimetype="text/html", etag=etag,
+                             last_modified=stat.st_mtime, max_age=0, conditional=True)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
 @app.route('/doc/<path:docname>')
 def doc(docname):
-    filepath = f"templates/doc/{docname}.html"
-    
-    if os.path.exists(filepath):
-        return render_template(f"doc/{docname}.html")
-    else:
-        return redirect(url_for('edit_doc', docname=docname))
+    filepath = safe_join(builder.output_path, f"{docname}.html")
+    if filepath is None:
+        return render_template("404.html"), 404
+
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        # 방금 만든 문서는 변환이 끝날 때까지 잠시 기다린다
+        if not (render_queue.is_pending(docname) and render_queue.wait(docname, timeout=RENDER_WAIT)
+                and os.path.exists(filepath)):
+            return redirect(url_for('edit_doc', docname=docname))
+        stat = os.stat(filepath)
+    return send_page(filepath, stat)
 
 @app.route('/edit/<path:docname>', methods=['GET', 'POST'])
 def edit_doc(docname):
     if request.method == 'POST':
         content = request.form.get('content', '')
         username = request.form.get('username', 'anonymous')
+        # 편집을 시작할 때의 리비전 수 (그 사이 다른 편집이 있었는지 확인)
+        base_revision = request.form.get('base_revision', type=int)
 
         doc_id = docname.strip("/")
-        if doc_id in doc_manager.index["documents"]:
-            doc_manager.update_document(doc_id, content, username, request.remote_addr)
-        else:
-            doc_manager.create_document(docname, content, username, request.remote_addr)
-        
-        convert_wiki_docs()
+        try:
+            if doc_id in doc_manager.index["documents"]:
+                doc_manager.update_document(doc_id, content, username, request.remote_addr, base_revision)
+            else:
+                doc_manager.create_document(docname, content, username, request.remote_addr)
+        except EditConflict as conflict:
+            return render_template("edit.html", docname=docname, content=content,
+                                   base_revision=conflict.revision_count, conflict=conflict.content), 409
+
+        # 리비전은 이미 디스크에 기록되었으므로, 수정된 문서와 그 문서를 포함/넘겨주기 하는 문서의
+        # 변환은 대기열에 넘기고 바로 응답한다
+        render_queue.submit(doc_id)
         return redirect(url_for('doc', docname=docname))
     
     content = ""
+    base_revision = 0
     doc_id = docname.strip("/")
     if doc_id in doc_manager.index["documents"]:
-        doc = doc_manager.get_document(doc_id)
-        if doc and doc.content:
-            content = doc.content
+        doc = doc_manager.get_document(doc_id, history=False)
+        if doc:
+            content = doc.content or ""
+            base_revision = doc.revision_count
     
-    return render_template("edit.html", docname=docname, content=content)
+    return render_template("edit.html", docname=docname, content=content, base_revision=base_revision)
 
 @app.route('/history/<path:docname>')
 def history(docname):
+    """리비전 색인에서 최신 판부터 한 페이지씩 (before=이전 페이지의 마지막 판 번호)"""
     doc_id = docname.strip("/")
-    doc = doc_manager.get_document(doc_id)
-    if doc:
-        revisions = [{"username": rev["username"], "timestamp": rev["timestamp"], "changes": rev["changes"]} for rev in doc.revisions]
-        return render_template("history.html", docname=docname, revisions=revisions)
-    else:
+    before = request.args.get("before", type=int)
+    limit = max(1, min(request.args.get("limit", HISTORY_PAGE, type=int), MAX_HISTORY_PAGE))
+    revisions = doc_manager.get_history(doc_id, before, limit)
+    if revisions is None:
         return render_template("404.html"), 404
+    # ?rev=n 이면 n번째 판의 전체 내용을 함께 보여준다
+    revision_number = request.args.get("rev", type=int)
+    revision_content = doc_manager.get_revision_content(doc_id, revision_number) if revision_number else None
+    next_before = revisions[-1]["number"] if len(revisions) == limit and revisions[-1]["number"] > 1 else None
+    return render_template("history.html", docname=docname, revisions=revisions, limit=limit,
+                           before=before, next_before=next_before,
+                           revision_number=revision_number, revision_content=revision_content)
+
+@app.route('/diff/<path:docname>')
+def revision_diff(docname):
+    """?rev=n 번째 판에서 바뀐 줄 (바로 전 판과 비교)"""
+    revision_number = request.args.get("rev", type=int)
+    result = doc_manager.get_revision_diff(docname.strip("/"), revision_number) if revision_number else None
+    if result is None:
+        return render_template("404.html"), 404
+    revision, before, after = result
+    return render_template("diff.html", docname=docname, revision=revision, hunks=diff.hunks(before, after))
 
 @app.route('/api/docs')
 def get_docs():
-    """모든 문서 목록을 JSON으로 반환 (네임스페이스 없이)"""
-    doc_folder = "./templates/doc"
-    docs = [
-        os.path.splitext(file)[0]
-        for file in os.listdir(doc_folder)
-        if file.endswith(".html")
-    ]
-    return jsonify(docs)
+    """문서 목록을 메모리 인덱스에서 반환 (네임스페이스 포함).
+    prefix: 문서 ID 접두어, namespace: 그 네임스페이스 바로 아래 문서만, after: 이전 응답의 next 값, limit: 페이지 크기.
+    format=ndjson 이면 조건에 맞는 문서 전체를 한 줄에 하나씩 스트리밍한다.
+    인덱스가 바뀌지 않았으면 If-None-Match에 304로 응답한다."""
+    prefix = request.args.get("prefix", "")
+    namespace = request.args.get("namespace")
+    after = request.args.get("after")
+    limit = request.args.get("limit", DOCS_PAGE, type=int)
+    etag = doc_manager.listing.etag
+
+    if request.args.get("format") == "ndjson":
+        def export():
+            cursor = after
+            while True:
+                documents, cursor = doc_manager.list_documents(prefix, namespace, cursor, MAX_LIST_PAGE)
+                for entry in documents:
+                    yield json.dumps(entry, ensure_ascii=False) + "\n"
+                if cursor is None:
+                    break
+        response = app.response_class(stream_with_context(export()), mimetype="application/x-ndjson")
+    else:
+        documents, cursor = doc_manager.list_documents(prefix, namespace, after, limit)
+        response = jsonify({"documents": documents, "next": cursor})
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+@app.route('/api/autocomplete')
+def autocomplete():
+    """입력 중인 검색어로 시작하는 문서 제목 (초성/낱자 입력도 맞춘다). sort=popular|recent"""
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", 10, type=int)
+    order = request.args.get("sort", "popular")
+    return jsonify(doc_manager.titles.suggest(query, limit, order))
+
+@app.route('/api/links/<path:docname>')
+def document_links(docname):
+    """문서가 가리키는 문서와 그 문서를 가리키는 문서 (역링크)"""
+    doc_id = docname.strip("/")
+    return jsonify({"links": builder.links.links(doc_id), "backlinks": builder.links.backlinks(doc_id)})
+
+@app.route('/api/missing')
+def missing_pages():
+    """없는 문서를 가리키는 링크 대상 (많이 가리키는 순)"""
+    limit = max(1, min(request.args.get("limit", 100, type=int), 1000))
+    return jsonify([{"id": target, "backlinks": count} for target, count in builder.links.missing(limit)])
+
+@app.route('/api/orphans')
+def orphan_pages():
+    """다른 문서가 가리키지 않는 문서"""
+    limit = max(1, min(request.args.get("limit", 100, type=int), 1000))
+    return jsonify(builder.links.orphans(limit))
+
+@app.route('/api/render')
+@app.route('/api/render/<path:docname>')
+def render_status(docname=None):
+    """변환 대기열 깊이와 (문서를 지정하면) 그 문서의 변환 상태"""
+    result = {"queue": render_queue.stats()}
+    if docname is not None:
+        result["document"] = render_queue.status(docname)
+    return jsonify(result)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus 텍스트 형식의 계측 값"""
+    return app.response_class(metrics.registry.expose(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/metrics/profile')
+def sampling_profile():
+    """OPENWIKI_PROFILE=1일 때 모은 호출 스택 표본 (flamegraph.pl/speedscope 형식). ?reset=1이면 읽은 뒤 비운다"""
+    if metrics.profiler is None:
+        return render_template("404.html"), 404
+    collapsed = metrics.profiler.collapsed()
+    if request.args.get("reset") == "1":
+        metrics.profiler.reset()
+    return app.response_class(collapsed, content_type="text/plain; charset=utf-8")
 
 @app.route('/search', methods=['GET'])
 def search():
-    """네임스페이스 없이 검색 가능하도록 수정"""
-    query = request.args.get("query", "").strip().lower()
-    search_results = []
-
-    if query:
-        for doc_id, info in doc_manager.index["documents"].items():
-            title = info["title"].lower()
-            if query in title:
-                search_results.append({
-                    "id": doc_id,
-                    "title": info["title"],
-                    "path": info["path"].replace(".opwi", ""),
-                    "match_type": "title",
-                    "relevance": 1 if query == title else 0.8
-                })
-
-        for doc_id, info in doc_manager.index["documents"].items():
-            if any(result["id"] == doc_id for result in search_results):
-                continue
-
-            doc_path = os.path.join(doc_manager.base_path, info["path"].lstrip("/"))
-            try:
-                with open(doc_path, "r", encoding="utf-8") as f:
-                    content = f.read().lower()
-                    if query in content:
-                        search_results.append({
-                            "id": doc_id,
-                            "title": info["title"],
-                            "path": info["path"].replace(".opwi", ""),
-                            "match_type": "content",
-                            "relevance": 0.6
-                        })
-            except:
-                continue
-
-        search_results.sort(key=lambda x: (-x["relevance"], x["title"]))
-
-    return render_template("search.html", query=query, results=search_results)
+    """역색인에서 제목/내용을 검색 (page, limit 으로 페이지 나누기)"""
+    query = request.args.get("query", "").strip()
+    page = max(1, request.args.get("page", 1, type=int))
+    limit = max(1, min(request.args.get("limit", 20, type=int), MAX_PER_PAGE))
+
+    total, search_results = doc_manager.search_index.search(query, page=page, per_page=limit) if query else (0, [])
+    has_next = page * limit < total
+
+    return render_template("search.html", query=query, results=search_results, total=total,
+                           page=page, limit=limit, has_next=has_next)
 
 if __name__ == "__main__":
-    convert_wiki_docs()
+    arg_parser = argparse.ArgumentParser(description="OpenWiki server")
+    arg_parser.add_argument("--force", action="store_true", help="빌드 캐시를 무시하고 모든 문서를 다시 변환")
+    args = arg_parser.parse_args()
+    convert_wiki_docs(force=args.force)
     print("Starting Flask server...")
     app.run(debug=True)
 
-def apprun():
-    convert_wiki_docs()
+def apprun(force: bool = False):
+    convert_wiki_docs(force=force)
     return app
\ No newline at end of file
@@ -0,0 +1,481 @@
+import gzip
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from opwiparser import parser, tokenizer
+from opwiparser.link_graph import LinkGraph, link_target
+from opwiparser.template_cache import TemplateResolver
+from rev_system import metrics, storage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MANIFEST_VERSION = 3
+# 이보다 적은 문서는 프로세스 풀을 띄우는 비용이 더 크므로 현재 프로세스에서 변환
+PARALLEL_THRESHOLD = 64
+# 변환된 HTML 옆에 미리 압축해 두는 파일의 확장자 (brotli 모듈이 없으면 .br 은 만들지 않는다)
+COMPRESSED_SUFFIXES = (".gz", ".br")
+# 전체 빌드에서 링크 그래프에 한 트랜잭션으로 반영하는 문서 수
+LINK_BATCH = 256
+
+
+def file_hash(path: str) -> str:
+    """파일 내용의 SHA-256 해시"""
+    with open(path, "rb") as f:
+        return stream_hash(f)
+
+
+def stream_hash(f) -> str:
+    """열린 바이너리 파일을 처음부터 조각씩 읽은 SHA-256 해시"""
+    sha256 = hashlib.sha256()
+    f.seek(0)
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def write_compressed(path: str, data: bytes):
+    """HTML 옆에 .gz(.br) 파일을 미리 만들어 두어 서버가 요청마다 압축하지 않게 한다.
+    HTML을 쓴 뒤에 호출해야 압축 파일의 mtime이 HTML보다 늦어 최신 여부를 판단할 수 있다."""
+    storage.write_durable(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0), sync=False)
+    if brotli is not None:
+        storage.write_durable(path + ".br", brotli.compress(data), sync=False)
+    elif os.path.exists(path + ".br"):
+        os.remove(path + ".br")
+
+
+def remove_compressed(path: str):
+    for suffix in COMPRESSED_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def normalize_target(target: str, pages_path: str) -> str:
+    """틀 경로가 pages 폴더 안의 문서를 가리키면 문서 ID로 바꿔 같은 키로 추적"""
+    target = target.strip().replace("\\", "/")
+    if target.endswith(".opwi"):
+        relative_path = os.path.relpath(target, pages_path).replace("\\", "/")
+        if not relative_path.startswith(".."):
+            return os.path.splitext(relative_path)[0]
+    if target.startswith("./"):
+        target = target[2:]
+    return target.strip("/")
+
+
+def scan_dependencies(tokens: list, pages_path: str, included=()) -> set:
+    """넘겨주기 대상과 틀 포함 대상을 수집. included는 렌더링하면서 실제로 펼친 (중첩 포함) 틀 경로"""
+    targets = {normalize_target(t, pages_path) for t in tokenizer.targets(tokens, tokenizer.REDIRECT)}
+    targets.update(normalize_target(t, pages_path) for t in tokenizer.targets(tokens, tokenizer.TEMPLATE))
+    targets.update(normalize_target(t, pages_path) for t in included)
+    return targets
+
+
+def convert_document(doc_id: str, pages_path: str, output_path: str, base_template: str) -> dict:
+    """문서 하나를 parse_opwi_file -> parse -> 저장 순서로 변환.
+    예외를 밖으로 던지지 않고 결과에 담아, 한 문서의 실패가 전체 빌드를 멈추지 않게 한다."""
+    result = {"doc_id": doc_id, "status": "ok"}
+    try:
+        file = open(os.path.join(pages_path, f"{doc_id}.opwi"), "rb")
+    except FileNotFoundError:
+        result["status"] = "missing"
+        return result
+    except OSError as e:
+        # 읽을 수 없는 원본(권한, 심볼릭 링크 순환 등)도 그 문서만 실패로 처리한다
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    links = set()
+
+    def page_exists(value: str) -> bool:
+        # 그린 링크를 모두 모으고, 대상 문서가 없으면 빨간 링크로 그린다
+        target = link_target(value)
+        links.add(target)
+        return os.path.exists(os.path.join(pages_path, f"{target}.opwi"))
+
+    try:
+        # 파일을 통째로 메모리에 올리지 않는다: 해시는 조각씩, 본문은 마지막 체크포인트부터 읽는다
+        with file:
+            stat = os.fstat(file.fileno())
+            sha256 = stream_hash(file)
+            html_content = parser.parse_opwi_file(file)
+        tokens = tokenizer.tokenize(html_content)
+        content, included = parser.template_resolver.render(tokens, page_exists)
+        wiki_content = parser.apply_template(doc_id, content, base_template).encode("utf-8")
+        output_file = os.path.join(output_path, f"{doc_id}.html")
+        # 변환 결과는 원본에서 다시 만들 수 있으므로 fsync 하지 않는다
+        storage.write_durable(output_file, wiki_content, sync=False)
+        write_compressed(output_file, wiki_content)
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result["mtime_ns"] = stat.st_mtime_ns
+    result["size"] = stat.st_size
+    result["sha256"] = sha256
+    result["deps"] = sorted(scan_dependencies(tokens, pages_path, included))
+    result["templates"] = {path: list(state) if state else None for path, state in included.items()}
+    links.update(link_target(target) for target in tokenizer.targets(tokens, tokenizer.REDIRECT))
+    result["links"] = sorted(links)
+    return result
+
+
+_worker_args = None
+
+
+def _init_worker(pages_path: str, output_path: str, base_template: str, markdown_cache_path: str):
+    global _worker_args
+    _worker_args = (pages_path, output_path, base_template)
+    parser.markdown_cache.open(markdown_cache_path)
+    parser.markdown_cache.defer_writes()
+
+
+def _convert_in_worker(doc_id: str) -> dict:
+    result = convert_document(doc_id, *_worker_args)
+    # 새로 렌더링한 Markdown 블록은 결과와 함께 부모 프로세스로 보내 거기서 디스크 캐시에 쓴다
+    result["markdown"] = parser.markdown_cache.take_pending()
+    return result
+
+
+class BuildReport:
+    """빌드 결과 요약 (문서별 출력 대신 마지막에 한 번 출력)"""
+
+    def __init__(self):
+        self.converted = []
+        self.skipped = 0
+        self.removed = 0
+        self.failed = {}
+        self.workers = 1
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        text = (f"{len(self.converted)} converted, {self.skipped} unchanged, "
+                f"{len(self.failed)} failed, {self.removed} removed "
+                f"in {self.elapsed:.2f}s ({self.workers} worker{'s' if self.workers > 1 else ''})")
+        for doc_id, error in sorted(self.failed.items()):
+            text += f"\n  failed: {doc_id}: {error}"
+        return text
+
+
+class WikiBuilder:
+    """위키 문서(.opwi)를 HTML로 변환하고, 문서 간 의존 관계를 추적하는 빌드 엔진"""
+
+    def __init__(self, pages_path: str = "./pages", output_path: str = "./templates/doc",
+                 base_template_path: str = "./templates/base.html",
+                 manifest_path: str = "./index/build_manifest.json", workers: int = None,
+                 links_path: str = "./index/links.db", markdown_cache_path: str = "./index/markdown.db"):
+        self.pages_path = pages_path
+        self.output_path = output_path
+        self.base_template_path = base_template_path
+        self.manifest_path = manifest_path
+        self.workers = workers or os.cpu_count() or 1
+        # documents: 문서 ID -> {"mtime_ns", "size", "sha256", "deps"} : 마지막으로 변환한 원본의 상태
+        # templates: 틀 대상 -> {"path", "state"} : 마지막으로 포함한 틀 파일의 [mtime_ns, 크기] (없으면 None)
+        self.manifest = {"version": MANIFEST_VERSION, "base_template": None, "documents": {}, "templates": {}}
+        # 대상(문서 ID 또는 틀 파일 경로) -> 그 대상을 포함하거나 넘겨주기 하는 문서 ID 집합
+        self.dependents = {}
+        # 문서 ID -> 그 문서가 의존하는 대상 집합
+        self.dependencies = {}
+        # 문서 사이의 링크 (역링크, 빨간 링크, 고립된 문서)
+        self.links = LinkGraph(links_path)
+        self.pending_links = {}
+        # 블록별 Markdown 렌더링 결과 (워커 프로세스는 읽기만 하고, 워커가 렌더링한 블록은 collect에서 이 프로세스가 쓴다)
+        self.markdown_cache_path = markdown_cache_path
+        parser.markdown_cache.open(markdown_cache_path)
+        # 전체 빌드 없이 편집만 다시 변환할 때도 저장된 의존 관계로 영향받는 문서만 고른다
+        self.load_manifest()
+
+    def doc_id_from_path(self, opwi_filepath: str) -> str:
+        relative_path = os.path.relpath(opwi_filepath, self.pages_path).replace("\\", "/")
+        return os.path.splitext(relative_path)[0]
+
+    def source_path(self, doc_id: str) -> str:
+        return os.path.join(self.pages_path, f"{doc_id}.opwi")
+
+    def output_file(self, doc_id: str) -> str:
+        return os.path.join(self.output_path, f"{doc_id}.html")
+
+    def load_base_template(self) -> str:
+        with open(self.base_template_path, "r", encoding="utf-8") as file:
+            return file.read()
+
+    def iter_sources(self):
+        """pages 폴더의 모든 .opwi 파일 경로를 정렬된 순서로 반환"""
+        for root, dirs, files in os.walk(self.pages_path):
+            dirs.sort()
+            for doc in sorted(files):
+                if doc.endswith(".opwi"):
+                    yield os.path.join(root, doc)
+
+    def set_dependencies(self, doc_id: str, targets: set):
+        for target in self.dependencies.get(doc_id, ()):
+            users = self.dependents.get(target)
+            if users:
+                users.discard(doc_id)
+                if not users:
+                    del self.dependents[target]
+        self.dependencies[doc_id] = set(targets)
+        for target in targets:
+            self.dependents.setdefault(target, set()).add(doc_id)
+
+    def apply_result(self, result: dict) -> bool:
+        """변환 결과를 의존 관계와 매니페스트에 반영. 링크는 flush_links에서 모아서 반영한다"""
+        if result["status"] != "ok":
+            return False
+        doc_id = result["doc_id"]
+        self.pending_links[doc_id] = result["links"]
+        self.set_dependencies(doc_id, set(result["deps"]))
+        self.record(doc_id, result["mtime_ns"], result["size"], result["sha256"])
+        for path, state in result["templates"].items():
+            self.manifest["templates"][normalize_target(path, self.pages_path)] = {"path": path, "state": state}
+        return True
+
+    def flush_links(self):
+        if self.pending_links:
+            self.links.update(self.pending_links)
+            self.pending_links = {}
+
+    def render_document(self, doc_id: str, base_template: str) -> dict:
+        """문서 하나를 변환하여 원자적으로 저장하고 매니페스트에 기록.
+        convert_document의 결과를 반환한다 (status: "ok", 원본이 없으면 "missing", 실패하면 "error")"""
+        result = convert_document(doc_id, self.pages_path, self.output_path, base_template)
+        if result["status"] == "error":
+            print(f"Warning: failed to convert {doc_id}: {result['error']}")
+        self.apply_result(result)
+        self.flush_links()
+        return result
+
+    def convert_many(self, doc_ids: list, base_template: str, report: BuildReport):
+        """여러 문서를 변환. 문서가 많으면 프로세스 풀에 청크 단위로 나눠 맡긴다.
+        한 번에 제출하는 양을 제한해 메모리를 일정하게 유지하고, 결과는 입력 순서대로 반영한다."""
+        workers = min(self.workers, max(1, len(doc_ids) // PARALLEL_THRESHOLD))
+        report.workers = workers
+        if workers <= 1:
+            results = (convert_document(doc_id, self.pages_path, self.output_path, base_template)
+                       for doc_id in doc_ids)
+            self.collect(results, report)
+            return
+
+        chunksize = max(1, min(64, len(doc_ids) // (workers * 8)))
+        window = workers * chunksize * 4
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.pages_path, self.output_path, base_template,
+                                           self.markdown_cache_path)) as pool:
+            doc_iter = iter(doc_ids)
+            while batch := list(islice(doc_iter, window)):
+                self.collect(pool.map(_convert_in_worker, batch, chunksize=chunksize), report)
+
+    def collect(self, results, report: BuildReport):
+        rendered = {}
+        used = []
+        for result in results:
+            if "markdown" in result:
+                blocks, keys = result.pop("markdown")
+                rendered.update(blocks)
+                used.extend(keys)
+            if self.apply_result(result):
+                report.converted.append(result["doc_id"])
+            elif result["status"] == "error":
+                report.failed[result["doc_id"]] = result["error"]
+            if len(self.pending_links) >= LINK_BATCH:
+                self.flush_links()
+                parser.markdown_cache.store(rendered, used)
+                rendered = {}
+                used = []
+        self.flush_links()
+        parser.markdown_cache.store(rendered, used)
+
+    def remove_output(self, doc_id: str):
+        output_file = self.output_file(doc_id)
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        remove_compressed(output_file)
+        self.set_dependencies(doc_id, set())
+        self.links.update({doc_id: None})
+        self.manifest["documents"].pop(doc_id, None)
+
+    def load_manifest(self):
+        """빌드 매니페스트를 읽어오고, 저장된 의존 관계를 복원"""
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if manifest.get("version") != MANIFEST_VERSION:
+            return
+        self.manifest = manifest
+        for doc_id, entry in manifest["documents"].items():
+            self.set_dependencies(doc_id, set(entry.get("deps", [])))
+
+    def save_manifest(self):
+        storage.write_durable(self.manifest_path, json.dumps(self.manifest, ensure_ascii=False), sync=False)
+
+    def record(self, doc_id: str, mtime_ns: int, size: int, sha256: str):
+        self.manifest["documents"][doc_id] = {
+            "mtime_ns": mtime_ns,
+            "size": size,
+            "sha256": sha256,
+            "deps": sorted(self.dependencies.get(doc_id, ())),
+        }
+
+    def changed_templates(self) -> list:
+        """지난 빌드 이후 내용이 바뀌었거나 새로 생기거나 사라진 틀 대상 목록.
+        더 이상 어느 문서도 포함하지 않는 틀은 매니페스트에서 정리한다."""
+        changed = []
+        templates = self.manifest["templates"]
+        for target in list(templates):
+            if target not in self.dependents:
+                del templates[target]
+                continue
+            state = TemplateResolver.file_state(templates[target]["path"])
+            if (list(state) if state else None) != templates[target]["state"]:
+                changed.append(target)
+        return changed
+
+    def is_unchanged(self, doc_id: str, opwi_filepath: str, stat: os.stat_result):
+        """원본이 지난 빌드와 같으면 (True, 해시), 다르면 (False, 해시)를 반환.
+        mtime과 크기가 같으면 파일을 읽지 않는다."""
+        entry = self.manifest["documents"].get(doc_id)
+        if entry is None or not os.path.exists(self.output_file(doc_id)):
+            return False, None
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return True, entry["sha256"]
+        sha256 = file_hash(opwi_filepath)
+        return sha256 == entry["sha256"], sha256
+
+    @metrics.timed("build")
+    def build_all(self, force: bool = False) -> BuildReport:
+        """모든 문서를 변환. 기존 출력 폴더는 지우지 않고 덮어쓴 뒤 원본이 사라진 파일만 정리.
+        force가 아니면 매니페스트와 비교해 원본과 기본 템플릿이 바뀐 문서만 변환한다."""
+        started = time.perf_counter()
+        report = BuildReport()
+        base_template = self.load_base_template()
+        base_hash = hashlib.sha256(base_template.encode("utf-8")).hexdigest()
+        if base_hash != self.manifest["base_template"]:
+            force = True
+        os.makedirs(self.output_path, exist_ok=True)
+
+        live = set()
+        stale = []
+        for opwi_filepath in self.iter_sources():
+            doc_id = self.doc_id_from_path(opwi_filepath)
+            live.add(doc_id)
+            if force:
+                stale.append(doc_id)
+                continue
+            try:
+                stat = os.stat(opwi_filepath)
+                unchanged, sha256 = self.is_unchanged(doc_id, opwi_filepath, stat)
+            except OSError:
+                # 읽을 수 없는 원본은 변환을 시도해 실패로 보고하고, 이전 출력은 그대로 둔다
+                stale.append(doc_id)
+                continue
+            if unchanged:
+                # 내용은 같고 mtime만 바뀐 경우 다음 시작 때 다시 해시하지 않도록 갱신
+                self.record(doc_id, stat.st_mtime_ns, stat.st_size, sha256)
+            else:
+                stale.append(doc_id)
+
+        # 바뀐 문서나 틀을 포함하거나 넘겨주기 하는 문서도 함께 변환
+        targets = set(stale)
+        for doc_id in stale + ([] if force else self.changed_templates()):
+            targets.update(user for user in self.affected_documents(doc_id) if user in live)
+        # 새로 생기거나 사라진 문서를 가리키는 문서는 링크 색(빨간/파란)이 바뀌므로 다시 변환
+        known = set(self.manifest["documents"])
+        for doc_id in (live - known) | (known - live):
+            targets.update(user for user in self.links.backlinks(doc_id) if user in live)
+        report.skipped = len(live) - len(targets)
+
+        self.convert_many(sorted(targets), base_template, report)
+
+        report.removed = self.prune_outputs(live)
+        for doc_id in list(self.manifest["documents"]):
+            if doc_id not in live:
+                del self.manifest["documents"][doc_id]
+        self.links.retain(live)
+        self.manifest["base_template"] = base_hash
+        self.save_manifest()
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def prune_outputs(self, live_doc_ids: set) -> int:
+        """원본 .opwi가 없는 변환 결과만 개별적으로 삭제"""
+        removed = 0
+        for root, _, files in os.walk(self.output_path):
+            for file in files:
+                if file.endswith(COMPRESSED_SUFFIXES):
+                    # 원본 HTML이 없는 압축 파일 정리
+                    html_file = os.path.join(root, os.path.splitext(file)[0])
+                    if html_file.endswith(".html") and not os.path.exists(html_file):
+                        os.remove(os.path.join(root, file))
+                    continue
+                if not file.endswith(".html"):
+                    continue
+                output_file = os.path.join(root, file)
+                relative_path = os.path.relpath(output_file, self.output_path).replace("\\", "/")
+                doc_id = os.path.splitext(relative_path)[0]
+                if doc_id not in live_doc_ids:
+                    os.remove(output_file)
+                    remove_compressed(output_file)
+                    self.set_dependencies(doc_id, set())
+                    self.links.update({doc_id: None})
+                    removed += 1
+        return removed
+
+    def affected_documents(self, doc_id: str) -> list:
+        """doc_id가 바뀌었을 때 다시 변환해야 하는 문서 목록 (자신 + 포함/넘겨주기 하는 문서)"""
+        affected = [doc_id]
+        seen = {doc_id}
+        queue = [doc_id]
+        while queue:
+            target = queue.pop(0)
+            for user in sorted(self.dependents.get(target, ())):
+                if user not in seen:
+                    seen.add(user)
+                    affected.append(user)
+                    queue.append(user)
+        return affected
+
+    def rebuild(self, doc_id: str) -> dict:
+        """편집된 문서와 그 문서에 의존하는 문서만 다시 변환"""
+        return self.rebuild_many([doc_id])
+
+    @metrics.timed("render")
+    def rebuild_many(self, doc_ids: list) -> dict:
+        """여러 문서가 함께 편집되었을 때, 각 문서와 의존 문서를 합쳐 한 번씩만 다시 변환.
+        변환을 시도한 문서마다 {문서 ID: {"status", "error"}}를 반환한다.
+        원본이 사라진 편집 문서는 출력을 지우고, 변환에 실패한 문서는 이전 출력을 그대로 둔다."""
+        edited = [doc_id.strip("/") for doc_id in doc_ids]
+        targets = []
+        seen = set()
+        for doc_id in edited:
+            for target in self.affected_documents(doc_id):
+                if target not in seen:
+                    seen.add(target)
+                    targets.append(target)
+
+        base_template = self.load_base_template()
+        existed = {doc_id for doc_id in edited if doc_id in self.manifest["documents"]}
+        results = {}
+        for target in targets:
+            result = self.render_document(target, base_template)
+            results[target] = {"status": result["status"], "error": result.get("error")}
+            if result["status"] == "missing" and target in edited:
+                self.remove_output(target)
+
+        # 새로 만들어졌거나 지워진 문서를 가리키는 문서는 빨간/파란 링크가 바뀌므로 다시 변환
+        for doc_id in edited:
+            if (doc_id in existed) == (doc_id in self.manifest["documents"]):
+                continue
+            for user in self.links.backlinks(doc_id):
+                if user not in seen:
+                    seen.add(user)
+                    result = self.render_document(user, base_template)
+                    results[user] = {"status": result["status"], "error": result.get("error")}
+        return results
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import threading
+
+
+def link_target(value: str) -> str:
+    """[[대상]] 의 대상을 문서 ID로 ("/도움말/ " -> "도움말")"""
+    return value.strip().replace("\\", "/").strip("/")
+
+
+class LinkGraph:
+    """문서 사이의 링크 그래프 (SQLite에 저장)
+
+    links(source, target)에 변환할 때 실제로 그린 링크(틀로 포함된 링크, 넘겨주기 포함)를 문서 단위로 교체해 두고,
+    target 색인으로 "여기를 가리키는 문서"를 찾는다. pages에는 변환된(존재하는) 문서를 두어
+    없는 문서를 가리키는 링크(빨간 링크)와 아무도 가리키지 않는 문서(고립된 문서)를 그래프만으로 찾는다."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                doc_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS links (
+                source TEXT NOT NULL,
+                target TEXT NOT NULL,
+                PRIMARY KEY (source, target)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS links_target ON links (target, source);
+        """)
+        self.conn.commit()
+
+    def update(self, documents: dict):
+        """{문서 ID: 링크 대상 목록}을 한 트랜잭션으로 반영. 값이 None이면 문서가 사라진 것"""
+        with self.lock, self.conn:
+            for doc_id, targets in documents.items():
+                self.conn.execute("DELETE FROM links WHERE source = ?", (doc_id,))
+                if targets is None:
+                    self.conn.execute("DELETE FROM pages WHERE doc_id = ?", (doc_id,))
+                    continue
+                self.conn.execute("INSERT OR IGNORE INTO pages (doc_id) VALUES (?)", (doc_id,))
+                self.conn.executemany("INSERT OR IGNORE INTO links (source, target) VALUES (?, ?)",
+                                      ((doc_id, target) for target in targets))
+
+    def retain(self, doc_ids: set):
+        """doc_ids에 없는 문서를 그래프에서 지운다 (전체 빌드 뒤 정리)"""
+        with self.lock:
+            known = [doc_id for (doc_id,) in self.conn.execute("SELECT doc_id FROM pages")]
+        gone = {doc_id: None for doc_id in known if doc_id not in doc_ids}
+        if gone:
+            self.update(gone)
+
+    def links(self, doc_id: str) -> list:
+        with self.lock:
+            return [target for (target,) in self.conn.execute(
+                "SELECT target FROM links WHERE source = ? ORDER BY target", (doc_id,))]
+
+    def backlinks(self, doc_id: str) -> list:
+        """doc_id를 가리키는 다른 문서 목록"""
+        with self.lock:
+            return [source for (source,) in self.conn.execute(
+                "SELECT source FROM links WHERE target = ? AND source != ? ORDER BY source", (doc_id, doc_id))]
+
+    def missing(self, limit: int = 100) -> list:
+        """없는 문서를 가리키는 링크 대상과 가리키는 문서 수 [(대상, 수)], 많이 가리키는 순"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT target, COUNT(*) AS users FROM links WHERE target NOT IN (SELECT doc_id FROM pages) "
+                "GROUP BY target ORDER BY users DESC, target LIMIT ?", (limit,)).fetchall()
+
+    def orphans(self, limit: int = 100) -> list:
+        """다른 문서가 하나도 가리키지 않는 문서 목록"""
+        with self.lock:
+            return [doc_id for (doc_id,) in self.conn.execute(
+                "SELECT doc_id FROM pages WHERE NOT EXISTS "
+                "(SELECT 1 FROM links WHERE target = pages.doc_id AND source != pages.doc_id) "
+                "ORDER BY doc_id LIMIT ?", (limit,))]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,308 @@
+"""Markdown 렌더링 캐시
+
+문서를 최상위 블록(빈 줄로 나뉜 문단, 목록, 인용문, 코드 블록 등)으로 나누고 블록마다 내용 해시로
+렌더링 결과를 캐시한다. 한 섹션만 고친 문서는 바뀐 블록만 다시 렌더링하고, 예전에 렌더링한 적이 있는
+내용(되돌리기, 다른 문서와 같은 블록)은 렌더링하지 않는다.
+
+캐시는 두 단계이다. 메모리(프로세스마다, 바이트 한도의 LRU)와 디스크(SQLite, 여러 프로세스가 함께 쓰며
+바이트 한도를 넘으면 가장 오래 쓰지 않은 블록부터 지운다). 렌더링은 markdown.Markdown 객체 하나를
+reset()해서 다시 쓴다.
+
+블록으로 나눠 렌더링한 결과를 줄바꿈으로 이은 것은 문서 전체를 한 번에 렌더링한 결과와 같아야 하므로,
+빈 줄 너머까지 이어질 수 있는 것(들여쓴 줄, 이어지는 목록 항목, 이어지는 인용문)은 같은 블록에 두고,
+문서 어디에서나 쓸 수 있는 참조 링크 정의나 빈 줄을 넘는 HTML 블록이 있으면 문서 전체를 한 블록으로 본다.
+나눈 블록은 SECTION_CHARS 정도 크기의 섹션으로 묶어 렌더링하고 캐시한다.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import markdown
+from rev_system import metrics
+
+# 프로세스마다 메모리에 두는 렌더링 결과의 최대 바이트
+MEMORY_BYTES = 16 * 1024 * 1024
+# 디스크 캐시의 최대 바이트. 넘으면 가장 오래 쓰지 않은 블록부터 이 비율만큼 남기고 지운다
+DISK_BYTES = 256 * 1024 * 1024
+DISK_KEEP_RATIO = 0.9
+
+# 한 번에 렌더링하는 섹션의 대략적인 최소 글자 수
+SECTION_CHARS = 2048
+TAB_LENGTH = 4
+LIST_ITEM = re.compile(r" {0,3}(?:[*+-]|\d+\.)[ \t]")
+QUOTE = re.compile(r" {0,3}>")
+CODE = re.compile(r" {4}")
+# 참조 링크 정의는 문서 어디에 있어도 모든 블록에 영향을 준다
+REFERENCE = re.compile(r"^ {0,3}\[[^\]]+\]:", re.MULTILINE)
+HTML_BLOCK = re.compile(r"^ {0,3}<", re.MULTILINE)
+
+
+def _any(pattern, lines: list) -> bool:
+    return any(pattern.match(line) for line in lines)
+
+
+def split_blocks(text: str):
+    """최상위 블록 목록. 나눠서 렌더링할 수 없는 문서면 None"""
+    # markdown의 전처리(NormalizeWhitespace)와 같이 줄바꿈, 탭, 공백만 있는 줄을 맞춘다
+    text = text.replace("\r\n", "\n").replace("\r", "\n").expandtabs(TAB_LENGTH)
+    lines = text.split("\n")
+    if "\x02" in text or "\x03" in text or REFERENCE.search(text) or HTML_BLOCK.search(text):
+        return None
+    if lines[0] and not lines[0].strip(" "):
+        return None  # 맨 앞의 공백 줄은 markdown이 빈 줄로 보지 않는다
+    blocks = []  # [줄 목록, 마지막 덩어리]
+    chunk = []
+    blank = 0  # 앞 덩어리와의 사이에 있는 빈 줄 수
+    for line in lines + [""]:
+        if line.strip(" "):
+            chunk.append(line)
+            continue
+        if not chunk:
+            blank += 1
+            continue
+        if blocks and _continues(blocks[-1], chunk, blank):
+            blocks[-1][0].extend([""] * blank + chunk)
+            blocks[-1][1] = chunk
+        else:
+            blocks.append([chunk, chunk])
+        chunk = []
+        blank = 1
+    # 작은 블록을 하나씩 렌더링하면 블록마다 드는 고정 비용이 커지므로 적당한 크기로 묶는다
+    sections = []
+    size = SECTION_CHARS
+    for block, _ in blocks:
+        text = "\n".join(block)
+        if size >= SECTION_CHARS:
+            sections.append([text])
+            size = 0
+        else:
+            sections[-1].append(text)
+        size += len(text)
+    return ["\n\n".join(section) for section in sections]
+
+
+def _continues(block: list, chunk: list, blank: int) -> bool:
+    """빈 줄 너머의 덩어리가 앞 블록에 이어지는지. 잘못 이어 붙여도 결과는 같으므로 애매하면 잇는다"""
+    lines, last = block
+    first = chunk[0]
+    if first[0] == " ":
+        return True  # 들여쓴 줄: 목록 항목의 다음 문단이거나 코드 블록의 연속
+    if LIST_ITEM.match(first) and _any(LIST_ITEM, lines):
+        return True  # 빈 줄을 사이에 둔 목록 항목은 앞 목록에 붙는다
+    if QUOTE.match(first) and _any(QUOTE, lines):
+        return True
+    # 코드 블록 뒤의 빈 줄이 여러 개면 markdown은 그 줄바꿈을 코드 블록에 더한다
+    return blank > 1 and _any(CODE, last)
+
+
+def block_key(block: str) -> bytes:
+    """렌더링 결과의 캐시 키 (markdown 버전이 바뀌면 예전 결과를 쓰지 않는다)"""
+    return hashlib.blake2b(f"{markdown.__version__}\0{block}".encode("utf-8"), digest_size=16).digest()
+
+
+class MarkdownCache:
+    """블록 단위로 캐시하며 Markdown을 HTML로 렌더링 (모듈 설명 참고)"""
+
+    def __init__(self, db_path: str = None, memory_bytes: int = MEMORY_BYTES, disk_bytes: int = DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.entries = OrderedDict()  # 키 -> HTML
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.render_lock = threading.Lock()
+        self.markdown = markdown.Markdown()
+        self.db_path = None
+        self.conn = None
+        self.conn_pid = None
+        self.disk_total = 0  # 디스크 캐시 크기 합의 추정치
+        # fork로 물려받은 연결은 닫으면 부모 프로세스의 잠금이 풀리므로 닫지 않고 들고만 있는다
+        self.inherited = []
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        # defer_writes() 이후에는 디스크에 쓰지 않고 모아 두었다가 take_pending()으로 넘긴다
+        self.deferred = False
+        self.pending = {}  # 키 -> 새로 렌더링한 HTML
+        self.pending_used = set()  # 디스크에서 찾아 사용 시각을 고칠 키
+        if db_path:
+            self.open(db_path)
+
+    def open(self, db_path: str):
+        """디스크 캐시를 쓴다. 연결은 처음 쓸 때 (프로세스마다) 만든다"""
+        with self.lock:
+            self._release()
+            self.db_path = db_path
+
+    def _connection(self):
+        """이 프로세스의 디스크 캐시 연결. 디스크 캐시를 쓰지 않으면 None (self.lock 안에서 호출)"""
+        if self.db_path is None:
+            return None
+        if self.conn is not None and self.conn_pid != os.getpid():
+            self._release()
+            # 부모의 메모리 캐시는 그대로 써도 되지만 통계는 이 프로세스 것만 센다
+            self.hits = self.disk_hits = self.misses = self.evictions = self.disk_evictions = 0
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS blocks (
+                    key BLOB PRIMARY KEY,
+                    html TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    used INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS blocks_used ON blocks (used);
+            """)
+            conn.commit()
+            self.disk_total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+            self.conn = conn
+            self.conn_pid = os.getpid()
+        return self.conn
+
+    @metrics.timed("markdown")
+    def render(self, text: str) -> str:
+        """markdown.markdown(text)와 같은 HTML"""
+        blocks = split_blocks(text)
+        if blocks is None:
+            blocks = [text]
+        keys = [block_key(block) for block in blocks]
+        html = {}
+        with self.lock:
+            for key in keys:
+                value = self.entries.get(key)
+                if value is not None:
+                    self.entries.move_to_end(key)
+                    html[key] = value
+            self.hits += len(html)
+        missing = [key for key in dict.fromkeys(keys) if key not in html]
+        if missing:
+            found = self._load(missing)
+            html.update(found)
+            rendered = {}
+            with self.render_lock:
+                for key, block in zip(keys, blocks):
+                    if key not in html and key not in rendered:
+                        self.markdown.reset()
+                        rendered[key] = self.markdown.convert(block)
+            html.update(rendered)
+            with self.lock:
+                self.disk_hits += len(found)
+                self.misses += len(rendered)
+                for key in missing:
+                    self._remember(key, html[key])
+            self._store(rendered, found)
+        return "\n".join(html[key] for key in keys if html[key])
+
+    def _remember(self, key: bytes, value: str):
+        size = len(value)
+        if size > self.memory_bytes or key in self.entries:
+            return
+        self.entries[key] = value
+        self.total_bytes += size
+        while self.total_bytes > self.memory_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= len(evicted)
+            self.evictions += 1
+
+    def _load(self, keys: list) -> dict:
+        """디스크 캐시에서 찾은 {키: HTML}"""
+        with self.lock:
+            conn = self._connection()
+            if conn is None:
+                return {}
+            found = {}
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                found.update(conn.execute(
+                    f"SELECT key, html FROM blocks WHERE key IN ({','.join('?' * len(batch))})", batch))
+            return found
+
+    def defer_writes(self):
+        """디스크 캐시를 읽기만 하고 쓸 내용은 모아 둔다. 빌드 워커 프로세스가 모두 한 파일에 쓰면
+        쓰기 잠금을 기다리느라 워커를 늘려도 빨라지지 않으므로, 쓰기는 부모 프로세스가 몰아서 한다."""
+        with self.lock:
+            self.deferred = True
+
+    def take_pending(self):
+        """모아 둔 (새로 렌더링한 {키: HTML}, 사용한 키 목록)을 꺼낸다. store()에 그대로 넘긴다"""
+        with self.lock:
+            pending, used = self.pending, list(self.pending_used - self.pending.keys())
+            self.pending = {}
+            self.pending_used = set()
+            return pending, used
+
+    def store(self, rendered: dict, used: list):
+        """다른 프로세스가 렌더링하거나 사용한 블록을 디스크 캐시에 반영"""
+        self._store(rendered, used, defer=False)
+
+    def _store(self, rendered: dict, found, defer: bool = True):
+        """새로 렌더링한 블록을 디스크 캐시에 넣고, 디스크에서 찾은 블록은 사용 시각을 고친다"""
+        with self.lock:
+            if defer and self.deferred:
+                self.pending.update(rendered)
+                self.pending_used.update(found)
+                return
+            conn = self._connection()
+            if conn is None or not (rendered or found):
+                return
+            now = int(time.time())
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO blocks (key, html, size, used) VALUES (?, ?, ?, ?)",
+                                 ((key, value, len(value), now) for key, value in rendered.items()))
+                conn.executemany("UPDATE blocks SET used = ? WHERE key = ?", ((now, key) for key in found))
+            self.disk_total += sum(len(value) for value in rendered.values())
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """디스크 캐시가 한도를 넘었으면 가장 오래 쓰지 않은 블록부터 지운다.
+        크기 합은 연결할 때 한 번 세고 그 뒤로는 넣은 만큼 더해 두었다가, 한도를 넘었을 때만 다시 센다."""
+        if self.disk_total <= self.disk_bytes:
+            return
+        self.disk_total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blocks").fetchone()[0]
+        target = self.disk_total - int(self.disk_bytes * DISK_KEEP_RATIO)
+        while target > 0:
+            rows = conn.execute("SELECT key, size FROM blocks ORDER BY used LIMIT 1000").fetchall()
+            if not rows:
+                break
+            removed = []
+            for key, size in rows:
+                if target <= 0:
+                    break
+                removed.append((key,))
+                target -= size
+                self.disk_total -= size
+            with conn:
+                conn.executemany("DELETE FROM blocks WHERE key = ?", removed)
+            self.disk_evictions += len(removed)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+            }
+
+    def _release(self):
+        """지금 연결을 놓는다. fork로 물려받은 연결은 닫지 않는다 (self.lock 안에서 호출)"""
+        if self.conn is not None:
+            if self.conn_pid == os.getpid():
+                self.conn.close()
+            else:
+                self.inherited.append(self.conn)
+        self.conn = None
+
+    def close(self):
+        with self.lock:
+            self._release()
@@ -1,102 +1,50 @@
-import re
-import json
-import markdown
+import io
+from opwiparser import tokenizer
+from opwiparser.markdown_cache import MarkdownCache
+from opwiparser.template_cache import TemplateResolver
+from rev_system import metrics, reader, replay
+
+# 틀 파일은 mtime이 바뀔 때까지 다시 읽지 않는다
+template_resolver = TemplateResolver()
+# 바뀌지 않은 블록의 Markdown 렌더링 결과를 다시 쓴다 (디스크 캐시는 WikiBuilder가 연다)
+markdown_cache = MarkdownCache()
 
 def parse_opwi(content: str) -> str:
-    """OPWI 파일을 파싱하여 HTML로 변환"""
-    lines = content.split('\n')
-    doc_id = None
-    meta = {}
-    current_block = None
-    content_blocks = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith('DOC:'):
-            doc_id = line[4:]
-        elif line.startswith('META:'):
-            try:
-                meta = json.loads(line[5:])
-            except json.JSONDecodeError:
-                print(f"Warning: Invalid META JSON format in {doc_id}")
-        elif line.startswith('REVBLOCK:START'):
-            current_block = []
-        elif line.startswith('REVBLOCK:END'):
-            if current_block:
-                try:
-                    changes = json.loads(''.join(current_block))
-                    if isinstance(changes, list) and len(changes) > 0:
-                        for change in changes:
-                            if isinstance(change, dict):
-                                for op, text in change.items():
-                                    if op.startswith('+'):
-                                        content_blocks.append(text)
-                                    elif op.startswith('='):
-                                        content_blocks.pop(-1)
-                                        content_blocks.append(text)
-                                    elif op.startswith('-'):
-                                        content_blocks.pop(-1)
-                except json.JSONDecodeError:
-                    print(f"Warning: Invalid CHANGES JSON format in {doc_id}")
-            current_block = None
-        elif line.startswith('CHANGES:'):
-            if current_block is not None:
-                current_block.append(line[8:])
-        elif current_block is not None:
-            current_block.append(line)
-    
+    """OPWI 문자열을 파싱하여 HTML로 변환"""
+    return parse_opwi_file(io.BytesIO(content.encode("utf-8")))
+
+@metrics.timed("parse")
+def parse_opwi_file(f) -> str:
+    """OPWI 파일(바이너리 파일 객체)을 파싱하여 HTML로 변환.
+    파일 전체를 읽지 않고 헤더와 마지막 체크포인트 이후의 레코드만 읽어 (reader.tail_records)
+    Document와 같은 재생 엔진(rev_system.replay)으로 내용을 만든다."""
+    content = replay.replay_content(reader.tail_records(f))
+
     # 마크다운으로 변환
-    content = '\n'.join(content_blocks)
-    html_content = markdown.markdown(content)
-    
+    html_content = markdown_cache.render(content)
+
     return html_content
 
 def parseline(text: str) -> str:
     """한 줄의 위키 문법을 처리하는 함수"""
-    # [[redirect:...]] 처리
-    redirect_pattern = r"\[\[redirect:(.+?)\]\]"
-    if match := re.search(redirect_pattern, text):
-        rep = f'<meta http-equiv="refresh" content="0;url=/doc/{match.group(1)}">'
-        text = re.sub(redirect_pattern, rep, text)
+    return template_resolver.render(tokenizer.tokenize(text))[0]
 
-    # [[...]] 처리
-    link_pattern = r"\[\[(.+?)\]\]"
-    if match := re.search(link_pattern, text):
-        rep = f'<a class="doclink" href="/doc/{match.group(1)}">{match.group(1)}</a>'
-        text = re.sub(link_pattern, rep, text)
+def apply_template(filename: str, content: str, template: str) -> str:
+    """변환된 본문을 기본 템플릿에 적용"""
+    result = template.replace("{{ title }}", filename)
+    result = result.replace("{{ content }}", content)
 
-    # {template:...} 처리
-    template_pattern = r"\{template:(.+?)\}"
-    if match := re.search(template_pattern, text):
-        file_path = match.group(1)
-        try:
-            with open(file_path, "r", encoding="utf-8") as template_file:
-                rep = template_file.read()
-                text = re.sub(template_pattern, rep, text)
-        except FileNotFoundError:
-            text = re.sub(template_pattern, f"[Error: {file_path} not found]", text)
+    return result
 
-    return text
+def parse_tokens(filename: str, tokens: list, template: str) -> str:
+    """토큰 목록(AST)을 기본 템플릿에 적용"""
+    return apply_template(filename, template_resolver.render(tokens)[0], template)
 
 def parse(filename: str, text: str, template: str) -> str:
     """HTML 문서를 기본 템플릿에 적용"""
-    # 위키 문법 처리
-    lines = text.split('\n')
-    processed_lines = [parseline(line) for line in lines]
-    content = '\n'.join(processed_lines)
-    
-    # 템플릿 적용
-    result = template.replace("{{ title }}", filename)
-    result = result.replace("{{ content }}", content)
-    
-    return result
+    # 위키 문법 처리 (문서 전체를 한 번에 토큰화)
+    return parse_tokens(filename, tokenizer.tokenize(text), template)
 
 def parse_frame(text: str):
     """여러 줄의 위키 문법을 처리하는 함수"""
-    lines = text.split("\n")  # 여러 줄로 나누기
-    processed_lines = [parseline(line) for line in lines]  # 각 줄을 변환
-    docs = "\n".join(processed_lines)  # 변환된 줄을 다시 합치기
-    return docs
\ No newline at end of file
+    return template_resolver.render(tokenizer.tokenize(text))[0]
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+
+# 상태를 기억해 두는 최근 문서 수
+STATUS_HISTORY = 1024
+
+
+class RenderQueue:
+    """편집 요청이 HTML 변환을 기다리지 않도록, 변환을 백그라운드 스레드 하나에서 처리하는 작업 대기열
+
+    같은 문서가 변환되기 전에 여러 번 들어오면 한 번만 변환하고, 한 번에 꺼낸 문서들의 의존 문서도
+    합쳐서 한 번씩만 변환한다. 변환 결과는 rename으로 교체되므로 읽는 쪽은 교체 전까지 이전 판을 본다."""
+
+    def __init__(self, builder):
+        self.builder = builder
+        self.cond = threading.Condition()
+        self.pending = OrderedDict()  # 문서 ID -> 처음 요청된 시각
+        self.running = []  # 지금 변환 중인 문서 ID 목록
+        self.jobs = OrderedDict()  # 문서 ID -> {"state", "queued_at", "finished_at", "error"}
+        self.thread = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        with self.cond:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name="render-queue", daemon=True)
+                self.thread.start()
+
+    def submit(self, doc_id: str) -> dict:
+        """문서 변환을 요청하고 바로 반환. 이미 대기 중인 문서면 기존 작업에 합쳐진다"""
+        doc_id = doc_id.strip("/")
+        with self.cond:
+            self.submitted += 1
+            if doc_id in self.pending:
+                self.coalesced += 1
+            else:
+                self.pending[doc_id] = time.time()
+            self._set_status(doc_id, state="queued", queued_at=self.pending[doc_id], error=None)
+            self.cond.notify_all()
+            status = dict(self.jobs[doc_id])
+        self.start()
+        return status
+
+    def _set_status(self, doc_id: str, **fields):
+        job = self.jobs.pop(doc_id, {"state": None, "queued_at": None, "finished_at": None, "error": None})
+        job.update(fields)
+        self.jobs[doc_id] = job
+        while len(self.jobs) > STATUS_HISTORY:
+            self.jobs.popitem(last=False)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                batch = list(self.pending)
+                self.pending.clear()
+                self.running = batch
+                for doc_id in batch:
+                    self._set_status(doc_id, state="rendering")
+
+            error = None
+            results = {}
+            try:
+                results = self.builder.rebuild_many(batch)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                print(f"Warning: background render failed for {', '.join(batch)}: {error}")
+
+            with self.cond:
+                self.running = []
+                for doc_id in batch:
+                    # 변환하는 동안 다시 요청된 문서는 다음 차례에 한 번 더 변환된다
+                    if doc_id in self.pending:
+                        continue
+                    # 빌더는 문서별 변환 실패를 예외로 던지지 않고 결과에 담아 돌려준다
+                    result = results.get(doc_id, {})
+                    failure = error or (result.get("error") if result.get("status") == "error" else None)
+                    self._set_status(doc_id, state="failed" if failure else "done",
+                                     finished_at=time.time(), error=failure)
+                    if failure:
+                        self.failed += 1
+                    else:
+                        self.completed += 1
+                self.cond.notify_all()
+
+    def is_pending(self, doc_id: str) -> bool:
+        doc_id = doc_id.strip("/")
+        with self.cond:
+            return doc_id in self.pending or doc_id in self.running
+
+    def wait(self, doc_id: str = None, timeout: float = None) -> bool:
+        """doc_id(없으면 대기열 전체)의 변환이 끝날 때까지 기다린다. 시간 안에 끝나면 True"""
+        if doc_id is not None:
+            doc_id = doc_id.strip("/")
+        with self.cond:
+            if doc_id is None:
+                return self.cond.wait_for(lambda: not self.pending and not self.running, timeout)
+            return self.cond.wait_for(lambda: doc_id not in self.pending and doc_id not in self.running, timeout)
+
+    def depth(self) -> int:
+        """아직 끝나지 않은 문서 수 (대기 + 변환 중)"""
+        with self.cond:
+            return len(self.pending) + len(self.running)
+
+    def status(self, doc_id: str):
+        with self.cond:
+            job = self.jobs.get(doc_id.strip("/"))
+            return dict(job) if job is not None else None
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {
+                "depth": len(self.pending) + len(self.running),
+                "queued": len(self.pending),
+                "rendering": len(self.running),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
@@ -0,0 +1,84 @@
+import os
+import threading
+from opwiparser import tokenizer
+
+# 틀 안에서 다시 틀을 포함할 수 있는 최대 깊이
+MAX_TEMPLATE_DEPTH = 8
+
+
+class TemplateResolver:
+    """{template:경로} 틀 파일을 읽어 토큰으로 캐시하고, 중첩된 틀까지 펼쳐 렌더링
+
+    파일의 (mtime, 크기)가 캐시에 넣을 때와 같으면 다시 읽지 않는다.
+    렌더링할 때 실제로 포함한 틀 파일과 그 상태를 함께 돌려주어, 빌드가 틀이 바뀐 문서만 다시 변환할 수 있게 한다."""
+
+    def __init__(self, max_depth: int = MAX_TEMPLATE_DEPTH):
+        self.max_depth = max_depth
+        self.entries = {}  # 경로 -> (파일 상태, 토큰 목록)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_state(path: str):
+        """틀 파일의 (mtime_ns, 크기). 파일이 없으면 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, path: str):
+        """틀 파일을 (파일 상태, 토큰 목록)으로 반환. 파일이 없으면 (None, None)"""
+        state = self.file_state(path)
+        if state is None:
+            with self.lock:
+                self.entries.pop(path, None)
+            return None, None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry[0] == state:
+                self.hits += 1
+                return entry
+            self.misses += 1
+        try:
+            with open(path, "r", encoding="utf-8") as template_file:
+                tokens = tokenizer.tokenize(template_file.read())
+        except FileNotFoundError:
+            return None, None
+        with self.lock:
+            self.entries[path] = (state, tokens)
+        return state, tokens
+
+    def render(self, tokens: list, page_exists=None):
+        """토큰 목록을 HTML로 렌더링. (HTML, {포함한 틀 경로: 파일 상태})를 반환.
+        page_exists는 틀 안의 링크까지 모든 링크에 대해 호출된다 (tokenizer.render 참고)."""
+        included = {}
+        return self._render(tokens, [], included, page_exists), included
+
+    def _render(self, tokens: list, stack: list, included: dict, page_exists=None) -> str:
+        return tokenizer.render(tokens, lambda path: self._transclude(path, stack, included, page_exists), page_exists)
+
+    def _transclude(self, path: str, stack: list, included: dict, page_exists=None) -> str:
+        key = os.path.normpath(path)
+        if key in stack:
+            return f"[Error: template cycle {' -> '.join(stack + [key])}]"
+        if len(stack) >= self.max_depth:
+            return f"[Error: template depth limit exceeded at {path}]"
+        state, tokens = self.load(path)
+        # 없는 틀도 기록해 두어야 나중에 파일이 생겼을 때 다시 변환할 수 있다
+        included[path] = state
+        if tokens is None:
+            return f"[Error: {path} not found]"
+        return self._render(tokens, stack + [key], included, page_exists)
+
+    def invalidate(self, path: str = None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(path, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,66 @@
+import re
+from collections import namedtuple
+
+# 문서 전체를 한 번에 훑는 정규식. 순서가 중요하다: [[redirect:...]] 를 [[...]] 보다 먼저 시도한다.
+# .+? 는 줄바꿈을 넘지 않으므로 예전처럼 한 줄 안에서만 문법을 찾는다.
+TOKEN_PATTERN = re.compile(
+    r"\[\[redirect:(?P<redirect>.+?)\]\]"
+    r"|\[\[(?P<link>.+?)\]\]"
+    r"|\{template:(?P<template>.+?)\}"
+)
+
+TEXT = "text"
+LINK = "link"
+REDIRECT = "redirect"
+TEMPLATE = "template"
+
+# kind: TEXT / LINK / REDIRECT / TEMPLATE, value: 일반 글자 또는 링크 대상/틀 경로
+Token = namedtuple("Token", ["kind", "value"])
+
+
+def tokenize(text: str) -> list:
+    """위키 문법을 한 번에 훑어 토큰 목록(AST)으로 만든다"""
+    tokens = []
+    position = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        start = match.start()
+        if start > position:
+            tokens.append(Token(TEXT, text[position:start]))
+        kind = match.lastgroup
+        tokens.append(Token(kind, match.group(kind)))
+        position = match.end()
+    if position < len(text):
+        tokens.append(Token(TEXT, text[position:]))
+    return tokens
+
+
+def read_template_file(file_path: str) -> str:
+    try:
+        with open(file_path, "r", encoding="utf-8") as template_file:
+            return template_file.read()
+    except FileNotFoundError:
+        return f"[Error: {file_path} not found]"
+
+
+def render(tokens: list, resolve_template=read_template_file, page_exists=None) -> str:
+    """토큰 목록을 HTML로 만든다. resolve_template(경로)는 틀 내용을 돌려준다.
+    page_exists(대상)가 있으면 링크마다 호출하고, 없는 문서를 가리키는 링크에는 "missing" 클래스를 붙인다."""
+    parts = []
+    for kind, value in tokens:
+        if kind == TEXT:
+            parts.append(value)
+        elif kind == LINK:
+            if page_exists is not None and not page_exists(value):
+                parts.append(f'<a class="doclink missing" href="/doc/{value}">{value}</a>')
+            else:
+                parts.append(f'<a class="doclink" href="/doc/{value}">{value}</a>')
+        elif kind == REDIRECT:
+            parts.append(f'<meta http-equiv="refresh" content="0;url=/doc/{value}">')
+        elif kind == TEMPLATE:
+            parts.append(resolve_template(value))
+    return "".join(parts)
+
+
+def targets(tokens: list, kind: str) -> list:
+    """특정 종류 토큰의 대상 목록 (링크 대상, 틀 경로 등)"""
+    return [value for token_kind, value in tokens if token_kind == kind]
@@ -0,0 +1,184 @@
+import bisect
+import heapq
+import threading
+
+# 한 번에 돌려주는 최대 제안 수 (접두어별로 이만큼 캐시한다)
+MAX_SUGGESTIONS = 20
+# 접두어에 맞는 항목이 이보다 많으면 매번 훑지 않고 접두어별 상위 목록을 캐시해서 쓴다
+SCAN_LIMIT = 256
+# 정렬 기준: popular(리비전 수, 최근 수정 순), recent(최근 수정 순)
+ORDERS = ("popular", "recent")
+
+HANGUL_BASE = 0xAC00
+HANGUL_LAST = 0xD7A3
+CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+JUNGSEONG = "ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ"
+JONGSEONG = ("", "ㄱ", "ㄲ", "ㄳ", "ㄴ", "ㄵ", "ㄶ", "ㄷ", "ㄹ", "ㄺ", "ㄻ", "ㄼ", "ㄽ", "ㄾ", "ㄿ", "ㅀ",
+             "ㅁ", "ㅂ", "ㅄ", "ㅅ", "ㅆ", "ㅇ", "ㅈ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ")
+# 겹받침/겹모음은 입력 중간 상태("달" -> "닭")와 맞도록 낱자로 나눈다
+COMPOUND_JAMO = {
+    "ㄳ": "ㄱㅅ", "ㄵ": "ㄴㅈ", "ㄶ": "ㄴㅎ", "ㄺ": "ㄹㄱ", "ㄻ": "ㄹㅁ", "ㄼ": "ㄹㅂ", "ㄽ": "ㄹㅅ",
+    "ㄾ": "ㄹㅌ", "ㄿ": "ㄹㅍ", "ㅀ": "ㄹㅎ", "ㅄ": "ㅂㅅ",
+    "ㅘ": "ㅗㅏ", "ㅙ": "ㅗㅐ", "ㅚ": "ㅗㅣ", "ㅝ": "ㅜㅓ", "ㅞ": "ㅜㅔ", "ㅟ": "ㅜㅣ", "ㅢ": "ㅡㅣ",
+}
+
+
+def _syllable_table(convert) -> dict:
+    """한글 음절 11172자를 변환한 str.translate 표"""
+    table = {}
+    for code in range(HANGUL_BASE, HANGUL_LAST + 1):
+        index = code - HANGUL_BASE
+        table[code] = convert(CHOSEONG[index // 588], JUNGSEONG[index % 588 // 28], JONGSEONG[index % 28])
+    return table
+
+
+JAMO_TABLE = _syllable_table(lambda cho, jung, jong: cho + COMPOUND_JAMO.get(jung, jung) + COMPOUND_JAMO.get(jong, jong))
+JAMO_TABLE.update({ord(jamo): parts for jamo, parts in COMPOUND_JAMO.items()})
+CHOSEONG_TABLE = _syllable_table(lambda cho, jung, jong: cho)
+
+
+def to_jamo(text: str) -> str:
+    """소문자로 바꾸고 한글 음절을 낱자(호환용 자모)로 푼다. "한글" -> "ㅎㅏㄴㄱㅡㄹ" """
+    return text.lower().translate(JAMO_TABLE)
+
+
+def to_choseong(text: str) -> str:
+    """한글 음절을 초성으로 바꾼다. "한글 문서" -> "ㅎㄱ ㅁㅅ" """
+    return text.lower().translate(CHOSEONG_TABLE)
+
+
+class TitleIndex:
+    """제목 자동 완성용 접두어 색인
+
+    문서마다 제목의 낱자 키, 초성 키, (제목과 다르면) 문서 ID의 낱자 키를 (키, 문서 ID) 정렬 목록에 넣고,
+    검색어도 낱자로 풀어 이진 탐색으로 접두어 구간을 찾는다. 그래서 "한ㄱ", "하", "ㅎㄱ" 모두 "한글"과 맞는다.
+    구간이 작으면 그 자리에서 점수 상위를 고르고, 크면(짧은 접두어) 접두어별 상위 목록을 캐시한다.
+    문서가 추가/수정되면 그 문서 키의 접두어들에 해당하는 캐시만 고친다."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = []  # 정렬된 (키, 문서 ID)
+        self.entries = {}  # 문서 ID -> (제목, 키 목록, {정렬 기준: 점수})
+        self.top = {}  # (정렬 기준, 접두어) -> 점수 순 문서 ID 목록 (최대 MAX_SUGGESTIONS)
+
+    @staticmethod
+    def document_keys(doc_id: str, title: str) -> list:
+        keys = {to_jamo(title), to_choseong(title), to_jamo(doc_id)}
+        keys.discard("")
+        return sorted(keys)
+
+    @staticmethod
+    def scores(info: dict) -> dict:
+        last_modified = info.get("last_modified") or ""
+        return {"popular": (info.get("revision_count", 0), last_modified), "recent": (last_modified,)}
+
+    def reset(self, documents: dict):
+        """문서 인덱스({문서 ID: 항목}) 전체로 다시 만든다"""
+        entries = {}
+        keys = []
+        for doc_id, info in documents.items():
+            document_keys = self.document_keys(doc_id, info["title"])
+            entries[doc_id] = (info["title"], document_keys, self.scores(info))
+            keys.extend((key, doc_id) for key in document_keys)
+        keys.sort()
+        with self.lock:
+            self.keys = keys
+            self.entries = entries
+            self.top = {}
+
+    def update(self, doc_id: str, info: dict):
+        """문서를 추가하거나 제목/점수가 바뀐 문서를 고친다"""
+        title = info["title"]
+        document_keys = self.document_keys(doc_id, title)
+        scores = self.scores(info)
+        with self.lock:
+            previous = self.entries.get(doc_id)
+            if previous is not None and previous[1] != document_keys:
+                self._remove(doc_id)
+                previous = None
+            if previous is None:
+                for key in document_keys:
+                    bisect.insort(self.keys, (key, doc_id))
+            self.entries[doc_id] = (title, document_keys, scores)
+            for order in ORDERS:
+                for prefix in self._prefixes(document_keys):
+                    self._promote(order, prefix, doc_id, scores[order],
+                                  previous is not None and previous[2][order] > scores[order])
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        entry = self.entries.pop(doc_id, None)
+        if entry is None:
+            return
+        for key in entry[1]:
+            position = bisect.bisect_left(self.keys, (key, doc_id))
+            if position < len(self.keys) and self.keys[position] == (key, doc_id):
+                del self.keys[position]
+        for order in ORDERS:
+            for prefix in self._prefixes(entry[1]):
+                top = self.top.get((order, prefix))
+                if top is not None and doc_id in top:
+                    # 빠진 자리를 채울 문서를 모르므로 다음 조회 때 다시 계산
+                    del self.top[(order, prefix)]
+
+    @staticmethod
+    def _prefixes(document_keys: list) -> set:
+        return {key[:length] for key in document_keys for length in range(1, len(key) + 1)}
+
+    def _promote(self, order: str, prefix: str, doc_id: str, score: tuple, lowered: bool):
+        """캐시된 상위 목록에 점수가 바뀐 문서를 반영"""
+        top = self.top.get((order, prefix))
+        if top is None:
+            return
+        if doc_id in top:
+            if lowered:
+                # 점수가 내려가 목록 밖의 문서보다 낮아졌을 수 있다
+                del self.top[(order, prefix)]
+                return
+            top.remove(doc_id)
+        elif len(top) >= MAX_SUGGESTIONS and self.entries[top[-1]][2][order] >= score:
+            return
+        position = 0
+        while position < len(top) and self.entries[top[position]][2][order] >= score:
+            position += 1
+        top.insert(position, doc_id)
+        del top[MAX_SUGGESTIONS:]
+
+    def _range(self, prefix: str):
+        low = bisect.bisect_left(self.keys, (prefix,))
+        high = bisect.bisect_left(self.keys, (prefix + "\U0010ffff",), low)
+        return low, high
+
+    def _ranked(self, order: str, low: int, high: int) -> list:
+        doc_ids = {doc_id for _, doc_id in self.keys[low:high]}
+        return heapq.nlargest(MAX_SUGGESTIONS, doc_ids, key=lambda doc_id: (self.entries[doc_id][2][order], doc_id))
+
+    def suggest(self, query: str, limit: int = 10, order: str = "popular") -> list:
+        """검색어로 시작하는 제목(낱자/초성 기준)이나 문서 ID를 점수 순으로 [{"id", "title"}].
+        제목이 검색어와 같은 문서는 맨 앞에 둔다."""
+        prefix = to_jamo(query.lstrip())
+        if not prefix.strip():
+            return []
+        if order not in ORDERS:
+            order = ORDERS[0]
+        limit = max(1, min(limit, MAX_SUGGESTIONS))
+        with self.lock:
+            low, high = self._range(prefix)
+            if high - low <= SCAN_LIMIT:
+                ranked = self._ranked(order, low, high)
+            else:
+                ranked = self.top.get((order, prefix))
+                if ranked is None:
+                    ranked = self.top[(order, prefix)] = self._ranked(order, low, high)
+            exact = []
+            position = bisect.bisect_left(self.keys, (prefix,), low, high)
+            while position < high and self.keys[position][0] == prefix and len(exact) < limit:
+                doc_id = self.keys[position][1]
+                if to_jamo(self.entries[doc_id][0]) == prefix and doc_id not in exact:
+                    exact.append(doc_id)
+                position += 1
+            doc_ids = exact + [doc_id for doc_id in ranked if doc_id not in exact]
+            return [{"id": doc_id, "title": self.entries[doc_id][0]} for doc_id in doc_ids[:limit]]
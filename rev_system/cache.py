@@ -0,0 +1,77 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class DocumentCache:
+    """파싱한 Document 객체의 LRU 캐시
+
+    파일의 (mtime, inode, 크기)가 캐시에 넣을 때와 같을 때만 적중으로 보고,
+    항목 수와 바이트(원본 파일 크기 기준) 한도를 넘으면 가장 오래 쓰지 않은 문서부터 내보낸다."""
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # doc_id -> (파일 상태, Document, 전체 이력 여부, 크기)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def file_key(stat: os.stat_result) -> tuple:
+        return stat.st_mtime_ns, stat.st_ino, stat.st_size
+
+    def get(self, doc_id: str, stat: os.stat_result, history: bool = True):
+        """캐시된 문서를 반환. 파일이 바뀌었거나 이력이 필요한데 현재 내용만 있으면 None"""
+        with self.lock:
+            entry = self.entries.get(doc_id)
+            if entry is None or entry[0] != self.file_key(stat) or (history and not entry[2]):
+                self.misses += 1
+                return None
+            self.entries.move_to_end(doc_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, doc_id: str, stat: os.stat_result, doc, history: bool = True):
+        size = stat.st_size
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self._discard(doc_id)
+            self.entries[doc_id] = (self.file_key(stat), doc, history, size)
+            self.total_bytes += size
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, _, _, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, doc_id: str):
+        """문서를 캐시에서 꺼낸다 (수정하기 전에 다른 요청이 같은 객체를 보지 않도록)"""
+        with self.lock:
+            entry = self.entries.get(doc_id)
+            if entry is not None:
+                self._discard(doc_id)
+                self.invalidations += 1
+            return entry
+
+    def invalidate(self, doc_id: str):
+        self.pop(doc_id)
+
+    def _discard(self, doc_id: str):
+        entry = self.entries.pop(doc_id, None)
+        if entry is not None:
+            self.total_bytes -= entry[3]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,131 @@
+"""압축 리비전 프레임
+
+문서 파일을 통째로 다시 쓸 때(codec="zlib") 체크포인트 사이의 리비전들을 FRAME 한 줄로 묶어 저장한다.
+
+    FRAME:<첫 리비전 번호>:<리비전 수>:<CRC32>:<메타데이터>:<본문>
+
+메타데이터는 [[사용자, IP, 시각], ...], 본문은 리비전별 CHANGES 목록이며, 각각 JSON을 zlib으로 압축해
+base64로 적은 뒤 앞에 "z"를 붙인다. 메타데이터와 본문을 따로 압축하므로 이력 목록만 필요할 때는 본문을 풀지 않는다.
+CRC32는 메타데이터와 본문 문자열 전체에 대한 것이다.
+
+본문에서 줄 내용은 같은 프레임 안에서 이미 나온 줄(프레임 시작 시점 내용의 줄 포함)이면 그 줄의 번호(정수)로 대신 적는다.
+프레임은 항상 체크포인트(또는 파일 처음) 바로 뒤에서 시작하므로, 읽는 쪽도 같은 줄 목록을 만들 수 있다.
+"""
+import base64
+import json
+import zlib
+from rev_system import diff
+
+# 이보다 짧은 줄은 번호보다 그대로 적는 편이 짧다
+DEDUP_MIN_LENGTH = 8
+
+
+def compress_payload(value) -> str:
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return "z" + base64.b64encode(zlib.compress(data, 9)).decode("ascii")
+
+
+def decompress_payload(payload: str):
+    if not payload.startswith("z"):
+        raise ValueError("unknown payload encoding")
+    return json.loads(zlib.decompress(base64.b64decode(payload[1:])).decode("utf-8"))
+
+
+def payload_crc(payload: str) -> str:
+    return f"{zlib.crc32(payload.encode('ascii')):08x}"
+
+
+class LinePool:
+    """프레임 안에서 나온 줄 목록 (줄 -> 번호)"""
+
+    def __init__(self, base_content: str):
+        self.lines = []
+        self.numbers = {}
+        for line in diff.split_lines(base_content):
+            self.add(line)
+
+    def add(self, line: str):
+        if line not in self.numbers:
+            self.numbers[line] = len(self.lines)
+            self.lines.append(line)
+
+    def encode(self, line: str):
+        number = self.numbers.get(line)
+        self.add(line)
+        if number is not None and len(line) >= DEDUP_MIN_LENGTH:
+            return number
+        return line
+
+    def decode(self, value):
+        if isinstance(value, int):
+            return self.lines[value]
+        self.add(value)
+        return value
+
+
+def _map_lines(changes: list, convert) -> list:
+    """diff 형식(값이 줄 목록)의 변경만 줄 단위로 변환. 예전 형식은 그대로 둔다"""
+    if not diff.is_replayable(changes):
+        return changes
+    return [{op: [convert(line) for line in lines] for op, lines in change.items()} for change in changes]
+
+
+def encode_frame(first_revision: int, revisions: list, base_content: str) -> str:
+    """revisions(first_revision 번부터)를 FRAME 줄 하나로 만든다. base_content는 프레임 시작 시점의 내용"""
+    pool = LinePool(base_content)
+    metadata = [[rev["username"], rev["ip_address"], rev.get("timestamp")] for rev in revisions]
+    bodies = [_map_lines(rev["changes"], pool.encode) for rev in revisions]
+    payload = f"{compress_payload(metadata)}:{compress_payload(bodies)}"
+    return f"FRAME:{first_revision}:{len(revisions)}:{payload_crc(payload)}:{payload}"
+
+
+def _split_frame(line: str):
+    """(첫 리비전 번호, 리비전 수, 메타데이터, 본문). 형식이나 체크섬이 틀리면 None"""
+    try:
+        first, count, crc, metadata, body = line[len("FRAME:"):].split(":", 4)
+        if crc != payload_crc(f"{metadata}:{body}"):
+            return None
+        return int(first), int(count), metadata, body
+    except ValueError:
+        return None
+
+
+def frame_header(line: str):
+    """체크섬 확인이나 압축 해제 없이 (첫 리비전 번호, 리비전 수)"""
+    try:
+        first, count = line[len("FRAME:"):].split(":", 2)[:2]
+        return int(first), int(count)
+    except ValueError:
+        return None
+
+
+def verify_frame(line: str) -> bool:
+    return _split_frame(line) is not None
+
+
+def frame_metadata(line: str):
+    """본문을 풀지 않고 [{"username", "ip_address", "timestamp"}, ...]. 깨진 프레임이면 None"""
+    parts = _split_frame(line)
+    if parts is None:
+        return None
+    return [{"username": username, "ip_address": ip_address, "timestamp": timestamp}
+            for username, ip_address, timestamp in decompress_payload(parts[2])]
+
+
+def decode_frame(line: str, base_content: str):
+    """프레임의 리비전 목록 [{"username", "ip_address", "timestamp", "changes"}, ...]. 깨진 프레임이면 None"""
+    parts = _split_frame(line)
+    if parts is None:
+        return None
+    metadata = decompress_payload(parts[2])
+    bodies = decompress_payload(parts[3])
+    pool = LinePool(base_content)
+    revisions = []
+    for (username, ip_address, timestamp), changes in zip(metadata, bodies):
+        revisions.append({
+            "username": username,
+            "ip_address": ip_address,
+            "timestamp": timestamp,
+            "changes": _map_lines(changes, pool.decode),
+        })
+    return revisions
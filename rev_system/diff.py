@@ -0,0 +1,207 @@
+"""줄 단위 diff와 리비전 변경 내용(CHANGES) 적용
+
+변경 내용은 예전 내용의 줄 번호 기준 구간 목록이다. 각 항목은 {"<종류><시작 줄>:<지운 줄 수>": [새 줄 목록]}.
+  "+3:0": ["a"]        3번 줄 앞에 줄 추가
+  "-3:2": []           3번 줄부터 두 줄 삭제
+  "~3:2": ["a", "b"]   3번 줄부터 두 줄을 바꿈
+구간은 겹치지 않고 시작 줄 순서로 정렬되어 있으므로, 뒤에서부터 적용하면 앞쪽 줄 번호가 바뀌지 않는다.
+줄은 "\\n" 기준으로 나누므로 마지막 줄바꿈과 "\\r"까지 그대로 복원된다.
+"""
+
+# 공통 줄이 하나뿐인 구간이 없을 때 쓰는 Myers 탐색의 최대 편집 거리. 넘으면 구간 전체를 바꾼 것으로 본다.
+MAX_EDIT_COST = 1000
+
+
+def split_lines(text: str) -> list:
+    return text.split("\n") if text else []
+
+
+def join_lines(lines: list) -> str:
+    return "\n".join(lines)
+
+
+def _myers(a: list, alo: int, ahi: int, b: list, blo: int, bhi: int, matches: list) -> bool:
+    """Myers O(ND) 알고리즘으로 최장 공통 부분열을 찾아 matches에 (a 줄, b 줄)을 추가.
+    편집 거리가 MAX_EDIT_COST를 넘으면 아무것도 추가하지 않고 False"""
+    n = ahi - alo
+    m = bhi - blo
+    max_cost = min(n + m, MAX_EDIT_COST)
+    offset = max_cost + 1
+    v = [0] * (2 * max_cost + 3)
+    trace = []
+    for d in range(max_cost + 1):
+        trace.append(v[:])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                _backtrack(trace, offset, n, m, alo, blo, matches)
+                return True
+    return False
+
+
+def _backtrack(trace: list, offset: int, x: int, y: int, alo: int, blo: int, matches: list):
+    for d in range(len(trace) - 1, -1, -1):
+        v = trace[d]
+        k = x - y
+        if d == 0:
+            prev_x = prev_y = 0
+        else:
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                prev_k = k + 1
+            else:
+                prev_k = k - 1
+            prev_x = v[offset + prev_k]
+            prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+
+
+def _unique_anchors(a: list, alo: int, ahi: int, b: list, blo: int, bhi: int) -> list:
+    """양쪽 구간에 한 번씩만 나오는 줄 중에서 순서가 맞는 가장 긴 목록 (patience diff)"""
+    counts = {}
+    for i in range(alo, ahi):
+        entry = counts.get(a[i])
+        counts[a[i]] = [1, i, None] if entry is None else [entry[0] + 1, i, None]
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is not None and entry[0] == 1:
+            entry[2] = j if entry[2] is None else -1
+    pairs = [(entry[1], entry[2]) for entry in counts.values()
+             if entry[0] == 1 and entry[2] is not None and entry[2] >= 0]
+    if not pairs:
+        return []
+    pairs.sort()
+
+    # b 줄 번호의 최장 증가 부분열 (patience sorting)
+    piles = []  # 각 더미 맨 위의 b 줄 번호
+    tops = []  # 각 더미 맨 위의 pairs 위치
+    previous = [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        low, high = 0, len(piles)
+        while low < high:
+            middle = (low + high) // 2
+            if piles[middle] < j:
+                low = middle + 1
+            else:
+                high = middle
+        if low > 0:
+            previous[index] = tops[low - 1]
+        if low == len(piles):
+            piles.append(j)
+            tops.append(index)
+        else:
+            piles[low] = j
+            tops[low] = index
+    anchors = []
+    index = tops[-1]
+    while index != -1:
+        anchors.append(pairs[index])
+        index = previous[index]
+    anchors.reverse()
+    return anchors
+
+
+def match_lines(a: list, b: list) -> list:
+    """두 줄 목록에서 같다고 볼 줄 쌍 (a 줄, b 줄)을 순서대로 반환.
+    공통 앞뒤를 잘라내고, 한 번씩만 나오는 줄을 기준점으로 나눈 뒤(patience), 나머지 구간은 Myers로 맞춘다."""
+    # 줄을 정수로 바꿔 비교를 싸게 한다
+    table = {}
+    a = [table.setdefault(line, len(table)) for line in a]
+    b = [table.setdefault(line, len(table)) for line in b]
+
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            for i, j in anchors:
+                matches.append((i, j))
+                stack.append((alo, i, blo, j))
+                alo, blo = i + 1, j + 1
+            stack.append((alo, ahi, blo, bhi))
+        else:
+            _myers(a, alo, ahi, b, blo, bhi, matches)
+    matches.sort()
+    return matches
+
+
+def diff(old_text: str, new_text: str) -> list:
+    """예전 내용을 새 내용으로 바꾸는 변경 목록 (모듈 설명의 형식)"""
+    a = split_lines(old_text)
+    b = split_lines(new_text)
+    changes = []
+    i = j = 0
+    for next_i, next_j in match_lines(a, b) + [(len(a), len(b))]:
+        if next_i > i or next_j > j:
+            count = next_i - i
+            lines = b[j:next_j]
+            kind = "+" if count == 0 else "-" if not lines else "~"
+            changes.append({f"{kind}{i}:{count}": lines})
+        i, j = next_i + 1, next_j + 1
+    return changes
+
+
+def hunks(old_text: str, new_text: str) -> list:
+    """화면에 보여줄 변경 구간 목록 [(예전 내용의 시작 줄, 지운 줄 목록, 새 줄 목록)]"""
+    old_lines = split_lines(old_text)
+    result = []
+    for change in diff(old_text, new_text):
+        for op, lines in change.items():
+            start, count = parse_op(op)
+            result.append((start, old_lines[start:start + count], lines))
+    return result
+
+
+def parse_op(op: str):
+    """"~3:2" -> (3, 2)"""
+    start, count = op[1:].split(":")
+    return int(start), int(count)
+
+
+def is_replayable(changes: list) -> bool:
+    """이 모듈의 형식인지 확인 (예전 형식은 "+0|0|5" 처럼 '|'로 나눈 키에 문자열 값)"""
+    for change in changes:
+        if not isinstance(change, dict):
+            return False
+        for op, lines in change.items():
+            if "|" in op or ":" not in op or not isinstance(lines, list):
+                return False
+    return True
+
+
+def apply(text: str, changes: list) -> str:
+    """변경 목록을 적용한 내용. 구간이 내용 범위를 벗어나면 ValueError"""
+    lines = split_lines(text)
+    hunks = []
+    for change in changes:
+        for op, new_lines in change.items():
+            start, count = parse_op(op)
+            hunks.append((start, count, new_lines))
+    for start, count, new_lines in reversed(hunks):
+        if start < 0 or count < 0 or start + count > len(lines):
+            raise ValueError(f"change {start}:{count} is outside of {len(lines)} lines")
+        lines[start:start + count] = new_lines
+    return join_lines(lines)
@@ -1,8 +1,36 @@
+import io
 import json
 import os
 import uuid
 from datetime import datetime
-import difflib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from rev_system import codec, diff, metrics, reader, replay, storage
+from rev_system.autocomplete import TitleIndex
+from rev_system.cache import DocumentCache
+from rev_system.index_store import IndexStore
+from rev_system.listing import DocumentListing, namespace_of
+from rev_system.locking import DocumentLocks
+from rev_system.merge import merge3
+from rev_system.revision_index import RevisionIndex
+from rev_system.search_index import SearchIndex
+
+# 체크포인트를 남기는 간격: 마지막 체크포인트 이후 리비전 수 또는 변경 내용 크기
+CHECKPOINT_EVERY = 50
+CHECKPOINT_BYTES = 64 * 1024
+# 시작할 때 pages 폴더를 훑고 바뀐 문서를 읽는 스레드 수
+SCAN_WORKERS = 8
+# 문서 파일을 통째로 쓸 때 쓸 수 있는 저장 방식: None(텍스트 레코드), "zlib"(압축 프레임, rev_system.codec)
+CODECS = (None, "zlib")
+
+class EditConflict(Exception):
+    """편집을 시작한 뒤 다른 사람이 같은 문서를 고쳤고, 두 편집을 자동으로 합칠 수 없을 때"""
+
+    def __init__(self, doc_id: str, revision_count: int, content: str):
+        super().__init__(f"{doc_id} was modified by someone else (now at revision {revision_count})")
+        self.doc_id = doc_id
+        self.revision_count = revision_count
+        self.content = content
 
 class Document:
     def __init__(self, title: str, namespace: str = "main"):
@@ -15,6 +43,30 @@ class Document:
         self.content = ""
         self.contributors = set()
         self.revisions = []
+        # 리비전 번호 -> 그 리비전까지 적용한 전체 내용
+        self.checkpoints = {}
+        # 체크포인트부터 읽었을 때 앞쪽에 읽지 않은 리비전 수
+        self.history_offset = 0
+
+    @property
+    def revision_count(self) -> int:
+        return self.history_offset + len(self.revisions)
+
+    def needs_checkpoint(self) -> bool:
+        """마지막 체크포인트 이후 리비전 수나 변경 내용이 기준을 넘었는지 확인"""
+        last = max(self.checkpoints, default=0)
+        since = self.revisions[max(0, last - self.history_offset):]
+        if len(since) >= CHECKPOINT_EVERY:
+            return True
+        # 예전 형식 리비전은 정확히 다시 적용할 수 없으므로, 그 뒤의 리비전은 체크포인트에서 시작하게 한다
+        if any(not diff.is_replayable(rev["changes"]) for rev in since):
+            return True
+        return sum(len(json.dumps(rev["changes"], ensure_ascii=False)) for rev in since) >= CHECKPOINT_BYTES
+
+    def add_checkpoint(self) -> tuple:
+        """현재 내용을 체크포인트로 기록하고 (리비전 번호, 내용)을 반환"""
+        self.checkpoints[self.revision_count] = self.content
+        return self.revision_count, self.content
     
     def add_content(self, content: str, username: str, ip_address: str):
         """문서에 내용을 추가합니다."""
@@ -23,9 +75,7 @@ class Document:
         # 마크다운 문서로 저장
         self.content = content
         
-        changes = [{
-            f"+0|0|{len(content)}": content
-        }]
+        changes = diff.diff("", content)
         
         revision = {
             "doc_id": self.doc_id,
@@ -63,26 +113,19 @@ class Document:
         
         return revision
 
+    @metrics.timed("diff")
     def diff_lines(self, old_text: str, new_text: str):
-        """기존 텍스트와 새 텍스트의 변경 사항을 감지하여 리스트 반환"""
-        old_lines = old_text.splitlines()
-        new_lines = new_text.splitlines()
-        differ = difflib.Differ()
-        diff_result = list(differ.compare(old_lines, new_lines))
-        
-        changes = []
-        for i, line in enumerate(diff_result):
-            if line.startswith("+ "):  # 추가된 줄
-                changes.append({f"+{i}|{len(line[2:])}": line[2:]})
-            elif line.startswith("- "):  # 삭제된 줄
-                changes.append({f"-{i}|{len(line[2:])}": line[2:]})
-            elif line.startswith("? "):  # 수정된 줄 (추가 & 삭제가 모두 포함될 경우)
-                continue
-
-        return changes
+        """기존 텍스트와 새 텍스트의 변경 사항을 감지하여 리스트 반환 (rev_system.diff 형식)"""
+        return diff.diff(old_text, new_text)
     
-    def to_opwi(self) -> str:
-        """문서를 OPWI 형식으로 변환합니다."""
+    @metrics.timed("encode")
+    def to_opwi(self, codec_name: str = None) -> str:
+        """문서를 OPWI 형식으로 변환합니다.
+        codec_name이 "zlib"이면 체크포인트 사이의 리비전을 압축 프레임 한 줄로 묶고 체크포인트도 압축한다."""
+        if self.history_offset:
+            raise ValueError("체크포인트부터 읽은 문서는 전체 OPWI로 저장할 수 없습니다")
+        if codec_name not in CODECS:
+            raise ValueError(f"unknown codec: {codec_name}")
         meta = {
             "title": self.title,
             "created_at": self.created_at,
@@ -96,149 +139,341 @@ class Document:
             f"META:{json.dumps(meta, ensure_ascii=False)}"
         ]
         
+        if codec_name == "zlib":
+            content.extend(self._encode_frames())
+            return "\n".join(content) + "\n"
+
         # 모든 리비전 추가
-        for revision in self.revisions:
-            content.extend([
-                f"REVUSER:{revision['username']}:{revision['ip_address']}",
-                "REVBLOCK:START",
-                f"CHANGES:{json.dumps(revision['changes'], ensure_ascii=False)}",
-                "REVBLOCK:END"
-            ])
+        for number, revision in enumerate(self.revisions, start=1):
+            content.extend(storage.encode_revision(revision))
+            if number in self.checkpoints:
+                content.append(storage.encode_checkpoint(number, self.checkpoints[number]))
         
-        return "\n".join(content)
+        return "\n".join(content) + "\n"
+
+    def _encode_frames(self) -> list:
+        """체크포인트마다 그 앞의 리비전들을 프레임 하나로 묶는다"""
+        lines = []
+        first = 1
+        base = ""
+        for number in range(1, len(self.revisions) + 1):
+            if number in self.checkpoints or number == len(self.revisions):
+                lines.append(codec.encode_frame(first, self.revisions[first - 1:number], base))
+                first = number + 1
+            if number in self.checkpoints:
+                base = self.checkpoints[number]
+                lines.append(storage.encode_checkpoint(number, base, compress=True))
+        return lines
     
+    @classmethod
+    @metrics.timed("storage_read")
+    def load(cls, path: str, history: bool = True) -> 'Document':
+        """파일에서 문서를 로드합니다.
+        history가 False면 마지막 체크포인트 이후만 읽어 현재 내용을 만든다 (앞쪽 리비전은 revisions에 없음)."""
+        with open(path, "rb") as f:
+            return cls.from_records(reader.read_records(f) if history else reader.tail_records(f))
+
+    @classmethod
+    @metrics.timed("storage_read")
+    def load_revision(cls, path: str, revision_number: int, start_offset: int = None):
+        """revision_number 번째(1부터) 리비전 시점의 내용을 반환.
+        가장 가까운 이전 체크포인트부터 그 리비전까지만 적용한다.
+        start_offset: 그 체크포인트 줄의 바이트 위치를 알면(리비전 색인) 파일 앞부분을 읽지 않는다."""
+        lines = storage.read_until_revision(path, revision_number, start_offset)
+        doc = cls.from_lines(lines, limit=revision_number)
+        if doc is None or doc.revision_count < revision_number:
+            return None
+        return doc.content
+
     @classmethod
     def from_opwi(cls, content: str) -> 'Document':
         """OPWI 형식에서 문서를 로드합니다."""
-        lines = content.split('\n')
+        return cls.from_lines(io.StringIO(content))
+
+    @staticmethod
+    def iter_revisions(path: str):
+        """리비전 본문을 풀지 않고 리비전 번호, 사용자, IP, 시각만 차례로 읽는다"""
+        return reader.iter_revision_metadata(path)
+
+    def content_sizes(self) -> list:
+        """리비전마다 그 리비전까지 적용한 내용의 글자 수"""
+        if self.history_offset:
+            raise ValueError("체크포인트부터 읽은 문서는 리비전별 크기를 알 수 없습니다")
+        buffer = replay.LineBuffer()
+        sizes = []
+        for number, revision in enumerate(self.revisions, start=1):
+            try:
+                buffer.apply(revision["changes"])
+            except ValueError:
+                pass
+            if number in self.checkpoints:
+                buffer.reset(self.checkpoints[number])
+            sizes.append(buffer.size)
+        return sizes
+
+    @classmethod
+    def from_lines(cls, lines, limit: int = None) -> 'Document':
+        """OPWI 줄 목록(또는 바이너리 파일 객체)에서 문서를 로드합니다."""
+        return cls.from_records(reader.read_records(lines), limit)
+
+    @classmethod
+    def from_records(cls, records, limit: int = None) -> 'Document':
+        """reader.read_records의 레코드에서 문서를 로드합니다. 내용은 rev_system.replay로 재구성하며,
+        체크포인트가 있으면 그 내용에서 이어서 적용한다. limit이 있으면 그 번호의 리비전까지만 적용하고 나머지는 읽지 않는다."""
         doc = None
-        meta = {}
-        current_block = None
-        current_revision = None
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            if line.startswith('DOC:'):
+        buffer = replay.LineBuffer()
+
+        for kind, value in replay.replay(records, buffer):
+            if kind == reader.DOC:
                 doc = cls("", "")  # 임시 제목과 네임스페이스
-                doc.doc_id = line[4:]
-            elif line.startswith('META:'):
-                try:
-                    meta = json.loads(line[5:])
-                    if doc:
-                        doc.title = meta.get("title", "")
-                        doc.namespace = meta.get("namespace", "main")
-                        doc.created_at = meta.get("created_at", "")
-                        doc.tags = meta.get("tags", [])
-                        doc.category = meta.get("category", "")
-                except json.JSONDecodeError:
-                    print(f"Warning: Invalid META JSON format")
-            elif line.startswith('REVUSER:'):
-                parts = line[8:].split(':')
-                if len(parts) == 2:
-                    current_revision = {
-                        "username": parts[0],
-                        "ip_address": parts[1],
-                        "doc_id": doc.doc_id if doc else None,
-                        "timestamp": None,
-                        "changes": None
-                    }
-            elif line.startswith('REVBLOCK:START'):
-                current_block = []
-            elif line.startswith('REVBLOCK:END'):
-                if current_block and current_revision:
-                    try:
-                        changes = json.loads(''.join(current_block))
-                        if isinstance(changes, list) and len(changes) > 0:
-                            current_revision["changes"] = changes
-                            if doc:
-                                doc.revisions.append(current_revision)
-                                doc.contributors.add(current_revision["username"])
-                                # 마지막 변경 내용을 현재 내용으로 설정
-                                for change in changes:
-                                    if isinstance(change, dict):
-                                        for op, text in change.items():
-                                            if op.startswith('+') or op.startswith('='):
-                                                doc.content = text
-                    except json.JSONDecodeError:
-                        print(f"Warning: Invalid CHANGES JSON format")
-                current_block = None
-                current_revision = None
-            elif line.startswith('CHANGES:'):
-                if current_block is not None:
-                    current_block.append(line[8:])
-            elif current_block is not None:
-                current_block.append(line)
-        
+                doc.doc_id = value
+            elif not doc:
+                continue
+            elif kind == reader.META:
+                doc.title = value.get("title", "")
+                doc.namespace = value.get("namespace", "main")
+                doc.created_at = value.get("created_at", "")
+                doc.tags = value.get("tags", [])
+                doc.category = value.get("category", "")
+            elif kind == reader.CHECKPOINT:
+                revision_number, text = value
+                if not doc.revisions:
+                    doc.history_offset = revision_number  # 체크포인트부터 읽는 경우
+                doc.checkpoints[revision_number] = text
+            elif kind == reader.REVISION:
+                doc.revisions.append(value)
+                doc.contributors.add(value["username"])
+                if limit is not None and doc.revision_count >= limit:
+                    break
+
+        if doc:
+            doc.content = buffer.text
         return doc
 
 class DocumentManager:
-    def __init__(self, base_path: str = "."):
+    def __init__(self, base_path: str = ".", storage_mode: str = "append", compact_every: int = 0,
+                 cache_entries: int = 512, cache_bytes: int = 64 * 1024 * 1024, codec: str = None):
+        """storage_mode: "append"는 새 리비전을 파일 끝에 덧붙이고, "rewrite"는 매번 파일 전체를 다시 쓴다.
+        compact_every: 0보다 크면 리비전이 이 수의 배수가 될 때마다 파일을 정리해서 다시 쓴다.
+        cache_entries, cache_bytes: 파싱한 문서를 메모리에 보관하는 LRU 캐시의 한도
+        codec: "zlib"이면 파일을 통째로 쓸 때 리비전을 압축 프레임으로 저장한다 (rev_system.codec).
+        덧붙이기 방식에서는 새 리비전을 텍스트로 덧붙였다가 체크포인트를 남길 때 파일을 다시 써서 프레임으로 묶는다."""
+        if codec not in CODECS:
+            raise ValueError(f"unknown codec: {codec}")
         self.base_path = base_path
+        self.storage_mode = storage_mode
+        self.compact_every = compact_every
+        self.codec = codec
+        self.cache = DocumentCache(cache_entries, cache_bytes)
+        # 예전 형식의 JSON 인덱스 (처음 실행할 때 가져오기만 한다)
         self.index_path = os.path.join(base_path, "index", "document_index.json")
+        self.store = IndexStore(os.path.join(base_path, "index", "documents.db"))
         self.pages_path = os.path.join(base_path, "pages")
+        self.search_index = SearchIndex(os.path.join(base_path, "index", "search.db"))
+        self.revision_index = RevisionIndex(os.path.join(base_path, "index", "revisions.db"))
+        # 문서를 고치는 동안 같은 문서를 고치려는 다른 스레드/프로세스를 막는다
+        self.locks = DocumentLocks(os.path.join(base_path, "index", "locks"))
+        self.refresh_lock = threading.Lock()
+        # /api/docs 용 정렬된 문서 ID 목록
+        self.listing = DocumentListing()
+        # 제목 자동 완성 색인
+        self.titles = TitleIndex()
         self.load_index()
+        self.sync_search_index()
 
+    @metrics.timed("index_load")
     def load_index(self):
-        """문서 인덱스를 로드하고, 하위 폴더까지 자동으로 검색"""
-        if os.path.exists(self.index_path):
-            with open(self.index_path, "r", encoding="utf-8") as f:
-                self.index = json.load(f)
-        else:
-            self.index = {
-                "last_updated": datetime.now().isoformat(),
-                "documents": {},
-                "namespaces": {}
-            }
-        
-        # 모든 문서를 재귀적으로 탐색하여 인덱스 업데이트
-        self.index["documents"] = {}
-        for root, _, files in os.walk(self.pages_path):
-            namespace = os.path.relpath(root, self.pages_path).replace("\\", "/")  # 네임스페이스 경로 저장
+        """문서 인덱스를 로드하고, pages 폴더와 비교해 바뀐 문서만 다시 읽는다"""
+        if self.store.is_empty():
+            # 예전 JSON 인덱스가 있으면 한 번 가져온다
+            self.store.import_json(self.index_path)
+        self.index_version = self.store.data_version()
+        self.index_sequence = self.store.last_sequence()
+        self.index = self.store.load()
+        self.reconcile_index()
+        self.listing.reset(self.index["documents"])
+        self.titles.reset(self.index["documents"])
+
+    def refresh_index(self) -> bool:
+        """다른 프로세스가 인덱스를 바꿨으면 바뀐 항목만 다시 읽는다. 바뀐 것이 없으면 DB 값 하나만 확인한다."""
+        with self.refresh_lock:
+            version = self.store.data_version()
+            if version == self.index_version:
+                return False
+            self.index_version = version
+            changes = self.store.changes_since(self.index_sequence)
+            if changes is None or any(kind == "reset" for _, kind, _ in changes):
+                self.index_sequence = self.store.last_sequence()
+                self.index = self.store.load()
+                self.listing.reset(self.index["documents"])
+                self.titles.reset(self.index["documents"])
+                return True
+            for sequence, kind, name in changes:
+                self.index_sequence = sequence
+                if kind == "document":
+                    info = self.store.load_document(name)
+                    if info is None:
+                        self.index["documents"].pop(name, None)
+                        self.cache.invalidate(name)
+                        self.listing.remove(name)
+                        self.titles.remove(name)
+                    else:
+                        self.index["documents"][name] = info
+                        self.listing.add(name)
+                        self.titles.update(name, info)
+                elif kind == "namespace":
+                    info = self.store.load_namespace(name)
+                    if info is not None:
+                        self.index["namespaces"][name] = info
+            return True
+
+    def _scan_directory(self, path: str):
+        """폴더 하나의 .opwi 파일 상태와 하위 폴더 목록"""
+        files = []
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(".opwi"):
+                    stat = entry.stat()
+                    files.append((entry.path, stat.st_mtime_ns, stat.st_size))
+        return path, files, subdirs
+
+    def scan_pages(self):
+        """pages 폴더를 폴더 단위로 나눠 병렬로 훑는다.
+        (문서 ID -> (상대 경로, 네임스페이스, 제목, mtime, 크기), 네임스페이스 목록)을 반환"""
+        found = {}
+        namespaces = []
+        if not os.path.isdir(self.pages_path):
+            return found, namespaces
+
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            running = {pool.submit(self._scan_directory, self.pages_path)}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    root, files, subdirs = future.result()
+                    running.update(pool.submit(self._scan_directory, subdir) for subdir in subdirs)
+                    namespace = os.path.relpath(root, self.pages_path).replace("\\", "/")  # 네임스페이스 경로 저장
+                    namespaces.append(namespace)
+                    for doc_path, mtime_ns, size in files:
+                        doc_relative_path = os.path.relpath(doc_path, self.pages_path).replace("\\", "/")  # 상대 경로 사용
+                        doc_id = os.path.splitext(doc_relative_path)[0]  # `.opwi` 확장자 제거
+                        title = os.path.splitext(os.path.basename(doc_path))[0]
+                        found[doc_id] = (doc_relative_path, namespace, title, mtime_ns, size)
+        return found, namespaces
+
+    def read_document_info(self, doc_id: str, scanned: tuple) -> dict:
+        """문서 파일을 읽어 인덱스 항목을 만든다 (생성 시각, 마지막 수정, 리비전 수, 기여자)"""
+        doc_relative_path, namespace, title, mtime_ns, size = scanned
+        previous = self.index["documents"].get(doc_id, {})
+        modified = datetime.fromtimestamp(mtime_ns / 1e9).isoformat()
+        info = {
+            "title": previous.get("title", title),
+            "path": doc_relative_path,
+            "namespace": previous.get("namespace", namespace),
+            "created_at": modified,
+            "last_modified": modified,
+            "revision_count": 0,
+            "contributors": [],
+            "mtime_ns": mtime_ns,
+            "size": size,
+        }
+        # 본문은 풀지 않고 헤더와 리비전 메타데이터만 읽는다
+        doc_path = os.path.join(self.pages_path, doc_relative_path)
+        contributors = set()
+        try:
+            doc_id_in_file, meta = reader.read_header(doc_path)
+            if doc_id_in_file is None:
+                return info
+            for revision in reader.iter_revision_metadata(doc_path):
+                info["revision_count"] = revision["number"]
+                contributors.add(revision["username"])
+                if revision["timestamp"]:
+                    info["last_modified"] = revision["timestamp"]
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Warning: failed to read {doc_relative_path}: {e}")
+            return info
+        info["created_at"] = meta.get("created_at") or modified
+        info["contributors"] = sorted(contributors)
+        return info
+
+    def reconcile_index(self):
+        """저장된 인덱스와 pages 폴더의 (mtime, 크기)를 비교해
+        새로 생기거나 바뀐 문서만 다시 읽고, 사라진 문서는 인덱스에서 지운다."""
+        found, namespaces = self.scan_pages()
+        documents = self.index["documents"]
+
+        changed = [doc_id for doc_id, scanned in found.items()
+                   if doc_id not in documents
+                   or documents[doc_id].get("mtime_ns") != scanned[3]
+                   or documents[doc_id].get("size") != scanned[4]]
+        removed = [doc_id for doc_id in documents if doc_id not in found]
+
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            upserts = dict(zip(changed, pool.map(lambda doc_id: self.read_document_info(doc_id, found[doc_id]), changed)))
+
+        new_namespaces = {}
+        for namespace in namespaces:
             if namespace not in self.index["namespaces"]:
-                self.index["namespaces"][namespace] = {"path": f"/pages/{namespace}", "description": "자동 추가된 네임스페이스"}
-
-            for file in files:
-                if file.endswith(".opwi"):
-                    doc_path = os.path.join(root, file)
-                    doc_relative_path = os.path.relpath(doc_path, self.pages_path).replace("\\", "/")  # 상대 경로 사용
-                    doc_id = os.path.splitext(doc_relative_path)[0]  # `.opwi` 확장자 제거
-
-                    self.index["documents"][doc_id] = {
-                        "title": os.path.splitext(file)[0],
-                        "path": doc_relative_path,
-                        "namespace": namespace,
-                        "created_at": datetime.now().isoformat(),
-                        "last_modified": datetime.now().isoformat(),
-                        "revision_count": 1,
-                        "contributors": []
-                    }
-
-        self.save_index()
-
-    def save_index(self):
-        """문서 인덱스를 저장"""
+                new_namespaces[namespace] = {"path": f"/pages/{namespace}", "description": "자동 추가된 네임스페이스"}
+
+        for doc_id in removed:
+            del documents[doc_id]
+            self.revision_index.remove(doc_id)
+        documents.update(upserts)
+        self.index["namespaces"].update(new_namespaces)
+        if upserts or removed or new_namespaces:
+            self.index["last_updated"] = datetime.now().isoformat()
+            self.store.apply_changes(upserts, removed, new_namespaces)
+
+    @metrics.timed("index_save")
+    def save_document_info(self, doc_id: str, stat: os.stat_result = None, doc_info: dict = None):
+        """문서 하나의 인덱스 항목만 저장. stat이 있으면 다음 시작 때 다시 읽지 않도록 파일 상태도 기록"""
+        if doc_info is None:
+            doc_info = self.index["documents"][doc_id]
+        if stat is not None:
+            doc_info["mtime_ns"] = stat.st_mtime_ns
+            doc_info["size"] = stat.st_size
         self.index["last_updated"] = datetime.now().isoformat()
-        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
-        with open(self.index_path, "w", encoding="utf-8") as f:
-            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        self.store.upsert_document(doc_id, doc_info)
+        # 커밋한 뒤에 메모리 인덱스에 넣어, 그 사이 refresh_index가 읽은 예전 항목이 이 항목을 덮어쓰지 않게 한다
+        with self.refresh_lock:
+            self.index["documents"][doc_id] = doc_info
+            self.listing.add(doc_id)
+            self.titles.update(doc_id, doc_info)
 
     def create_document(self, title: str, content: str, username: str, ip_address: str, namespace: str = "") -> Document:
-        """하위 폴더까지 지원하는 문서 생성"""
-        doc = Document(title, namespace)
-        revision_data = doc.add_content(content, username, ip_address)
-
+        """하위 폴더까지 지원하는 문서 생성.
+        그 사이 다른 사람이 같은 문서를 만들었으면 빈 문서(0번째 판)를 고친 것으로 보고 합친다 (EditConflict 가능)."""
         # 문서 저장 경로 설정 (네임스페이스 유지)
         doc_path = os.path.join(self.pages_path, namespace, f"{title}.opwi") if namespace else os.path.join(self.pages_path, f"{title}.opwi")
+        doc_id = os.path.join(namespace, title).replace("\\", "/").strip("/")
+
+        with self.locks.lock(doc_id):
+            if os.path.exists(doc_path):
+                self.refresh_index()
+                if doc_id not in self.index["documents"]:
+                    stat = os.stat(doc_path)
+                    scanned = (os.path.relpath(doc_path, self.pages_path).replace("\\", "/"), namespace, title,
+                               stat.st_mtime_ns, stat.st_size)
+                    self.index["documents"][doc_id] = self.read_document_info(doc_id, scanned)
+                self._update_locked(doc_id, content, username, ip_address, base_revision=0)
+                return self.get_document(doc_id, history=False)
+            return self._create_locked(doc_id, doc_path, title, content, username, ip_address, namespace)
+
+    def _create_locked(self, doc_id: str, doc_path: str, title: str, content: str, username: str, ip_address: str,
+                       namespace: str) -> Document:
+        doc = Document(title, namespace)
+        revision_data = doc.add_content(content, username, ip_address)
         os.makedirs(os.path.dirname(doc_path), exist_ok=True)
 
-        with open(doc_path, "w", encoding="utf-8") as f:
-            f.write(doc.to_opwi())
+        storage.write_durable(doc_path, doc.to_opwi(self.codec))
 
         # 인덱스 업데이트
-        doc_id = os.path.join(namespace, title).replace("\\", "/").strip("/")
+        stat = os.stat(doc_path)
+        self.cache.put(doc_id, stat, doc)
         self.index["documents"][doc_id] = {
             "title": title,
             "path": os.path.relpath(doc_path, self.pages_path).replace("\\", "/"),
@@ -248,12 +483,23 @@ class DocumentManager:
             "revision_count": 1,
             "contributors": list(doc.contributors)
         }
-        self.save_index()
+        self.save_document_info(doc_id, stat)
+        self.index_content(doc_id, doc)
+        self._index_revisions(doc_id, doc_path, doc)
 
         return doc
 
-    def update_document(self, doc_id: str, content: str, username: str, ip_address: str) -> bool:
-        """기존 문서를 수정 (하위 폴더 지원)"""
+    def update_document(self, doc_id: str, content: str, username: str, ip_address: str,
+                        base_revision: int = None) -> bool:
+        """기존 문서를 수정 (하위 폴더 지원)
+        base_revision: 편집을 시작할 때의 리비전 수. 그 뒤에 다른 리비전이 추가되었으면
+        두 편집을 줄 단위로 합치고, 같은 곳을 고쳐 합칠 수 없으면 EditConflict를 던진다."""
+        with self.locks.lock(doc_id):
+            self.refresh_index()
+            return self._update_locked(doc_id, content, username, ip_address, base_revision)
+
+    def _update_locked(self, doc_id: str, content: str, username: str, ip_address: str,
+                       base_revision: int = None) -> bool:
         if doc_id not in self.index["documents"]:
             return False
 
@@ -262,39 +508,206 @@ class DocumentManager:
 
         if not os.path.exists(doc_path):
             return False  # 파일이 존재하지 않으면 실패
-        
-        # 기존 문서 읽기
-        with open(doc_path, "r", encoding="utf-8") as f:
-            doc = Document.from_opwi(f.read())
+
+        # 깨진 꼬리는 읽기 전에 잘라낸다. 그래야 읽은 리비전 수와 파일에 덧붙일 위치가 맞는다
+        truncated = storage.recover_tail(doc_path)
+        if truncated:
+            print(f"Warning: dropped {truncated} bytes of incomplete revision data in {doc_path}")
+
+        # 기존 문서 읽기 (덧붙이기 방식은 마지막 체크포인트 이후만 읽는다)
+        doc = self._take_document(doc_id, doc_path, history=self.storage_mode != "append")
+
+        if base_revision is not None and base_revision != doc.revision_count:
+            base = Document.load_revision(doc_path, base_revision) if base_revision > 0 else ""
+            merged = merge3(base, content, doc.content) if base is not None else None
+            if merged is None:
+                raise EditConflict(doc_id, doc.revision_count, doc.content)
+            content = merged
 
         # 새 리비전 추가
         revision_data = doc.update_content(content, username, ip_address)
+        if "changes" not in revision_data:
+            return True  # 변경 사항 없음
+        checkpoint = doc.add_checkpoint() if doc.needs_checkpoint() else None
 
         # 문서 저장
-        with open(doc_path, "w", encoding="utf-8") as f:
-            f.write(doc.to_opwi())
+        if self.storage_mode == "append":
+            previous_stat = os.stat(doc_path)
+            offset, checkpoint_offset = storage.append_revision(doc_path, revision_data, checkpoint,
+                                                                compress=self.codec is not None)
+        else:
+            storage.write_durable(doc_path, doc.to_opwi(self.codec))
+        stat = os.stat(doc_path)
+        self.cache.put(doc_id, stat, doc, history=doc.history_offset == 0)
+        if self.storage_mode == "append":
+            self.revision_index.append(doc_id, doc.revision_count, revision_data, offset, len(doc.content),
+                                       previous_stat, stat, checkpoint_offset)
+        else:
+            self._index_revisions(doc_id, doc_path, doc)
 
         # 인덱스 업데이트
         doc_info["last_modified"] = revision_data["timestamp"]
-        doc_info["revision_count"] = len(doc.revisions)
-        doc_info["contributors"] = list(doc.contributors)
-        self.save_index()
+        doc_info["revision_count"] = doc.revision_count
+        doc_info["contributors"] = sorted(set(doc_info["contributors"]) | doc.contributors)
+        self.save_document_info(doc_id, stat, doc_info)
+        if self.storage_mode == "append" and ((self.compact_every and doc.revision_count % self.compact_every == 0)
+                                              or (self.codec and checkpoint)):
+            self._compact_locked(doc_id)
+        self.index_content(doc_id, doc)
 
         return True
 
-    def get_document(self, doc_id: str) -> Document:
-        """하위 폴더 포함 문서를 가져오기"""
+    def _take_document(self, doc_id: str, doc_path: str, history: bool) -> Document:
+        """수정할 문서를 캐시에서 꺼내거나 파일에서 읽는다. 꺼낸 동안 다른 요청은 캐시에서 보지 못한다."""
+        entry = self.cache.pop(doc_id)
+        if entry is not None:
+            key, doc, full, _ = entry
+            if key == DocumentCache.file_key(os.stat(doc_path)) and (full or not history):
+                return doc
+        return Document.load(doc_path, history)
+
+    def compact_document(self, doc_id: str) -> bool:
+        """문서 파일을 현재 형식으로 다시 써서 깨진 꼬리와 예전 형식의 레코드를 정리"""
+        with self.locks.lock(doc_id):
+            return self._compact_locked(doc_id)
+
+    def _compact_locked(self, doc_id: str) -> bool:
+        doc = self.get_document(doc_id)
+        if doc is None:
+            return False
+        self.cache.invalidate(doc_id)
+        doc_path = os.path.join(self.pages_path, self.index["documents"][doc_id]["path"])
+        storage.write_durable(doc_path, doc.to_opwi(self.codec))
+        self.save_document_info(doc_id, os.stat(doc_path))
+        self.index_content(doc_id, doc)
+        self._index_revisions(doc_id, doc_path, doc)
+        return True
+
+    def _index_revisions(self, doc_id: str, doc_path: str, doc: Document = None):
+        """문서 파일을 처음부터 훑어 리비전 색인을 다시 만든다. doc은 파일과 같은 내용의 (전체 이력) 문서"""
+        stat = os.stat(doc_path)
+        if doc is None or doc.history_offset:
+            doc = Document.load(doc_path)
+        sizes = doc.content_sizes() if doc else []
+        revisions = []
+        for revision in reader.iter_revision_metadata(doc_path):
+            revision["size"] = sizes[revision["number"] - 1] if revision["number"] <= len(sizes) else None
+            revisions.append(revision)
+        self.revision_index.replace(doc_id, revisions, stat, storage.last_checkpoint_offset(doc_path))
+
+    def _revision_index_path(self, doc_id: str):
+        """리비전 색인이 문서 파일과 맞도록 (필요하면 다시 만들고) 문서 파일 경로를 반환. 문서가 없으면 None"""
+        if doc_id not in self.index["documents"]:
+            return None
+        doc_path = os.path.join(self.pages_path, self.index["documents"][doc_id]["path"])
+        try:
+            stat = os.stat(doc_path)
+        except FileNotFoundError:
+            return None
+        if not self.revision_index.is_current(doc_id, stat):
+            # 다른 곳에서 파일이 바뀌었거나 색인을 만든 적이 없는 문서: 한 번만 전체를 훑는다
+            with self.locks.lock(doc_id):
+                if not self.revision_index.is_current(doc_id, os.stat(doc_path)):
+                    self._index_revisions(doc_id, doc_path, self.get_document(doc_id))
+        return doc_path
+
+    def get_history(self, doc_id: str, before: int = None, limit: int = 50):
+        """최신 리비전부터 limit개의 메타데이터 (리비전 색인에서 읽으며 변경 내용은 읽지 않는다).
+        before: 이 번호보다 앞선 리비전부터 (이전 페이지의 마지막 번호). 문서가 없으면 None"""
+        if self._revision_index_path(doc_id) is None:
+            return None
+        return self.revision_index.page(doc_id, before, limit)
+
+    def cache_stats(self) -> dict:
+        """문서 캐시의 적중/실패/내보냄 횟수"""
+        return self.cache.stats()
+
+    def index_content(self, doc_id: str, doc: Document):
+        """문서의 현재 내용을 검색 색인에 반영"""
+        doc_info = self.index["documents"][doc_id]
+        doc_path = os.path.join(self.pages_path, doc_info["path"])
+        self.search_index.update(doc_id, doc_info["title"], doc.content, os.stat(doc_path).st_mtime_ns)
+
+    def sync_search_index(self):
+        """검색 색인을 문서 인덱스와 맞춘다. 원본 파일이 바뀐 문서만 다시 색인한다."""
+        indexed = self.search_index.indexed_mtimes()
+        for doc_id in indexed.keys() - self.index["documents"].keys():
+            self.search_index.remove(doc_id)
+        for doc_id, info in self.index["documents"].items():
+            # 방금 맞춘 인덱스의 파일 상태를 쓰므로 파일을 다시 stat 하지 않는다
+            mtime_ns = info.get("mtime_ns")
+            if mtime_ns is None or indexed.get(doc_id) == mtime_ns:
+                continue
+            doc = self.get_document(doc_id, history=False)
+            if doc:
+                self.search_index.update(doc_id, info["title"], doc.content, mtime_ns)
+
+    def get_document(self, doc_id: str, history: bool = True) -> Document:
+        """하위 폴더 포함 문서를 가져오기. history가 False면 현재 내용만 빠르게 읽는다."""
         if doc_id not in self.index["documents"]:
             return None
         
         doc_info = self.index["documents"][doc_id]
         doc_path = os.path.join(self.pages_path, doc_info["path"])
 
-        if not os.path.exists(doc_path):
+        try:
+            stat = os.stat(doc_path)
+        except FileNotFoundError:
+            self.cache.invalidate(doc_id)
+            return None
+
+        doc = self.cache.get(doc_id, stat, history)
+        if doc is None:
+            doc = Document.load(doc_path, history)
+            if doc is not None:
+                self.cache.put(doc_id, stat, doc, history=doc.history_offset == 0)
+        return doc
+
+    def get_revision_content(self, doc_id: str, revision_number: int):
+        """문서의 revision_number 번째 리비전 시점 내용. 없으면 None.
+        리비전 색인의 체크포인트 위치부터 읽으므로 파일 앞부분은 읽지 않는다."""
+        if revision_number < 1:
+            return None
+        doc_path = self._revision_index_path(doc_id)
+        revision = self.revision_index.get(doc_id, revision_number) if doc_path else None
+        if revision is None:
             return None
+        return Document.load_revision(doc_path, revision_number, revision["base_offset"])
 
-        with open(doc_path, "r", encoding="utf-8") as f:
-            return Document.from_opwi(f.read())
+    def get_revision_diff(self, doc_id: str, revision_number: int):
+        """revision_number 번째 리비전의 (메타데이터, 바로 전 판 내용, 그 판 내용). 없으면 None"""
+        if revision_number < 1:
+            return None
+        doc_path = self._revision_index_path(doc_id)
+        revision = self.revision_index.get(doc_id, revision_number) if doc_path else None
+        if revision is None:
+            return None
+        after = Document.load_revision(doc_path, revision_number, revision["base_offset"])
+        before = ""
+        if revision_number > 1:
+            previous = self.revision_index.get(doc_id, revision_number - 1)
+            before = Document.load_revision(doc_path, revision_number - 1, previous and previous["base_offset"])
+        if before is None or after is None:
+            return None
+        return revision, before, after
+
+    def list_documents(self, prefix: str = "", namespace: str = None, after: str = None, limit: int = 100):
+        """메모리 인덱스에서 문서 목록 한 페이지. ([{"id", "title", "namespace", "last_modified", "revision_count"}],
+        다음 페이지 커서 또는 None). 조건은 DocumentListing.page 참고"""
+        doc_ids, cursor = self.listing.page(prefix, namespace, after, limit)
+        documents = []
+        for doc_id in doc_ids:
+            info = self.index["documents"].get(doc_id)
+            if info is None:
+                continue
+            documents.append({
+                "id": doc_id,
+                "title": info["title"],
+                "namespace": namespace_of(doc_id),
+                "last_modified": info.get("last_modified"),
+                "revision_count": info.get("revision_count", 0),
+            })
+        return documents, cursor
 
     def get_document_by_path(self, path: str) -> Document:
         """경로를 기반으로 문서를 가져오기 (하위 폴더까지 검색)"""
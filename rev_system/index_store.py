@@ -0,0 +1,246 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+# 다른 프로세스가 따라잡을 수 있도록 남겨 두는 변경 기록 수. 이보다 뒤처진 프로세스는 인덱스 전체를 다시 읽는다.
+CHANGE_LOG_KEEP = 10000
+
+
+class IndexStore:
+    """문서 인덱스를 SQLite(WAL)에 문서 단위로 저장
+
+    문서 하나를 고칠 때 그 문서의 행만 upsert 하므로 쓰기 양이 전체 문서 수와 상관없고,
+    트랜잭션 단위로 기록되어 저장 중 프로세스가 죽어도 인덱스가 깨지지 않는다.
+    여러 스레드가 동시에 쓰면 먼저 온 스레드가 쌓인 변경을 한 트랜잭션으로 묶어 커밋한다(group commit).
+    모든 변경은 changes 테이블에 순번과 함께 기록되어, 같은 DB를 쓰는 다른 프로세스가 바뀐 항목만 다시 읽을 수 있다."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                path TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                created_at TEXT,
+                last_modified TEXT,
+                revision_count INTEGER NOT NULL DEFAULT 0,
+                contributors TEXT NOT NULL DEFAULT '[]',
+                mtime_ns INTEGER,
+                size INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS namespaces (
+                name TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                description TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                name TEXT
+            );
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(documents)")}
+        for column in ("mtime_ns", "size"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE documents ADD COLUMN {column} INTEGER")
+        self.conn.commit()
+
+        self.db_lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.errors = {}
+        self.pending = []
+        self.submitted = 0
+        self.committed = 0
+        self.committing = False
+        self.commits = 0
+
+    def is_empty(self) -> bool:
+        with self.db_lock:
+            return self.conn.execute("SELECT COUNT(*) FROM meta").fetchone()[0] == 0
+
+    @staticmethod
+    def _document_info(row: tuple) -> dict:
+        return {
+            "title": row[1],
+            "path": row[2],
+            "namespace": row[3],
+            "created_at": row[4],
+            "last_modified": row[5],
+            "revision_count": row[6],
+            "contributors": json.loads(row[7]),
+            "mtime_ns": row[8],
+            "size": row[9],
+        }
+
+    def load(self) -> dict:
+        """저장된 인덱스를 예전 document_index.json 과 같은 모양의 dict로 읽는다"""
+        with self.db_lock:
+            documents = {}
+            for row in self.conn.execute("SELECT doc_id, title, path, namespace, created_at, last_modified, "
+                                         "revision_count, contributors, mtime_ns, size FROM documents"):
+                documents[row[0]] = self._document_info(row)
+            namespaces = {name: {"path": path, "description": description}
+                          for name, path, description in self.conn.execute("SELECT name, path, description FROM namespaces")}
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'last_updated'").fetchone()
+        return {
+            "last_updated": row[0] if row else datetime.now().isoformat(),
+            "documents": documents,
+            "namespaces": namespaces,
+        }
+
+    def load_document(self, doc_id: str):
+        """문서 하나의 인덱스 항목. 없으면 None"""
+        with self.db_lock:
+            row = self.conn.execute("SELECT doc_id, title, path, namespace, created_at, last_modified, "
+                                    "revision_count, contributors, mtime_ns, size FROM documents WHERE doc_id = ?",
+                                    (doc_id,)).fetchone()
+        return self._document_info(row) if row else None
+
+    def load_namespace(self, name: str):
+        with self.db_lock:
+            row = self.conn.execute("SELECT path, description FROM namespaces WHERE name = ?", (name,)).fetchone()
+        return {"path": row[0], "description": row[1]} if row else None
+
+    def data_version(self) -> int:
+        """다른 연결(프로세스)이 커밋할 때마다 바뀌는 값. 자신의 커밋으로는 바뀌지 않는다"""
+        with self.db_lock:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def last_sequence(self) -> int:
+        with self.db_lock:
+            return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, sequence: int):
+        """sequence 이후의 변경 목록 [(순번, 종류, 이름)]. 기록이 이미 정리되어 따라잡을 수 없으면 None.
+        종류: "document", "namespace", "reset"(전체 교체)"""
+        with self.db_lock:
+            oldest = self.conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+            if oldest is not None and oldest > sequence + 1:
+                return None
+            return self.conn.execute("SELECT seq, kind, name FROM changes WHERE seq > ? ORDER BY seq",
+                                     (sequence,)).fetchall()
+
+    def _log_change(self, kind: str, name: str = None):
+        self.conn.execute("INSERT INTO changes (kind, name) VALUES (?, ?)", (kind, name))
+
+    def import_json(self, json_path: str) -> bool:
+        """예전 document_index.json 이 있으면 한 번 가져온다"""
+        if not os.path.exists(json_path):
+            return False
+        with open(json_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.replace_all(index)
+        return True
+
+    @staticmethod
+    def _document_row(doc_id: str, info: dict) -> tuple:
+        return (doc_id, info["title"], info["path"], info["namespace"], info.get("created_at"),
+                info.get("last_modified"), info.get("revision_count", 0),
+                json.dumps(info.get("contributors", []), ensure_ascii=False),
+                info.get("mtime_ns"), info.get("size"))
+
+    def _upsert_document(self, doc_id: str, info: dict):
+        self._log_change("document", doc_id)
+        self.conn.execute("INSERT OR REPLACE INTO documents (doc_id, title, path, namespace, created_at, "
+                          "last_modified, revision_count, contributors, mtime_ns, size) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                          self._document_row(doc_id, info))
+
+    def _delete_document(self, doc_id: str):
+        self._log_change("document", doc_id)
+        self.conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def _upsert_namespace(self, name: str, info: dict):
+        self._log_change("namespace", name)
+        self.conn.execute("INSERT OR REPLACE INTO namespaces (name, path, description) VALUES (?, ?, ?)",
+                          (name, info["path"], info.get("description", "")))
+
+    def _touch(self):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_updated', ?)",
+                          (datetime.now().isoformat(),))
+        self.conn.execute("DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (CHANGE_LOG_KEEP,))
+
+    def _submit(self, op):
+        """변경을 대기열에 넣고 커밋될 때까지 기다린다.
+        커밋 중인 스레드가 없으면 자신이 그동안 쌓인 변경을 모두 한 트랜잭션으로 커밋하고,
+        커밋하는 동안 들어온 변경은 다음 트랜잭션에 함께 묶인다."""
+        with self.cond:
+            self.submitted += 1
+            ticket = self.submitted
+            self.pending.append((ticket, op))
+            while self.committed < ticket and self.committing:
+                self.cond.wait()
+            if self.committed >= ticket:
+                error = self.errors.pop(ticket, None)
+                if error is not None:
+                    raise error
+                return
+            self.committing = True
+            batch, self.pending = self.pending, []
+
+        error = None
+        try:
+            with self.db_lock, self.conn:
+                for _, batch_op in batch:
+                    batch_op()
+                self._touch()
+            self.commits += 1
+        except Exception as e:
+            error = e
+        with self.cond:
+            if error is not None:
+                for batch_ticket, _ in batch:
+                    if batch_ticket != ticket:
+                        self.errors[batch_ticket] = error
+            self.committed = batch[-1][0]
+            self.committing = False
+            self.cond.notify_all()
+        if error is not None:
+            raise error
+
+    def upsert_document(self, doc_id: str, info: dict):
+        self._submit(lambda: self._upsert_document(doc_id, info))
+
+    def delete_document(self, doc_id: str):
+        self._submit(lambda: self._delete_document(doc_id))
+
+    def upsert_namespace(self, name: str, info: dict):
+        self._submit(lambda: self._upsert_namespace(name, info))
+
+    def apply_changes(self, upserts: dict, deletes, namespaces: dict):
+        """바뀐 문서/삭제된 문서/새 네임스페이스만 한 트랜잭션으로 반영"""
+        def op():
+            for doc_id, info in upserts.items():
+                self._upsert_document(doc_id, info)
+            for doc_id in deletes:
+                self._delete_document(doc_id)
+            for name, info in namespaces.items():
+                self._upsert_namespace(name, info)
+        self._submit(op)
+
+    def replace_all(self, index: dict):
+        """인덱스 전체를 한 트랜잭션으로 교체"""
+        def op():
+            self.conn.execute("DELETE FROM documents")
+            self.conn.execute("DELETE FROM namespaces")
+            for doc_id, info in index["documents"].items():
+                self._upsert_document(doc_id, info)
+            for name, info in index["namespaces"].items():
+                self._upsert_namespace(name, info)
+            self._log_change("reset")
+        self._submit(op)
+
+    def close(self):
+        with self.db_lock:
+            self.conn.close()
@@ -0,0 +1,78 @@
+import bisect
+import threading
+import uuid
+
+# /api/docs 한 페이지의 최대 문서 수
+MAX_LIST_PAGE = 1000
+
+
+def namespace_of(doc_id: str) -> str:
+    """문서 ID의 네임스페이스 (폴더 경로). 최상위 문서는 빈 문자열"""
+    return doc_id.rpartition("/")[0]
+
+
+class DocumentListing:
+    """문서 ID를 정렬된 목록으로 유지해 문서 목록을 접두어/네임스페이스/커서로 잘라 읽는다.
+
+    전체 목록과 네임스페이스별 목록을 함께 두고 이진 탐색으로 시작 위치를 찾으므로,
+    한 페이지를 만드는 비용은 전체 문서 수가 아니라 페이지 크기에 비례한다.
+    generation은 목록이나 문서 항목이 바뀔 때마다 올라가며, instance와 함께 ETag로 쓴다
+    (instance는 프로세스마다 달라서 다른 워커의 같은 generation 값과 섞이지 않는다)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.instance = uuid.uuid4().hex[:8]
+        self.generation = 0
+        self.all = []
+        self.namespaces = {}
+
+    @property
+    def etag(self) -> str:
+        return f"{self.instance}-{self.generation}"
+
+    def reset(self, doc_ids):
+        with self.lock:
+            self.all = sorted(doc_ids)
+            self.namespaces = {}
+            for doc_id in self.all:
+                self.namespaces.setdefault(namespace_of(doc_id), []).append(doc_id)
+            self.generation += 1
+
+    def add(self, doc_id: str):
+        """새 문서를 넣거나, 이미 있는 문서의 항목이 바뀌었음을 알린다"""
+        with self.lock:
+            for ids in (self.all, self.namespaces.setdefault(namespace_of(doc_id), [])):
+                position = bisect.bisect_left(ids, doc_id)
+                if position == len(ids) or ids[position] != doc_id:
+                    ids.insert(position, doc_id)
+            self.generation += 1
+
+    def remove(self, doc_id: str):
+        with self.lock:
+            namespace = namespace_of(doc_id)
+            for ids in (self.all, self.namespaces.get(namespace, [])):
+                position = bisect.bisect_left(ids, doc_id)
+                if position < len(ids) and ids[position] == doc_id:
+                    del ids[position]
+            if not self.namespaces.get(namespace, True):
+                del self.namespaces[namespace]
+            self.generation += 1
+
+    def page(self, prefix: str = "", namespace: str = None, after: str = None, limit: int = 100):
+        """조건에 맞는 문서 ID를 정렬 순서로 limit개. (문서 ID 목록, 다음 페이지 커서 또는 None)
+        namespace가 있으면 그 네임스페이스 바로 아래 문서만, prefix는 문서 ID 접두어(네임스페이스 포함 경로),
+        after는 이전 페이지의 커서(마지막 문서 ID)"""
+        limit = max(1, min(limit, MAX_LIST_PAGE))
+        with self.lock:
+            ids = self.all if namespace is None else self.namespaces.get(namespace.strip("/"), [])
+            start = bisect.bisect_left(ids, prefix)
+            if after is not None and after >= prefix:
+                start = max(start, bisect.bisect_right(ids, after))
+            result = []
+            for doc_id in ids[start:start + limit + 1]:
+                if not doc_id.startswith(prefix):
+                    break
+                result.append(doc_id)
+        if len(result) > limit:
+            return result[:limit], result[limit - 1]
+        return result, None
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: 같은 프로세스 안의 스레드끼리만 막는다
+    fcntl = None
+
+
+class DocumentLocks:
+    """문서 단위 잠금 (스레드 + 프로세스)
+
+    같은 프로세스의 스레드끼리는 threading.Lock 으로, 여러 프로세스(gunicorn 워커 등)끼리는
+    잠금 파일에 fcntl.flock 을 걸어 한 번에 한 쪽만 같은 문서를 고치게 한다.
+    문서 파일은 rename 으로 교체될 수 있어 파일 자체가 아니라 lock_dir 아래의 별도 잠금 파일을 잠근다."""
+
+    def __init__(self, lock_dir: str):
+        self.lock_dir = lock_dir
+        os.makedirs(lock_dir, exist_ok=True)
+        self.guard = threading.Lock()
+        self.thread_locks = {}  # 문서 ID -> threading.Lock
+        self.waits = 0
+
+    def lock_path(self, doc_id: str) -> str:
+        name = hashlib.sha1(doc_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.lock_dir, f"{name}.lock")
+
+    def _thread_lock(self, doc_id: str) -> threading.Lock:
+        with self.guard:
+            lock = self.thread_locks.get(doc_id)
+            if lock is None:
+                lock = self.thread_locks[doc_id] = threading.Lock()
+            return lock
+
+    @contextmanager
+    def lock(self, doc_id: str):
+        """doc_id 문서를 잠근 채로 블록을 실행"""
+        thread_lock = self._thread_lock(doc_id)
+        if not thread_lock.acquire(blocking=False):
+            self.waits += 1
+            thread_lock.acquire()
+        try:
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path(doc_id), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
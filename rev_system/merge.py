@@ -0,0 +1,32 @@
+import difflib
+
+
+def _hunks(base_lines: list, other_lines: list) -> list:
+    """base 기준 변경 구간 목록: (시작 줄, 끝 줄, 바뀐 줄 목록)"""
+    matcher = difflib.SequenceMatcher(None, base_lines, other_lines, autojunk=False)
+    return [(i1, i2, other_lines[j1:j2])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal"]
+
+
+def merge3(base: str, ours: str, theirs: str):
+    """같은 판(base)에서 갈라진 두 편집을 줄 단위로 합친다.
+    두 편집이 서로 다른 곳을 고쳤으면 합친 내용을, 같은 곳(맞닿은 곳 포함)을 다르게 고쳤으면 None을 반환."""
+    if ours == theirs or theirs == base:
+        return ours
+    if ours == base:
+        return theirs
+
+    base_lines = base.splitlines(keepends=True)
+    our_hunks = _hunks(base_lines, ours.splitlines(keepends=True))
+    their_hunks = _hunks(base_lines, theirs.splitlines(keepends=True))
+
+    for a1, a2, a_lines in our_hunks:
+        for b1, b2, b_lines in their_hunks:
+            if a1 <= b2 and b1 <= a2 and (a1, a2, a_lines) != (b1, b2, b_lines):
+                return None
+
+    hunks = sorted(set((i1, i2, tuple(lines)) for i1, i2, lines in our_hunks + their_hunks), reverse=True)
+    merged = list(base_lines)
+    for i1, i2, lines in hunks:
+        merged[i1:i2] = lines
+    return "".join(merged)
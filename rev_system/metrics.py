@@ -0,0 +1,249 @@
+"""성능 계측
+
+자주 지나는 작업(파싱, Markdown 렌더링, diff, 파일 읽기/쓰기, 인덱스 저장, 검색, 변환)의 소요 시간을
+작업 이름별 히스토그램으로 모으고, 상태 값(변환 대기열 깊이, 캐시 통계)은 읽을 때 함수를 불러 구한다.
+main.py의 /metrics가 Prometheus 텍스트 형식으로 내보낸다.
+
+    @metrics.timed("diff")
+    def diff_lines(...): ...
+
+    with metrics.timer("search"):
+        ...
+
+OPENWIKI_METRICS=0이면 timed()는 함수를 감싸지 않고 그대로 돌려주고 timer()는 아무것도 하지 않으므로
+계측 비용이 없다. 계측은 프로세스마다 따로 모으므로 빌드 워커 프로세스 안의 작업은 세지 않는다.
+
+OPENWIKI_PROFILE=1이면 SamplingProfiler가 일정 간격으로 모든 스레드의 호출 스택을 표본으로 모은다
+(flamegraph.pl/speedscope가 읽는 한 줄에 하나씩인 "함수;함수;함수 횟수" 형식).
+"""
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+
+enabled = os.environ.get("OPENWIKI_METRICS", "1") != "0"
+
+# 히스토그램 구간의 상한(초)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value) -> str:
+    return repr(value) if isinstance(value, float) else str(int(value))
+
+
+class Histogram:
+    """라벨 값별 소요 시간 분포 (Prometheus histogram)"""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.lock = threading.Lock()
+        self.series = {}  # 라벨 값 -> [구간별 횟수 ..., +Inf 횟수, 합계]
+
+    def observe(self, seconds: float, *label_values):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(BUCKETS) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def expose(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((labels, list(values)) for labels, values in self.series.items())
+        for label_values, values in series:
+            names = self.label_names + ("le",)
+            count = 0
+            for bound, hits in zip(BUCKETS + ("+Inf",), values[:-1]):
+                count += hits
+                lines.append(f"{self.name}_bucket{_labels(names, label_values + (bound,))} {count}")
+            labels = _labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_number(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge:
+    """읽을 때 함수를 불러 구하는 값. label이 있으면 함수는 {라벨 값: 값}을 돌려준다"""
+
+    def __init__(self, name: str, help_text: str, function, label: str = None, kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.function = function
+        self.label = label
+        self.kind = kind
+
+    def expose(self) -> list:
+        try:
+            value = self.function()
+        except Exception as e:
+            print(f"Warning: metric {self.name} failed: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        if self.label is None:
+            lines.append(f"{self.name} {_number(value)}")
+        else:
+            for label_value, number in sorted(value.items()):
+                lines.append(f"{self.name}{_labels((self.label,), (label_value,))} {_number(number)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}  # 이름 -> Histogram 또는 Gauge
+        self.operations = self.histogram("openwiki_operation_seconds", "Time spent in instrumented operations",
+                                         ("operation",))
+
+    def histogram(self, name: str, help_text: str, label_names: tuple = ()) -> Histogram:
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = Histogram(name, help_text, label_names)
+            return self.metrics[name]
+
+    def gauge(self, name: str, help_text: str, function, label: str = None, kind: str = "gauge"):
+        """같은 이름으로 다시 등록하면 새 함수로 바꾼다"""
+        with self.lock:
+            self.metrics[name] = Gauge(name, help_text, function, label, kind)
+
+    def expose(self) -> str:
+        """Prometheus 텍스트 형식 (text/plain; version=0.0.4)"""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _Timer:
+    __slots__ = ("operation", "started")
+
+    def __init__(self, operation: str):
+        self.operation = operation
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registry.operations.observe(time.perf_counter() - self.started, self.operation)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+def timer(operation: str):
+    """with 블록의 소요 시간을 operation으로 기록"""
+    return _Timer(operation) if enabled else _null_timer
+
+
+def timed(operation: str):
+    """함수의 소요 시간을 operation으로 기록하는 데코레이터 (예외로 끝나도 기록)"""
+    def decorator(function):
+        if not enabled:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                registry.operations.observe(time.perf_counter() - started, operation)
+        return wrapper
+    return decorator
+
+
+class SamplingProfiler:
+    """백그라운드 스레드에서 interval초마다 모든 스레드의 호출 스택을 표본으로 모은다.
+    서로 다른 스택은 max_stacks개까지만 기억하고, 넘치면 "(other)"로 센다."""
+
+    def __init__(self, interval: float = 0.01, max_stacks: int = 10000, max_depth: int = 64):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.stacks = {}  # "함수;함수" -> 횟수
+        self.samples = 0
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                names = []
+                while frame is not None and len(names) < self.max_depth:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(names)))
+            del frames
+            with self.lock:
+                self.samples += 1
+                for stack in stacks:
+                    if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                        stack = "(other)"
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def collapsed(self) -> str:
+        """많이 나온 스택부터 "함수;함수 횟수" 한 줄씩"""
+        with self.lock:
+            stacks = sorted(self.stacks.items(), key=lambda item: -item[1])
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def reset(self):
+        with self.lock:
+            self.stacks.clear()
+            self.samples = 0
+
+
+profiler = None
+if os.environ.get("OPENWIKI_PROFILE") == "1":
+    # 표본 간격(밀리초)
+    profiler = SamplingProfiler(float(os.environ.get("OPENWIKI_PROFILE_INTERVAL", "10")) / 1000)
@@ -0,0 +1,64 @@
+"""예전 OPWI 파일(체크섬 없는 REVBLOCK)을 덧붙이기 저장 방식에서 쓰는 형식으로 변환
+
+사용법: python -m rev_system.migrate [pages 폴더] [compact_every]
+변환하면서 리비전을 다시 적용해 체크포인트를 넣는다. 저장할 때(DocumentManager._update_locked)와 같은 기준으로 넣고,
+compact_every를 주면 그 수의 배수 리비전마다 체크포인트를 하나 더 넣는다.
+"""
+import os
+import sys
+from rev_system import replay, storage
+from rev_system.document import Document
+
+
+def needs_migration(content: str) -> bool:
+    """체크섬이 없는 REVBLOCK:END 가 하나라도 있으면 변환 대상"""
+    return any(line.strip() == "REVBLOCK:END" for line in content.split("\n"))
+
+
+def add_checkpoints(doc: Document, compact_every: int = 0):
+    """리비전을 처음부터 다시 적용하며 체크포인트를 넣는다"""
+    revisions = doc.revisions
+    doc.revisions = []
+    doc.checkpoints = {}
+    buffer = replay.LineBuffer()
+    for revision in revisions:
+        try:
+            buffer.apply(revision["changes"])
+        except ValueError:
+            pass  # 읽을 때 이미 경고를 출력했다
+        doc.revisions.append(revision)
+        if doc.needs_checkpoint() or (compact_every and doc.revision_count % compact_every == 0):
+            doc.content = buffer.text
+            doc.add_checkpoint()
+    doc.content = buffer.text
+
+
+def migrate_file(path: str, compact_every: int = 0) -> bool:
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if not needs_migration(content):
+        return False
+
+    doc = Document.from_opwi(content)
+    if doc is None:
+        print(f"Warning: {path} has no DOC header, skipped")
+        return False
+    add_checkpoints(doc, compact_every)
+    storage.write_durable(path, doc.to_opwi())
+    return True
+
+
+def migrate(pages_path: str = "./pages", compact_every: int = 0):
+    migrated = 0
+    total = 0
+    for root, _, files in os.walk(pages_path):
+        for file in files:
+            if file.endswith(".opwi"):
+                total += 1
+                if migrate_file(os.path.join(root, file), compact_every):
+                    migrated += 1
+    print(f"Migration complete! {migrated} of {total} documents rewritten")
+
+
+if __name__ == "__main__":
+    migrate(sys.argv[1] if len(sys.argv) > 1 else "./pages", int(sys.argv[2]) if len(sys.argv) > 2 else 0)
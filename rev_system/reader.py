@@ -0,0 +1,218 @@
+"""OPWI 스트리밍 리더
+
+문서 파일을 통째로 읽거나 나누지 않고, 바이너리 파일 객체, mmap, 줄 목록(문자열)에서 한 줄씩 읽어
+레코드(Record)를 차례로 돌려준다. 리비전 본문(CHANGES JSON, 프레임 본문, 체크포인트 내용)은
+레코드의 changes()/revisions()/content()를 불러야 풀기 때문에, 헤더만 읽기, 리비전 수 세기,
+이력 목록 만들기 같은 작업은 본문을 풀지 않는다. 필요한 것을 얻은 곳에서 반복을 멈추면 나머지는 읽지도 않는다.
+
+    for record in read_records(f):
+        if record.kind == META:
+            break
+
+레코드 종류: DOC(값: 문서 ID), META(값: dict), REVISION(RevisionRecord), CHECKPOINT(CheckpointRecord),
+FRAME(FrameRecord). offset은 레코드가 시작하는 위치로, 바이너리 입력이면 바이트 위치이다.
+"""
+import json
+import mmap
+import zlib
+from collections import namedtuple
+from rev_system import codec, storage
+
+DOC = "doc"
+META = "meta"
+REVISION = "revision"
+CHECKPOINT = "checkpoint"
+FRAME = "frame"
+
+Record = namedtuple("Record", ["kind", "offset", "value"])
+
+
+class RevisionRecord:
+    """REVUSER ~ REVBLOCK:END 한 벌. payload는 CHANGES의 JSON 문자열 그대로"""
+    __slots__ = ("username", "ip_address", "timestamp", "payload", "end_line")
+
+    def __init__(self, username: str, ip_address: str):
+        self.username = username
+        self.ip_address = ip_address
+        self.timestamp = None
+        self.payload = None
+        self.end_line = None
+
+    def is_valid(self) -> bool:
+        """REVBLOCK:END의 CRC가 본문과 맞는지 (본문을 풀지 않는다)"""
+        return storage.verify_block(self.payload, self.end_line)
+
+    def changes(self):
+        """CHANGES 목록. JSON이 깨졌으면 None"""
+        try:
+            return json.loads(self.payload)
+        except json.JSONDecodeError:
+            return None
+
+    def metadata(self) -> dict:
+        return {"username": self.username, "ip_address": self.ip_address, "timestamp": self.timestamp}
+
+
+class CheckpointRecord:
+    __slots__ = ("line",)
+
+    def __init__(self, line: str):
+        self.line = line
+
+    @property
+    def number(self):
+        """체크포인트의 리비전 번호. 형식이 틀리면 None"""
+        number = self.line[len("CHECKPOINT:"):].split(":", 1)[0]
+        return int(number) if number.isdigit() else None
+
+    def is_valid(self) -> bool:
+        return storage.checkpoint_is_valid(self.line)
+
+    def content(self):
+        """체크포인트 내용. 깨졌으면 None"""
+        checkpoint = storage.decode_checkpoint(self.line)
+        return checkpoint[1] if checkpoint else None
+
+
+class FrameRecord:
+    __slots__ = ("line",)
+
+    def __init__(self, line: str):
+        self.line = line
+
+    def metadata(self):
+        """본문을 풀지 않은 리비전별 {"username", "ip_address", "timestamp"}. 깨졌으면 None"""
+        try:
+            return codec.frame_metadata(self.line)
+        except (ValueError, zlib.error):
+            return None
+
+    def revisions(self, base_content: str):
+        """프레임의 리비전 목록 (rev_system.codec.decode_frame). 깨졌으면 None"""
+        try:
+            return codec.decode_frame(self.line, base_content)
+        except (ValueError, zlib.error):
+            return None
+
+
+def _lines(source):
+    if isinstance(source, mmap.mmap):
+        return iter(source.readline, b"")
+    return source
+
+
+def read_records(source, offset: int = 0):
+    """source(바이너리 파일 객체, mmap, 줄 목록)에서 레코드를 차례로 돌려준다.
+    offset: source가 파일 중간부터 시작할 때 그 바이트 위치 (레코드 offset에 더한다)"""
+    revision = None
+    block = None
+    for raw in _lines(source):
+        start = offset
+        offset += len(raw)
+        # 덧붙이다 죽은 꼬리는 한글 글자 중간에서 끊겼을 수 있다. 깨진 글자는 바꿔 읽고, 그 레코드는
+        # REVBLOCK:END나 CRC가 맞지 않아 버려진다
+        line = (raw.decode("utf-8", errors="replace") if isinstance(raw, bytes) else raw).strip()
+        if not line:
+            continue
+
+        # 표식은 줄 맨 앞의 ":" 앞부분. 가장 많은 CHANGES 줄부터 확인한다
+        tag, _, rest = line.partition(":")
+        if tag == "CHANGES":
+            if block is not None:
+                block.append(rest)
+        elif tag == "REVUSER":
+            username, _, ip_address = rest.partition(":")
+            # 구분자를 적지 않던 예전 파일은 IP(IPv6)에 ":"가 들어 있을 수 있으므로 첫 ":"에서만 나눈다
+            revision = RevisionRecord(storage.unescape_field(username), storage.unescape_field(ip_address))
+            revision_offset = start
+        elif tag == "REVTIME":
+            if revision:
+                revision.timestamp = rest
+        elif tag == "REVBLOCK" and rest.startswith("START"):
+            block = []
+        elif tag == "REVBLOCK" and rest.startswith("END"):
+            if block and revision:
+                revision.payload = "".join(block)
+                revision.end_line = line
+                yield Record(REVISION, revision_offset, revision)
+            block = None
+            revision = None
+        elif tag == "CHECKPOINT":
+            yield Record(CHECKPOINT, start, CheckpointRecord(line))
+        elif tag == "FRAME":
+            yield Record(FRAME, start, FrameRecord(line))
+        elif tag == "DOC":
+            yield Record(DOC, start, rest)
+        elif tag == "META":
+            try:
+                yield Record(META, start, json.loads(rest))
+            except json.JSONDecodeError:
+                print("Warning: Invalid META JSON format")
+        elif block is not None:
+            block.append(line)
+
+
+def header_records(f):
+    """파일 맨 앞의 DOC/META 레코드만 돌려주고, 다른 줄이 나오면 그 줄 하나만 읽고 멈춘다.
+    read_records는 리비전 레코드를 REVBLOCK:END까지 모은 뒤에야 돌려주므로 헤더만 필요할 때는 이것을 쓴다."""
+    offset = 0
+    for raw in f:
+        start = offset
+        offset += len(raw)
+        if not raw.startswith((b"DOC:", b"META:")):
+            if raw.strip():
+                return
+            continue
+        yield from read_records([raw], start)
+
+
+def read_header(path: str):
+    """(문서 ID, META dict)만 읽고 멈춘다. 없으면 각각 None, {}"""
+    doc_id = None
+    meta = {}
+    with open(path, "rb") as f:
+        for record in header_records(f):
+            if record.kind == DOC:
+                doc_id = record.value
+            else:
+                meta = record.value
+    return doc_id, meta
+
+
+def tail_records(f):
+    """헤더(DOC/META)와 마지막 온전한 체크포인트부터 끝까지의 레코드.
+    체크포인트가 없으면 파일 전체의 레코드이다. 읽는 양은 체크포인트 간격에 비례하며,
+    어느 쪽이든 파일에서 한 줄씩 읽으므로 파일 전체를 메모리에 올리지 않는다."""
+    f.seek(0)
+    header = list(header_records(f))
+    offset = storage._last_checkpoint(f)
+    if offset is None:
+        f.seek(0)
+        yield from read_records(f)
+        return
+    yield from header
+    f.seek(offset)
+    yield from read_records(f, offset)
+
+
+def iter_revision_metadata(path: str):
+    """리비전 본문(CHANGES, 프레임 본문)을 풀지 않고 리비전별
+    {"number", "username", "ip_address", "timestamp", "offset", "base_offset"}를 차례로 돌려준다.
+    offset은 리비전 레코드(프레임이면 프레임 줄)가 시작하는 바이트 위치, base_offset은 그 앞의 마지막 체크포인트 줄 위치(없으면 None).
+    체크섬이 틀린 레코드는 건너뛴다."""
+    number = 0
+    base_offset = None
+    with open(path, "rb") as f:
+        for record in read_records(f):
+            if record.kind == REVISION:
+                if record.value.is_valid():
+                    number += 1
+                    yield {"number": number, **record.value.metadata(),
+                           "offset": record.offset, "base_offset": base_offset}
+            elif record.kind == FRAME:
+                for entry in record.value.metadata() or ():
+                    number += 1
+                    yield {"number": number, **entry, "offset": record.offset, "base_offset": base_offset}
+            elif record.kind == CHECKPOINT:
+                if record.value.is_valid():
+                    base_offset = record.offset
@@ -0,0 +1,228 @@
+"""리비전 재생
+
+문서를 읽을 때(Document)와 HTML로 변환할 때(opwiparser.parser) 모두 이 모듈로 내용을 재구성한다.
+
+LineBuffer는 내용을 줄 목록으로 들고 있으면서 리비전의 줄 단위 변경을 그 자리에서 적용한다.
+리비전마다 내용 전체를 나누고 다시 합치지 않으므로, 한 리비전을 적용하는 비용은 문서 크기가 아니라
+바뀐 줄 수(와 줄 목록의 포인터 이동)에 비례한다. 내용 문자열은 필요할 때 한 번만 합친다.
+
+변경 형식은 두 가지이다.
+  - rev_system.diff 형식: {"~3:2": [줄 목록]} (예전 내용의 줄 번호 기준 구간)
+  - 예전 형식: difflib.Differ 출력에서의 위치 {"+<위치>|<길이>": 줄}, {"-<위치>|<길이>": 줄}.
+    위치에는 기록되지 않은 공통 줄("  ")과 힌트 줄("? ")도 세어져 있으므로,
+    지운 줄이 예전 내용과 맞는지 확인하면서 빈 위치가 공통 줄인지 힌트 줄인지 정해 재생한다 (replay_legacy).
+"""
+import difflib
+import itertools
+from rev_system import diff
+from rev_system.reader import CHECKPOINT, DOC, FRAME, META, REVISION
+
+# difflib.Differ가 비슷한 두 줄을 짝지어 "? " 줄을 붙이는 유사도 기준
+LEGACY_PAIR_RATIO = 0.75
+# 예전 형식 리비전의 해석이 여러 개일 때 Differ로 확인해 보는 최대 개수
+LEGACY_CANDIDATES = 16
+
+
+class LineBuffer:
+    """줄 목록으로 들고 있는 문서 내용"""
+    __slots__ = ("lines", "chars", "_text")
+
+    def __init__(self, text: str = ""):
+        self.reset(text)
+
+    def reset(self, text: str):
+        self.lines = diff.split_lines(text)
+        self.chars = len(text) - max(len(self.lines) - 1, 0)  # 줄바꿈을 뺀 글자 수
+        self._text = text
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = diff.join_lines(self.lines)
+        return self._text
+
+    @property
+    def size(self) -> int:
+        """내용을 합치지 않고 구한 내용의 글자 수"""
+        return self.chars + max(len(self.lines) - 1, 0)
+
+    def apply(self, changes: list):
+        """리비전 하나의 변경을 적용. 적용할 수 없으면 내용을 바꾸지 않고 ValueError"""
+        if not diff.is_replayable(changes):
+            self.reset(replay_legacy(self.text, changes))
+            return
+        hunks = []
+        for change in changes:
+            for op, new_lines in change.items():
+                start, count = diff.parse_op(op)
+                hunks.append((start, count, new_lines))
+        # 먼저 범위만 확인해서, 중간에 실패해도 내용이 반쯤 바뀐 채로 남지 않게 한다
+        length = len(self.lines)
+        for start, count, new_lines in reversed(hunks):
+            if start < 0 or count < 0 or start + count > length:
+                raise ValueError(f"change {start}:{count} is outside of {length} lines")
+            length += len(new_lines) - count
+        lines = self.lines
+        for start, count, new_lines in reversed(hunks):
+            self.chars += sum(map(len, new_lines)) - sum(map(len, lines[start:start + count]))
+            lines[start:start + count] = new_lines
+        self._text = None
+
+
+def replay_legacy(text: str, changes: list) -> str:
+    """예전 형식 리비전 하나를 적용한 내용. 위치를 맞출 수 없으면 ValueError"""
+    ops = []
+    for change in changes:
+        if not isinstance(change, dict):
+            raise ValueError(f"unknown change: {change!r}")
+        for op, line in change.items():
+            if not isinstance(line, str) or "|" not in op or op[:1] not in "+-=":
+                raise ValueError(f"unknown change: {op}")
+            ops.append((int(op[1:].split("|", 1)[0]), op[0], line))
+    if any(kind == "=" for _, kind, _ in ops):
+        # 더 예전 형식: 내용 전체를 바꾼다
+        return [line for _, kind, line in ops if kind == "="][-1]
+    ops.sort(key=lambda op: op[0])
+    old = text.splitlines()
+    candidates = _align_legacy(old, ops)
+    lines = next(candidates, None)
+    if lines is None:
+        raise ValueError("legacy change positions do not match the content")
+    second = next(candidates, None)
+    if second is not None:
+        # 해석이 여러 개면 Differ를 다시 돌려 같은 변경이 나오는 것을 고른다 (모두 아니면 첫 해석)
+        for candidate in itertools.chain((lines, second), itertools.islice(candidates, LEGACY_CANDIDATES - 2)):
+            if _legacy_ops(old, candidate) == ops:
+                lines = candidate
+                break
+    # 예전 형식은 splitlines()로 나눈 줄을 기록했으므로, 다시 나눴을 때 같은 줄 목록이 되게 합친다
+    return "\n".join(lines) + ("\n" if lines and lines[-1] == "" else "")
+
+
+def _legacy_ops(old: list, new: list) -> list:
+    """예전 Document.diff_lines가 기록했을 (위치, 종류, 줄) 목록"""
+    return [(position, line[0], line[2:])
+            for position, line in enumerate(difflib.Differ().compare(old, new)) if line[:2] in ("+ ", "- ")]
+
+
+def _hint_lines(old_line: str, new_line: str) -> tuple:
+    """Differ가 두 줄을 짝지었다면 (지운 줄 뒤, 추가한 줄 뒤)에 "? " 줄을 붙였는지"""
+    matcher = difflib.SequenceMatcher(None, old_line, new_line)
+    if matcher.ratio() < LEGACY_PAIR_RATIO:
+        return False, False
+    tags = {tag for tag, *_ in matcher.get_opcodes()}
+    return bool(tags & {"replace", "delete"}), bool(tags & {"replace", "insert"})
+
+
+def _legacy_options(old: list, ops: list, index: int, position: int, previous) -> list:
+    """index번 op 앞의 빈 위치를 해석하는 방법들 [(공통 줄 수, 다음 예전 줄 위치, op 정보, 새 줄)].
+    previous: 앞 op의 (종류, 위치, 줄, 짝지은 지운 줄 또는 None)"""
+    at, kind, line = ops[index]
+    gap = at - (previous[1] + 1 if previous else 0)
+    if gap < 0:
+        return []
+    # 힌트 줄은 짝지은 "- " 바로 뒤(다음이 짝 "+ ")나 짝지은 "+ " 바로 뒤에만 온다
+    hints = (0,)
+    if previous is not None and gap >= 1:
+        if previous[0] == "-" and kind == "+" and gap == 1:
+            hints = (1, 0) if _hint_lines(previous[2], line)[0] else (0, 1)
+        elif previous[0] == "+" and previous[3] is not None:
+            hints = (1, 0) if _hint_lines(previous[3], previous[2])[1] else (0, 1)
+    options = []
+    for hint in hints:
+        commons = gap - hint
+        end = position + commons
+        if kind == "-":
+            if end < len(old) and old[end] == line:
+                options.append((commons, end + 1, (kind, at, line, None), ()))
+        elif end <= len(old):
+            pair = previous[2] if previous and previous[0] == "-" and commons == 0 else None
+            options.append((commons, end, (kind, at, line, pair), (line,)))
+    return options
+
+
+def _align_legacy(old: list, ops: list):
+    """예전 줄 목록과 위치순 op들로 만들 수 있는 새 줄 목록을 그럴듯한 순서로 돌려준다 (모든 지운 줄이 맞는 해석만).
+    해석이 갈리는 곳만 되돌아가며 찾고, 끝까지 가지 못한 상태는 기억해서 다시 시도하지 않는다."""
+    result = []
+    failed = set()
+    # [op 번호, 예전 줄 위치, 앞 op, result 길이, 남은 해석, 끝까지 간 적이 있는지]
+    stack = [[0, 0, None, 0, None, False]]
+    while stack:
+        frame = stack[-1]
+        index, position, previous, length, options, _ = frame
+        del result[length:]
+        if index == len(ops):
+            for entry in stack:
+                entry[5] = True
+            yield result + old[position:]
+            stack.pop()
+            continue
+        if options is None:
+            options = frame[4] = _legacy_options(old, ops, index, position, previous)
+        if not options:
+            if not frame[5]:
+                failed.add((index, position, previous and previous[3] is not None))
+            stack.pop()
+            continue
+        commons, next_position, op, new_lines = options.pop(0)
+        if (index + 1, next_position, op[3] is not None) in failed:
+            continue
+        result.extend(old[position:position + commons])
+        result.extend(new_lines)
+        stack.append([index + 1, next_position, op, len(result), None, False])
+
+
+def replay(records, buffer: LineBuffer):
+    """reader 레코드를 차례로 buffer에 적용하며 (종류, 값)을 돌려준다.
+      (DOC, 문서 ID), (META, dict), (CHECKPOINT, (리비전 번호, 내용)), (REVISION, 리비전 dict)
+    체크포인트를 만나면 buffer를 그 내용으로 바꾸고, 리비전은 적용한 뒤에 돌려주므로
+    받는 쪽이 반복을 멈추면 buffer는 그 리비전까지 적용된 상태로 남는다.
+    체크섬이 틀리거나 깨진 리비전과 프레임은 경고만 출력하고 건너뛴다."""
+    doc_id = None
+    for record in records:
+        if record.kind == DOC:
+            doc_id = record.value
+            yield DOC, doc_id
+        elif record.kind == META:
+            yield META, record.value
+        elif record.kind == CHECKPOINT:
+            text = record.value.content()
+            if text is not None:
+                buffer.reset(text)
+                yield CHECKPOINT, (record.value.number, text)
+        elif record.kind == REVISION:
+            if not record.value.is_valid():
+                print(f"Warning: CHANGES checksum mismatch in {doc_id}, skipping revision")
+                continue
+            changes = record.value.changes()
+            if changes is None:
+                print(f"Warning: Invalid CHANGES JSON format in {doc_id}")
+                continue
+            if not isinstance(changes, list) or not changes:
+                continue
+            yield REVISION, _applied(buffer, {**record.value.metadata(), "doc_id": doc_id, "changes": changes})
+        elif record.kind == FRAME:
+            revisions = record.value.revisions(buffer.text)
+            if revisions is None:
+                print(f"Warning: corrupted revision frame in {doc_id}, skipping")
+                continue
+            for revision in revisions:
+                revision["doc_id"] = doc_id
+                yield REVISION, _applied(buffer, revision)
+
+
+def _applied(buffer: LineBuffer, revision: dict) -> dict:
+    try:
+        buffer.apply(revision["changes"])
+    except ValueError as e:
+        print(f"Warning: cannot replay revision in {revision['doc_id']}: {e}")
+    return revision
+
+
+def replay_content(records) -> str:
+    """레코드를 모두 적용한 내용"""
+    buffer = LineBuffer()
+    for _ in replay(records, buffer):
+        pass
+    return buffer.text
@@ -0,0 +1,130 @@
+import os
+import sqlite3
+import threading
+
+# 이력 한 페이지에 보여줄 수 있는 최대 리비전 수
+MAX_HISTORY_PAGE = 200
+
+
+class RevisionIndex:
+    """문서별 리비전 메타데이터 색인 (SQLite에 저장)
+
+    revisions(doc_id, number)에 리비전마다 파일 안의 위치(offset), 다시 적용을 시작할 체크포인트 위치(base_offset),
+    사용자, 시각, 내용 크기와 크기 변화를 둔다. 이력 페이지는 이 표만 번호 순으로 잘라 읽으므로
+    리비전이 아무리 많아도 한 페이지를 만드는 비용이 같고, 변경 내용(CHANGES)은 읽지 않는다.
+    sources에는 색인을 만들 때의 파일 상태(mtime, 크기)를 두어, 다른 곳에서 파일이 바뀌었으면 다시 만들게 한다."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS revisions (
+                doc_id TEXT NOT NULL,
+                number INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                base_offset INTEGER,
+                username TEXT NOT NULL,
+                ip_address TEXT NOT NULL,
+                timestamp TEXT,
+                size INTEGER,
+                size_delta INTEGER,
+                PRIMARY KEY (doc_id, number)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS sources (
+                doc_id TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                checkpoint_offset INTEGER
+            );
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def _revision(row: tuple) -> dict:
+        return {
+            "number": row[0],
+            "offset": row[1],
+            "base_offset": row[2],
+            "username": row[3],
+            "ip_address": row[4],
+            "timestamp": row[5],
+            "size": row[6],
+            "size_delta": row[7],
+        }
+
+    def is_current(self, doc_id: str, stat: os.stat_result) -> bool:
+        """색인이 이 파일 상태에 맞게 만들어졌는지 확인"""
+        with self.lock:
+            row = self.conn.execute("SELECT mtime_ns, size FROM sources WHERE doc_id = ?", (doc_id,)).fetchone()
+        return row is not None and row == (stat.st_mtime_ns, stat.st_size)
+
+    def replace(self, doc_id: str, revisions, stat: os.stat_result, checkpoint_offset: int = None):
+        """문서 하나의 색인을 통째로 교체. revisions: reader.iter_revision_metadata 항목에 "size"를 더한 것,
+        checkpoint_offset: 파일의 마지막 체크포인트 줄 위치 (다음에 덧붙일 리비전의 base_offset)"""
+        rows = []
+        previous_size = 0
+        for revision in revisions:
+            size = revision.get("size")
+            delta = size - previous_size if size is not None and previous_size is not None else None
+            previous_size = size
+            rows.append((doc_id, revision["number"], revision["offset"], revision["base_offset"],
+                         revision["username"], revision["ip_address"], revision.get("timestamp"), size, delta))
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM revisions WHERE doc_id = ?", (doc_id,))
+            self.conn.executemany("INSERT INTO revisions (doc_id, number, offset, base_offset, username, ip_address, "
+                                  "timestamp, size, size_delta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.conn.execute("INSERT OR REPLACE INTO sources (doc_id, mtime_ns, size, checkpoint_offset) "
+                              "VALUES (?, ?, ?, ?)", (doc_id, stat.st_mtime_ns, stat.st_size, checkpoint_offset))
+
+    def append(self, doc_id: str, number: int, revision: dict, offset: int, size: int,
+               previous_stat: os.stat_result, stat: os.stat_result, checkpoint_offset: int = None) -> bool:
+        """덧붙인 리비전 하나를 색인에 추가. 덧붙이기 전 파일 상태(previous_stat)가 색인과 맞을 때만 추가하고,
+        맞지 않으면(다른 곳에서 바뀐 파일) 아무것도 하지 않고 False (다음에 읽을 때 다시 만든다).
+        checkpoint_offset: 이 리비전 뒤에 체크포인트를 함께 적었으면 그 위치"""
+        with self.lock, self.conn:
+            source = self.conn.execute("SELECT mtime_ns, size, checkpoint_offset FROM sources WHERE doc_id = ?",
+                                       (doc_id,)).fetchone()
+            if source is None or source[:2] != (previous_stat.st_mtime_ns, previous_stat.st_size):
+                return False
+            row = self.conn.execute("SELECT size FROM revisions WHERE doc_id = ? AND number = ?",
+                                    (doc_id, number - 1)).fetchone()
+            previous_size = row[0] if row else 0
+            delta = size - previous_size if previous_size is not None else None
+            self.conn.execute("INSERT OR REPLACE INTO revisions (doc_id, number, offset, base_offset, username, "
+                              "ip_address, timestamp, size, size_delta) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (doc_id, number, offset, source[2], revision["username"], revision["ip_address"],
+                               revision.get("timestamp"), size, delta))
+            self.conn.execute("UPDATE sources SET mtime_ns = ?, size = ?, checkpoint_offset = ? WHERE doc_id = ?",
+                              (stat.st_mtime_ns, stat.st_size,
+                               source[2] if checkpoint_offset is None else checkpoint_offset, doc_id))
+        return True
+
+    def page(self, doc_id: str, before: int = None, limit: int = 50) -> list:
+        """최신 리비전부터 limit개. before가 있으면 그 번호보다 앞선 리비전만 (커서)"""
+        limit = max(1, min(limit, MAX_HISTORY_PAGE))
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT number, offset, base_offset, username, ip_address, timestamp, size, size_delta "
+                "FROM revisions WHERE doc_id = ? AND number < ? ORDER BY number DESC LIMIT ?",
+                (doc_id, before if before is not None else 2 ** 62, limit)).fetchall()
+        return [self._revision(row) for row in rows]
+
+    def get(self, doc_id: str, number: int):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT number, offset, base_offset, username, ip_address, timestamp, size, size_delta "
+                "FROM revisions WHERE doc_id = ? AND number = ?", (doc_id, number)).fetchone()
+        return self._revision(row) if row else None
+
+    def remove(self, doc_id: str):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM revisions WHERE doc_id = ?", (doc_id,))
+            self.conn.execute("DELETE FROM sources WHERE doc_id = ?", (doc_id,))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,349 @@
+import heapq
+import html
+import math
+import os
+import re
+import sqlite3
+import threading
+from rev_system import metrics
+
+WORD_PATTERN = re.compile(r"[^\W_]+")
+HANGUL_PATTERN = re.compile(r"([가-힣]+)")
+# 제목에서 나온 단어는 본문보다 이만큼 더 무겁게 센다
+TITLE_WEIGHT = 5.0
+# BM25 매개변수
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_PER_PAGE = 100
+# 색인하는 글이나 표의 형식이 바뀌면 올린다. 다르면 색인을 지우고 처음부터 다시 만든다
+INDEX_VERSION = 3
+# 단어별 문서 목록을 가중치 순으로 한 번에 읽는 줄 수
+FETCH_ROWS = 64
+# 제목 부분 문자열로 찾는 결과의 최대 수
+MAX_TITLE_MATCHES = 1000
+
+# 화면에 보이지 않는 문법. 위키 문법은 opwiparser.tokenizer와 같은 규칙이다
+REDIRECT_PATTERN = re.compile(r"\[\[redirect:.+?\]\]")
+WIKI_LINK_PATTERN = re.compile(r"\[\[(.+?)\]\]")
+TEMPLATE_PATTERN = re.compile(r"\{template:.+?\}")
+MARKDOWN_LINK_PATTERN = re.compile(r"!?\[([^\]\n]*)\]\([^)\n]*\)")
+REFERENCE_PATTERN = re.compile(r"^ {0,3}\[[^\]\n]+\]:.*$", re.MULTILINE)
+TAG_PATTERN = re.compile(r"<[^<>\n]+>")
+
+
+def tokenize(text: str) -> list:
+    """검색어/문서를 색인 단위로 분리.
+    한글은 띄어쓰기와 조사 때문에 단어 단위가 잘 맞지 않으므로 두 글자씩(bigram) 자르고,
+    그 밖의 문자는 단어 단위로 자른다."""
+    tokens = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        for i, part in enumerate(HANGUL_PATTERN.split(word)):
+            if not part:
+                continue
+            if i % 2 == 0:
+                tokens.append(part)
+            elif len(part) == 1:
+                tokens.append(part)
+            else:
+                tokens.extend(part[j:j + 2] for j in range(len(part) - 1))
+    return tokens
+
+
+def plain_text(content: str) -> str:
+    """문서 원본에서 렌더링된 화면에 보이는 글만 남긴다.
+    [[링크]]는 링크 글자(대상)로, Markdown 링크와 그림은 글자로 바꾸고, 넘겨주기, 틀, 참조 정의, HTML 태그는 뺀다.
+    #, * 같은 Markdown 기호는 tokenize()가 어차피 버린다."""
+    text = REDIRECT_PATTERN.sub(" ", content)
+    text = WIKI_LINK_PATTERN.sub(r" \1 ", text)
+    text = TEMPLATE_PATTERN.sub(" ", text)
+    text = MARKDOWN_LINK_PATTERN.sub(r" \1 ", text)
+    text = REFERENCE_PATTERN.sub(" ", text)
+    text = TAG_PATTERN.sub(" ", text)
+    return html.unescape(text)
+
+
+def syllables(text: str) -> list:
+    """두 글자 이상인 한글 낱말의 음절. 한 글자 검색어가 낱말 중간의 글자와도 맞도록 따로 색인한다
+    (한 글자 낱말은 tokenize()가 이미 그 글자를 돌려준다)"""
+    return [syllable for run in HANGUL_PATTERN.findall(text.lower()) if len(run) > 1 for syllable in run]
+
+
+def title_grams(title: str) -> set:
+    """제목의 위치마다 세 글자(끝에서는 더 짧은) 조각. 부분 문자열은 어느 조각의 접두어이거나 조각들로 덮인다"""
+    title = title.lower()
+    return {title[i:i + 3] for i in range(len(title))}
+
+
+class _Descending(str):
+    """힙에서 점수가 같으면 문서 ID가 큰 쪽을 먼저 내보내도록 순서를 뒤집은 문자열"""
+
+    def __lt__(self, other):
+        return str.__gt__(self, other)
+
+
+def count_terms(tokens: list) -> dict:
+    counts = {}
+    for token in tokens:
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+class SearchIndex:
+    """문서 현재 내용에 대한 역색인 (SQLite에 저장)
+
+    postings(term, doc_id, impact) 에 단어별 문서 목록을 두고 (term, impact) 순 색인으로 점수가 큰 문서부터 읽는다.
+    문서 하나를 지울 때는 docs.terms (공백으로 이은 단어 목록)로 그 문서의 postings를 기본 키로 찾는다.
+    impact는 BM25의 단어 빈도 부분(문서 길이 보정 포함)으로, 문서를 색인할 때의 평균 문서 길이로 미리 계산해 둔다.
+    검색 점수는 단어마다 idf * impact의 합이며, 상위 결과가 확정되는 곳에서 멈추므로 (_top 참고)
+    흔한 단어라도 전체 문서 수와 상관없이 빠르다.
+    title_grams(gram, doc_id) 는 제목 부분 문자열 검색용 세 글자 조각 색인이다."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            # 예전 형식으로 만든 색인은 지운다. DocumentManager.sync_search_index가 모든 문서를 다시 색인한다
+            self.conn.executescript("""
+                DROP TABLE IF EXISTS docs;
+                DROP TABLE IF EXISTS postings;
+                DROP TABLE IF EXISTS terms;
+                DROP TABLE IF EXISTS stats;
+                DROP TABLE IF EXISTS title_grams;
+            """)
+            self.conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc_id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                length REAL NOT NULL,
+                source_mtime_ns INTEGER NOT NULL DEFAULT 0,
+                terms TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                impact REAL NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_impact ON postings (term, impact DESC);
+            CREATE TABLE IF NOT EXISTS terms (
+                term TEXT PRIMARY KEY,
+                df INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS stats (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS title_grams (
+                gram TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                PRIMARY KEY (gram, doc_id)
+            ) WITHOUT ROWID;
+        """)
+        self.conn.commit()
+
+    def indexed_mtimes(self) -> dict:
+        """색인된 문서 ID -> 색인 당시 원본 파일 mtime"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT doc_id, source_mtime_ns FROM docs"))
+
+    def update(self, doc_id: str, title: str, content: str, source_mtime_ns: int = 0):
+        """문서 하나를 (다시) 색인. 해당 문서의 단어 목록만 바꾼다.
+        content는 문서 원본이며, 화면에 보이는 글(plain_text)만 색인한다."""
+        text = plain_text(content)
+        weights = {term: float(tf) for term, tf in count_terms(tokenize(text)).items()}
+        for term, tf in count_terms(tokenize(title)).items():
+            weights[term] = weights.get(term, 0.0) + tf * TITLE_WEIGHT
+        # 문서 길이는 음절을 빼고 센다 (음절은 한 글자 검색에만 쓴다)
+        length = sum(weights.values())
+        for term, tf in count_terms(syllables(text)).items():
+            weights[term] = weights.get(term, 0.0) + tf
+        for term, tf in count_terms(syllables(title)).items():
+            weights[term] = weights.get(term, 0.0) + tf * TITLE_WEIGHT
+
+        with self.lock, self.conn:
+            self._remove(doc_id)
+            stats = dict(self.conn.execute("SELECT key, value FROM stats"))
+            avg_length = (stats.get("total_length", 0) + length) / (stats.get("doc_count", 0) + 1) or 1.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            self.conn.execute("INSERT INTO docs (doc_id, title, length, source_mtime_ns, terms) VALUES (?, ?, ?, ?, ?)",
+                              (doc_id, title, length, source_mtime_ns, " ".join(weights)))
+            self.conn.executemany("INSERT INTO postings (term, doc_id, impact) VALUES (?, ?, ?)",
+                                  ((term, doc_id, weight * (BM25_K1 + 1) / (weight + norm))
+                                   for term, weight in weights.items()))
+            self.conn.executemany("INSERT INTO terms (term, df) VALUES (?, 1) "
+                                  "ON CONFLICT (term) DO UPDATE SET df = df + 1",
+                                  ((term,) for term in weights))
+            self.conn.executemany("INSERT INTO title_grams (gram, doc_id) VALUES (?, ?)",
+                                  ((gram, doc_id) for gram in title_grams(title)))
+            self._add_stats(1, length)
+
+    def remove(self, doc_id: str):
+        with self.lock, self.conn:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        row = self.conn.execute("SELECT length, title, terms FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return
+        terms = row[2].split()
+        self.conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", ((term,) for term in terms))
+        self.conn.executemany("DELETE FROM terms WHERE term = ? AND df <= 0", ((term,) for term in terms))
+        self.conn.executemany("DELETE FROM postings WHERE term = ? AND doc_id = ?", ((term, doc_id) for term in terms))
+        self.conn.executemany("DELETE FROM title_grams WHERE gram = ? AND doc_id = ?",
+                              ((gram, doc_id) for gram in title_grams(row[1])))
+        self.conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+        self._add_stats(-1, -row[0])
+
+    def _add_stats(self, doc_count: int, length: float):
+        self.conn.executemany("INSERT INTO stats (key, value) VALUES (?, ?) "
+                              "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value",
+                              (("doc_count", doc_count), ("total_length", length)))
+
+    def _impact(self, term: str, doc_id: str):
+        row = self.conn.execute("SELECT impact FROM postings WHERE term = ? AND doc_id = ?", (term, doc_id)).fetchone()
+        return row[0] if row else None
+
+    def _top(self, terms: list, k: int):
+        """검색어의 모든 단어를 포함하는 문서 중 점수 상위 k개.
+        (점수순 [(문서 ID, 점수)], 전체 결과 수, 전체 결과 수가 정확한지)를 반환
+
+        threshold algorithm: 단어마다 impact가 큰 문서부터 번갈아 읽고, 처음 본 문서는 나머지 단어의 impact를
+        기본 키로 찾아 점수를 매긴다. 단어별로 지금 읽는 자리의 idf * impact (아직 읽지 않은 문서가 그 단어로
+        받을 수 있는 점수의 상한)를 더한 값이 k번째 점수 이하가 되면 멈춘다.
+        멈추면 전체 결과 수는 단어가 하나일 때는 정확하고, 여럿이면 단어별 문서 수로 어림한다."""
+        doc_count = self.conn.execute("SELECT value FROM stats WHERE key = 'doc_count'").fetchone()
+        doc_count = doc_count[0] if doc_count else 0
+        if doc_count <= 0 or not terms:
+            return [], 0, True
+        frequencies = []
+        for term in terms:
+            row = self.conn.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+            if row is None:
+                return [], 0, True
+            frequencies.append(row[0])
+        idfs = [math.log(1 + (doc_count - df + 0.5) / (df + 0.5)) for df in frequencies]
+        # 단어 하나의 impact는 k1 + 1을 넘지 않는다
+        bounds = [idf * (BM25_K1 + 1) for idf in idfs]
+        cursors = [self.conn.execute("SELECT doc_id, impact FROM postings WHERE term = ? ORDER BY impact DESC",
+                                     (term,)) for term in terms]
+
+        heap = []  # (점수, _Descending(문서 ID)) 가장 낮은 것이 맨 앞
+        seen = set()
+        matched = 0
+        exhausted = False
+        while not exhausted:
+            for position, cursor in enumerate(cursors):
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    # 이 단어의 목록을 다 읽었다. 모든 결과는 이 목록에 있으므로 이미 다 보았다
+                    exhausted = True
+                    break
+                for doc_id, impact in rows:
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    score = 0.0
+                    for other, (term, idf) in enumerate(zip(terms, idfs)):
+                        term_impact = impact if other == position else self._impact(term, doc_id)
+                        if term_impact is None:
+                            break
+                        score += idf * term_impact
+                    else:
+                        matched += 1
+                        entry = (score, _Descending(doc_id))
+                        if len(heap) < k:
+                            heapq.heappush(heap, entry)
+                        elif heap[0] < entry:
+                            heapq.heapreplace(heap, entry)
+                bounds[position] = idfs[position] * rows[-1][1]
+            if not exhausted and len(heap) >= k and heap[0][0] >= sum(bounds):
+                break
+
+        ranked = sorted(((str(doc_id), score) for score, doc_id in heap), key=lambda x: (-x[1], x[0]))
+        if exhausted:
+            return ranked, matched, True
+        if len(terms) == 1:
+            return ranked, frequencies[0], True
+        estimate = doc_count
+        for df in frequencies:
+            estimate *= df / doc_count
+        return ranked, int(max(matched, min(estimate, min(frequencies)))), False
+
+    def _title_matches(self, query: str, terms: list) -> list:
+        """제목에 query가 그대로 들어 있지만 terms를 모두 포함하지는 않는 문서 ID (최대 MAX_TITLE_MATCHES개, ID 순).
+        세 글자 조각 색인에서 query의 가장 드문 조각(짧은 검색어는 그 글자로 시작하는 조각)으로 후보를 찾고 제목과 대조한다."""
+        if len(query) >= 3:
+            grams = sorted({query[i:i + 3] for i in range(len(query) - 2)})
+            counts = []
+            for gram in grams:
+                row = self.conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM title_grams WHERE gram = ? LIMIT ?)",
+                                        (gram, MAX_TITLE_MATCHES * 4)).fetchone()
+                counts.append((row[0], gram))
+            where, params = "gram = ?", (min(counts)[1],)
+        else:
+            where, params = "gram >= ? AND gram < ?", (query, query + chr(0x10FFFF))
+        if terms:
+            # 단어를 모두 포함하는 문서는 단어 검색 결과에 이미 있다
+            where += " AND NOT (" + " AND ".join(
+                "EXISTS (SELECT 1 FROM postings WHERE term = ? AND postings.doc_id = title_grams.doc_id)"
+                for _ in terms) + ")"
+            params += tuple(terms)
+        rows = self.conn.execute(f"SELECT title_grams.doc_id, title FROM title_grams "
+                                 f"JOIN docs ON docs.doc_id = title_grams.doc_id WHERE {where}", params)
+        matches = set()
+        for doc_id, title in rows:
+            if query in title.lower():
+                matches.add(doc_id)
+                if len(matches) >= MAX_TITLE_MATCHES:
+                    break
+        return sorted(matches)
+
+    @metrics.timed("search")
+    def search(self, query: str, page: int = 1, per_page: int = 20):
+        """검색어의 모든 단어를 포함하는 문서를 BM25 점수순으로 반환하고,
+        단어 단위로는 찾지 못하지만 제목에 검색어가 그대로 들어 있는 문서(예: "wiki"로 "OpenWiki")를 그 뒤에 붙인다.
+        (전체 결과 수, 해당 페이지의 결과 목록)
+        해당 페이지까지의 상위 결과만 구하므로 (_top) 흔한 단어라도 문서 수에 비례해 느려지지 않는다.
+        단어가 여럿인 검색어의 전체 결과 수는 어림값일 수 있지만, 다음 페이지가 있으면 항상 현재 페이지 끝보다 크다."""
+        lowered = query.strip().lower()
+        if not lowered:
+            return 0, []
+        terms = list(dict.fromkeys(tokenize(query)))
+        page = max(1, page)
+        per_page = max(1, min(per_page, MAX_PER_PAGE))
+        # 다음 페이지가 있는지 알 수 있도록 한 건 더 구한다
+        needed = page * per_page + 1
+
+        with self.lock:
+            ranked, total, exact = self._top(terms, needed)
+            if exact:
+                # 단어 검색 결과를 모두 구했을 때만 그 뒤에 제목 부분 문자열 결과가 온다
+                titled = self._title_matches(lowered, terms)
+                ranked += [(doc_id, 0.0) for doc_id in titled]
+                total += len(titled)
+            page_ids = ranked[(page - 1) * per_page:page * per_page]
+            titles = {}
+            for doc_id, _ in page_ids:
+                row = self.conn.execute("SELECT title FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+                titles[doc_id] = row[0] if row else doc_id
+
+        results = []
+        for doc_id, score in page_ids:
+            title = titles[doc_id]
+            results.append({
+                "id": doc_id,
+                "title": title,
+                "path": doc_id,
+                "match_type": "title" if lowered in title.lower() else "content",
+                "relevance": round(score, 4),
+            })
+        return total, results
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,303 @@
+import json
+import os
+import tempfile
+import zlib
+from urllib.parse import unquote
+from rev_system import codec, metrics
+
+# 파일 끝에서 마지막 리비전을 찾을 때 처음 읽어보는 크기
+TAIL_PROBE = 64 * 1024
+
+
+# REVUSER 줄의 사용자 이름과 IP에서 구분자(:)와 줄바꿈을 %XX로 적는다 (IPv6 주소 "::1" 등)
+FIELD_ESCAPES = str.maketrans({"%": "%25", ":": "%3A", "\n": "%0A", "\r": "%0D"})
+
+
+def escape_field(value) -> str:
+    return str(value).translate(FIELD_ESCAPES)
+
+
+def unescape_field(value: str) -> str:
+    return unquote(value) if "%" in value else value
+
+
+def changes_crc(payload: str) -> str:
+    return f"{zlib.crc32(payload.encode('utf-8')):08x}"
+
+
+def encode_revision(revision: dict) -> list:
+    """리비전 하나를 OPWI 레코드(줄 목록)로 변환.
+    REVBLOCK:END 뒤에 CHANGES의 CRC32를 붙여, 중간에 끊기거나 깨진 레코드를 찾아낼 수 있게 한다."""
+    payload = json.dumps(revision["changes"], ensure_ascii=False)
+    lines = [f"REVUSER:{escape_field(revision['username'])}:{escape_field(revision['ip_address'])}"]
+    if revision.get("timestamp"):
+        lines.append(f"REVTIME:{revision['timestamp']}")
+    lines.extend([
+        "REVBLOCK:START",
+        f"CHANGES:{payload}",
+        f"REVBLOCK:END:{changes_crc(payload)}",
+    ])
+    return lines
+
+
+def verify_block(payload: str, end_line: str) -> bool:
+    """REVBLOCK:END 줄의 CRC가 내용과 맞는지 확인. CRC가 없는 예전 형식은 그대로 통과"""
+    crc = end_line[len("REVBLOCK:END"):].lstrip(":")
+    return not crc or crc == changes_crc(payload)
+
+
+def encode_checkpoint(revision_number: int, content: str, compress: bool = False) -> str:
+    """revision_number 번째 리비전까지 적용한 전체 내용을 담은 체크포인트 줄.
+    compress면 내용을 JSON 문자열 대신 zlib 압축("z"로 시작)으로 적는다."""
+    payload = codec.compress_payload(content) if compress else json.dumps(content, ensure_ascii=False)
+    return f"CHECKPOINT:{revision_number}:{changes_crc(payload)}:{payload}"
+
+
+def decode_checkpoint(line: str):
+    """체크포인트 줄을 (리비전 번호, 내용)으로 변환. 형식이나 체크섬이 틀리면 None"""
+    try:
+        revision_number, crc, payload = line[len("CHECKPOINT:"):].split(":", 2)
+        if crc != changes_crc(payload):
+            return None
+        if payload.startswith("z"):
+            return int(revision_number), codec.decompress_payload(payload)
+        return int(revision_number), json.loads(payload)
+    except (ValueError, zlib.error):
+        return None
+
+
+def checkpoint_is_valid(line: str) -> bool:
+    """내용을 풀지 않고 체크포인트 줄의 체크섬만 확인"""
+    try:
+        revision_number, crc, payload = line[len("CHECKPOINT:"):].split(":", 2)
+        return revision_number.isdigit() and crc == changes_crc(payload)
+    except ValueError:
+        return False
+
+
+def fsync_directory(path: str):
+    """rename 결과가 디스크에 남도록 디렉터리도 fsync (지원하지 않는 OS는 건너뜀)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@metrics.timed("storage_write")
+def write_durable(path: str, data, sync: bool = True):
+    """임시 파일에 쓰고 fsync 한 뒤 rename 하여 문서 파일 전체를 교체 (data는 str 또는 bytes).
+    sync가 False면 fsync 없이 rename만 한다: 읽는 쪽이 반쯤 쓰인 파일을 보지 않으면 되는, 다시 만들 수 있는 파일용"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if sync:
+        fsync_directory(directory)
+
+
+def _tail_is_clean(tail: bytes) -> bool:
+    """tail이 완전한 리비전 레코드나 프레임(과 그 뒤의 체크포인트)으로 끝나는지 확인"""
+    lines = tail.decode("utf-8", errors="replace").rstrip("\n").split("\n")
+    if lines[-1].startswith("CHECKPOINT:"):
+        if decode_checkpoint(lines[-1]) is None:
+            return False
+        lines.pop()
+        if not lines:
+            return False
+    if lines[-1].startswith("FRAME:"):
+        return len(lines) == 1 and codec.verify_frame(lines[-1])
+    if not lines[-1].startswith("REVBLOCK:END"):
+        return False
+    payload = []
+    for line in lines[1:-1]:
+        payload.append(line[len("CHANGES:"):] if line.startswith("CHANGES:") else line)
+    return verify_block("".join(payload), lines[-1])
+
+
+def _last_valid_offset(f) -> int:
+    """파일을 처음부터 읽어 마지막으로 온전한 레코드가 끝나는 위치를 찾는다"""
+    f.seek(0)
+    offset = 0
+    valid_end = 0
+    in_block = False
+    payload = []
+    for raw in f:
+        offset += len(raw)
+        line = raw.decode("utf-8", errors="replace").strip()
+        if line.startswith("REVBLOCK:START"):
+            in_block = True
+            payload = []
+        elif line.startswith("REVBLOCK:END"):
+            if in_block and verify_block("".join(payload), line):
+                valid_end = offset
+            in_block = False
+        elif in_block:
+            payload.append(line[len("CHANGES:"):] if line.startswith("CHANGES:") else line)
+        elif line.startswith("FRAME:"):
+            if offset - len(raw) == valid_end and codec.verify_frame(line):
+                valid_end = offset
+        elif line.startswith("CHECKPOINT:"):
+            if offset - len(raw) == valid_end and decode_checkpoint(line) is not None:
+                valid_end = offset
+        elif offset - len(raw) == valid_end and (line.startswith("DOC:") or line.startswith("META:")):
+            valid_end = offset
+    return valid_end
+
+
+def recover_tail(path: str) -> int:
+    """프로세스가 리비전을 덧붙이다 죽어서 남은 불완전한 꼬리를 잘라낸다. 잘라낸 바이트 수를 반환.
+    보통은 파일 끝부분만 읽고 끝나며, 꼬리가 깨진 경우에만 파일 전체를 훑는다."""
+    with open(path, "r+b") as f:
+        size = f.seek(0, os.SEEK_END)
+        probe = TAIL_PROBE
+        while True:
+            start = max(0, size - probe)
+            f.seek(start)
+            tail = f.read()
+            # 내용 속 줄바꿈은 JSON에서 \n 으로 이스케이프되므로 줄 맨 앞의 표식만 찾으면 된다
+            block_start = max(tail.rfind(b"\nREVBLOCK:START"), tail.rfind(b"\nFRAME:"))
+            if block_start != -1 or start == 0:
+                break
+            probe *= 4
+
+        if block_start == -1:
+            return 0  # 리비전이 없는 파일 (헤더만 있음)
+        if _tail_is_clean(tail[block_start + 1:]):
+            return 0
+
+        valid_end = _last_valid_offset(f)
+        f.truncate(valid_end)
+        f.flush()
+        os.fsync(f.fileno())
+        return size - valid_end
+
+
+@metrics.timed("storage_write")
+def append_revision(path: str, revision: dict, checkpoint: tuple = None, compress: bool = False):
+    """리비전 레코드(와 체크포인트)를 파일 끝에 덧붙이고 fsync. 기존 이력은 다시 쓰지 않는다.
+    checkpoint: (리비전 번호, 그 리비전까지 적용한 전체 내용), compress: 체크포인트 내용을 압축
+    (리비전 레코드의 바이트 위치, 체크포인트 줄의 바이트 위치 또는 None)을 반환"""
+    truncated = recover_tail(path)
+    if truncated:
+        print(f"Warning: dropped {truncated} bytes of incomplete revision data in {path}")
+
+    lines = [line.encode("utf-8") for line in encode_revision(revision)]
+    checkpoint_line = encode_checkpoint(*checkpoint, compress=compress).encode("utf-8") if checkpoint else None
+    with open(path, "r+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b""
+        if end > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                data = b"\n"
+            f.seek(0, os.SEEK_END)
+        offset = end + len(data)
+        data += b"\n".join(lines) + b"\n"
+        checkpoint_offset = None
+        if checkpoint_line is not None:
+            checkpoint_offset = end + len(data)
+            data += checkpoint_line + b"\n"
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset, checkpoint_offset
+
+
+def _last_checkpoint(f):
+    """파일 끝에서부터 TAIL_PROBE 크기의 조각씩 거슬러 올라가며 온전한 마지막 체크포인트 줄의 바이트 위치를 찾는다.
+    없으면 None. 메모리에는 조각 하나와 확인하는 체크포인트 줄만 둔다."""
+    marker = b"\nCHECKPOINT:"
+    end = f.seek(0, os.SEEK_END)
+    # 조각 경계에 걸친 표식도 찾도록 앞 조각의 첫 부분을 이어 붙여 찾는다
+    overlap = b""
+    while end > 0:
+        start = max(0, end - TAIL_PROBE)
+        f.seek(start)
+        chunk = f.read(end - start) + overlap
+        position = chunk.rfind(marker)
+        while position != -1:
+            f.seek(start + position + 1)
+            line = f.readline().decode("utf-8", errors="replace").strip()
+            if checkpoint_is_valid(line):
+                return start + position + 1
+            position = chunk.rfind(marker, 0, position)
+        overlap = chunk[:len(marker) - 1]
+        end = start
+    return None
+
+
+def last_checkpoint_offset(path: str):
+    """마지막 체크포인트 줄의 바이트 위치. 체크포인트가 없으면 None"""
+    with open(path, "rb") as f:
+        return _last_checkpoint(f)
+
+
+def read_until_revision(path: str, revision_number: int, start_offset: int = None):
+    """revision_number 번째 리비전을 재구성하는 데 필요한 줄만 모은다.
+    헤더 + (그 리비전 이하의 마지막 체크포인트부터 해당 리비전 끝까지). 그 뒤는 읽지 않는다.
+    start_offset이 그 체크포인트 줄의 바이트 위치(리비전 색인의 base_offset)이면 헤더만 읽고 바로 그 위치로 건너뛴다."""
+    header = []
+    segment = []
+    count = 0
+    with open(path, "rb") as f:
+        if start_offset:
+            for raw in f:
+                line = raw.decode("utf-8", errors="replace").strip()
+                if not (line.startswith("DOC:") or line.startswith("META:")):
+                    break
+                header.append(line)
+            f.seek(start_offset)
+            line = f.readline().decode("utf-8", errors="replace").strip()
+            checkpoint = decode_checkpoint(line) if line.startswith("CHECKPOINT:") else None
+            if checkpoint is not None and checkpoint[0] <= revision_number:
+                segment = [line]
+                count = checkpoint[0]
+            else:
+                # 색인이 가리키는 위치가 맞지 않으면 처음부터 읽는다
+                header = []
+                f.seek(0)
+        for raw in f:
+            line = raw.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            if count >= revision_number:
+                # 바로 뒤에 그 리비전의 체크포인트가 있으면 함께 쓴다 (다시 적용할 수 없는 예전 형식 대비)
+                if (count == revision_number and line.startswith(f"CHECKPOINT:{count}:")
+                        and decode_checkpoint(line) is not None):
+                    segment = [line]
+                break
+            if line.startswith("DOC:") or line.startswith("META:"):
+                header.append(line)
+            elif line.startswith("CHECKPOINT:"):
+                if line[len("CHECKPOINT:"):].split(":", 1)[0] == str(count) and decode_checkpoint(line) is not None:
+                    segment = [line]
+            elif line.startswith("FRAME:"):
+                # 프레임은 통째로 넘기고, 필요한 리비전까지만 적용하는 것은 Document.from_lines(limit)가 한다
+                segment.append(line)
+                frame = codec.frame_header(line)
+                if frame:
+                    count += frame[1]
+            else:
+                segment.append(line)
+                if line.startswith("REVBLOCK:END"):
+                    count += 1
+    return header + segment
@@ -3,4 +3,94 @@ function search() {
     if (query) {
         window.location.href = '/search?query=' + encodeURIComponent(query);
     }
-} 
\ No newline at end of file
+}
+
+// 검색창에 입력하는 동안 /api/autocomplete 에서 문서 제목을 제안
+(function () {
+    const input = document.getElementById('search-input');
+    if (!input) {
+        return;
+    }
+    const list = document.createElement('ul');
+    list.className = 'search-suggestions';
+    list.hidden = true;
+    input.setAttribute('autocomplete', 'off');
+    input.parentNode.style.position = 'relative';
+    input.parentNode.appendChild(list);
+
+    let timer = null;
+    let latest = 0;
+    let selected = -1;
+
+    function show(items) {
+        list.innerHTML = '';
+        selected = -1;
+        items.forEach(function (item) {
+            const entry = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = '/doc/' + item.id.split('/').map(encodeURIComponent).join('/');
+            link.textContent = item.title;
+            if (item.id !== item.title) {
+                const path = document.createElement('span');
+                path.className = 'suggestion-path';
+                path.textContent = item.id;
+                link.appendChild(path);
+            }
+            entry.appendChild(link);
+            list.appendChild(entry);
+        });
+        list.hidden = items.length === 0;
+    }
+
+    function highlight(index) {
+        const entries = list.querySelectorAll('li');
+        if (entries.length === 0) {
+            return;
+        }
+        selected = (index + entries.length) % entries.length;
+        entries.forEach(function (entry, i) {
+            entry.classList.toggle('selected', i === selected);
+        });
+    }
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const query = input.value.trim();
+        if (!query) {
+            show([]);
+            return;
+        }
+        // 빠르게 입력하는 동안에는 요청을 보내지 않고, 늦게 도착한 예전 응답은 버린다
+        timer = setTimeout(function () {
+            const request = ++latest;
+            fetch('/api/autocomplete?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (items) {
+                    if (request === latest) {
+                        show(items);
+                    }
+                })
+                .catch(function () { show([]); });
+        }, 80);
+    });
+
+    input.addEventListener('keydown', function (event) {
+        if (list.hidden) {
+            return;
+        }
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            highlight(selected + (event.key === 'ArrowDown' ? 1 : -1));
+        } else if (event.key === 'Enter' && selected >= 0) {
+            event.preventDefault();
+            window.location.href = list.querySelectorAll('li a')[selected].href;
+        } else if (event.key === 'Escape') {
+            show([]);
+        }
+    });
+
+    input.addEventListener('blur', function () {
+        // 제안을 누를 시간을 준다
+        setTimeout(function () { list.hidden = true; }, 150);
+    });
+})();
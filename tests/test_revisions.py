@@ -0,0 +1,253 @@
+"""리비전 저장 검사: 동시 편집, diff 왕복, 리비전 재생
+
+사용법: python -m pytest tests
+속도 측정은 benchmarks/ 에 있다.
+"""
+import difflib
+import multiprocessing
+import os
+import random
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system import diff, reader, replay, storage
+from rev_system.document import Document, DocumentManager, EditConflict
+
+
+# 동시 편집: 여러 프로세스/스레드가 같은 문서를 고쳐도 리비전이 사라지지 않아야 한다
+
+def editor(base_path: str, worker: int, threads: int, edits: int, documents: int, optimistic: bool, results):
+    """스레드마다 edits번 편집하고 문서별 성공한 편집 수를 results에 넣는다.
+    optimistic이면 편집을 시작할 때의 리비전 수(base_revision)를 넘기고, 충돌하면 다시 읽어 재시도한다."""
+    manager = DocumentManager(base_path)
+    counts = {}
+    lock = threading.Lock()
+
+    def run(thread: int):
+        for edit in range(edits):
+            doc_id = f"doc{(worker + thread + edit) % documents}"
+            content = f"worker {worker} thread {thread} edit {edit}"
+            while True:
+                base_revision = None
+                if optimistic:
+                    manager.refresh_index()
+                    base_revision = manager.get_document(doc_id, history=False).revision_count
+                try:
+                    manager.update_document(doc_id, content, f"w{worker}t{thread}", "127.0.0.1", base_revision)
+                    break
+                except EditConflict:
+                    pass
+            with lock:
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+
+    workers = [threading.Thread(target=run, args=(thread,)) for thread in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    results.put(counts)
+
+
+@pytest.mark.parametrize("optimistic", [False, True])
+def test_concurrent_edits_keep_every_revision(tmp_path, optimistic):
+    base_path = str(tmp_path)
+    processes, threads, edits, documents = 3, 3, 8, 3
+    manager = DocumentManager(base_path)
+    for number in range(documents):
+        manager.create_document(f"doc{number}", "initial", "setup", "127.0.0.1")
+
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=editor, args=(base_path, worker, threads, edits, documents,
+                                                            optimistic, results))
+               for worker in range(processes)]
+    for process in workers:
+        process.start()
+    expected = {f"doc{number}": 1 for number in range(documents)}
+    for _ in workers:
+        for doc_id, count in results.get(timeout=120).items():
+            expected[doc_id] += count
+    for process in workers:
+        process.join()
+        assert process.exitcode == 0
+
+    assert sum(expected.values()) - documents == processes * threads * edits
+    manager = DocumentManager(base_path)
+    for doc_id, count in expected.items():
+        doc = Document.load(os.path.join(manager.pages_path, f"{doc_id}.opwi"))
+        assert doc.revision_count == count
+        assert manager.index["documents"][doc_id]["revision_count"] == count
+
+
+# diff 왕복: apply(예전, diff(예전, 새)) == 새
+
+def random_text(rng: random.Random) -> str:
+    # 빈 줄, 같은 줄 반복, \r, 마지막 줄바꿈 유무처럼 틀리기 쉬운 경우가 자주 나오도록 작은 줄 집합을 쓴다
+    pool = ["", "a", "b", "a b", "같은 줄", "끝\r", " ", "-----"]
+    lines = [rng.choice(pool) for _ in range(rng.choice([0, 1, 2, 5, 20, 200]))]
+    text = "\n".join(lines)
+    if rng.random() < 0.3:
+        text += "\n"
+    return text
+
+
+def mutate(text: str, rng: random.Random) -> str:
+    lines = text.split("\n")
+    for _ in range(rng.randint(0, 10)):
+        position = rng.randrange(len(lines) + 1)
+        action = rng.random()
+        if action < 0.3:
+            lines.insert(position, rng.choice(["", "a", "새 줄", "a b"]))
+        elif action < 0.6 and position < len(lines):
+            del lines[position]
+        elif position < len(lines):
+            lines[position] += "!"
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_diff_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(2000):
+        old_text = random_text(rng)
+        new_text = mutate(old_text, rng) if rng.random() < 0.7 else random_text(rng)
+        changes = diff.diff(old_text, new_text)
+        assert diff.is_replayable(changes)
+        assert diff.apply(old_text, changes) == new_text, (old_text, new_text, changes)
+        if old_text == new_text:
+            assert changes == []
+
+
+@pytest.mark.parametrize("username, ip_address",
+                         [("이름:콜론", "::1"), ("100%", "2001:db8::7"), ("줄\n바꿈", "127.0.0.1")])
+def test_revision_author_round_trip(username, ip_address):
+    """REVUSER 줄의 구분자(:), "%", 줄바꿈이 든 사용자 이름과 IPv6 주소도 다시 읽으면 그대로 나와야 한다"""
+    doc = Document("author")
+    doc.add_content("a", "user0", "127.0.0.1")
+    doc.update_content("a\nb", username, ip_address)
+    doc.update_content("b", "user0", "127.0.0.1")
+    loaded = Document.from_opwi(doc.to_opwi())
+    assert [(revision["username"], revision["ip_address"]) for revision in loaded.revisions] == \
+        [("user0", "127.0.0.1"), (username, ip_address), ("user0", "127.0.0.1")]
+    assert loaded.content == "b"
+
+
+# 리비전 재생(rev_system.replay): 무작위 편집 이력을 저장한 뒤 다시 읽어 모든 리비전의 내용이 맞는지 확인
+
+POOL = ["", "a", "b", "a b", "같은 줄", "끝\r", " ", "-----", "# 제목", "* 목록 항목", "[[링크]]"]
+# REVUSER 줄의 구분자(:)나 줄바꿈, "%"가 들어간 사용자 이름과 IPv6 주소
+USERS = ["user0", "이름:콜론", "100%", "줄\n바꿈"]
+ADDRESSES = ["127.0.0.1", "::1", "2001:db8::7"]
+
+
+def random_lines(rng: random.Random) -> list:
+    return [rng.choice(POOL) for _ in range(rng.choice([0, 1, 3, 10, 40]))]
+
+
+def edit(lines: list, rng: random.Random) -> list:
+    lines = list(lines)
+    for _ in range(rng.randint(1, 6)):
+        position = rng.randrange(len(lines) + 1)
+        action = rng.random()
+        if action < 0.35:
+            lines[position:position] = [rng.choice(POOL) for _ in range(rng.randint(1, 3))]
+        elif action < 0.6:
+            del lines[position:position + rng.randint(1, 3)]
+        elif position < len(lines):
+            lines[position] += rng.choice(["!", " 수정", "x"])
+    return lines
+
+
+def random_history(rng: random.Random, length: int) -> list:
+    # 빈 내용으로 만든 첫 리비전은 변경이 없어 기록되지 않으므로 첫 내용은 비우지 않는다
+    texts = ["\n".join(random_lines(rng)) or "a"]
+    lines = texts[0].split("\n") if texts[0] else []
+    while len(texts) < length:
+        action = rng.random()
+        if action < 0.05:
+            lines = random_lines(rng)  # 내용을 통째로 바꿈
+        elif action < 0.1 and len(texts) > 1:
+            lines = texts[-2].split("\n") if texts[-2] else []  # 되돌리기
+        else:
+            lines = edit(lines, rng)
+        text = "\n".join(lines) + ("\n" if rng.random() < 0.1 else "")
+        if text != texts[-1]:
+            texts.append(text)
+    return texts
+
+
+def legacy_diff_lines(old_text: str, new_text: str) -> list:
+    """예전 Document.diff_lines 그대로 (difflib.Differ 출력에서의 위치)"""
+    changes = []
+    for i, line in enumerate(difflib.Differ().compare(old_text.splitlines(), new_text.splitlines())):
+        if line.startswith("+ "):
+            changes.append({f"+{i}|{len(line[2:])}": line[2:]})
+        elif line.startswith("- "):
+            changes.append({f"-{i}|{len(line[2:])}": line[2:]})
+    return changes
+
+
+@pytest.mark.parametrize("codec_name", [None, "zlib"])
+@pytest.mark.parametrize("seed", range(3))
+def test_replay_history(tmp_path, seed, codec_name):
+    """전체 읽기, 현재 내용만 읽기, 리비전별 읽기, HTML 변환용 재생, 리비전별 크기가 모두 원래 이력과 같아야 한다"""
+    rng = random.Random(seed)
+    path = str(tmp_path / "replay.opwi")
+    for _ in range(60):
+        texts = random_history(rng, rng.choice([1, 2, 5, 20, 60]))
+        authors = [(USERS[number % len(USERS)], ADDRESSES[number % len(ADDRESSES)]) for number in range(len(texts))]
+        doc = Document("replay")
+        doc.add_content(texts[0], *authors[0])
+        for number, text in enumerate(texts[1:], start=2):
+            doc.update_content(text, *authors[number - 1])
+            # 체크포인트 간격을 짧게 해서 체크포인트/프레임 경계를 자주 지나게 한다
+            if number % rng.choice([3, 7, 50]) == 0:
+                doc.add_checkpoint()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(doc.to_opwi(codec_name))
+
+        loaded = Document.load(path)
+        assert loaded.content == texts[-1]
+        assert loaded.revision_count == len(texts)
+        assert [(revision["username"], revision["ip_address"]) for revision in loaded.revisions] == authors
+        assert Document.load(path, history=False).content == texts[-1]
+        with open(path, "rb") as f:
+            assert replay.replay_content(reader.tail_records(f)) == texts[-1]
+        assert loaded.content_sizes() == [len(text) for text in texts]
+        for number in rng.sample(range(1, len(texts) + 1), min(5, len(texts))):
+            assert Document.load_revision(path, number) == texts[number - 1]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_replay_legacy_history(seed):
+    """예전 형식(difflib.Differ 위치) 리비전을 하나씩 재생한다.
+    예전 형식은 공통 줄과 "? " 줄을 기록하지 않아 같은 변경 기록이 나오는 내용이 여럿일 수 있으므로,
+    재생한 내용은 적어도 Differ로 다시 비교했을 때 기록과 같은 변경이 나와야 한다.
+    모두 똑같이 나오는 이력은 파일 형식으로 적어 Document로 읽은 결과도 확인한다."""
+    rng = random.Random(seed)
+    for _ in range(100):
+        texts = random_history(rng, rng.choice([1, 2, 5, 20, 60]))
+        revisions = exact = 0
+        for old, new in zip(texts, texts[1:]):
+            changes = legacy_diff_lines(old, new)
+            if not changes:
+                continue
+            revisions += 1
+            replayed = replay.replay_legacy(old, changes)
+            assert legacy_diff_lines(old, replayed) == changes, (old, new, replayed)
+            exact += replayed.splitlines() == new.splitlines()
+        if exact != revisions:
+            continue
+        lines = ["DOC:legacy", 'META:{"title": "legacy"}']
+        history = [[{f"+0|0|{len(texts[0])}": texts[0]}]]
+        history.extend(legacy_diff_lines(old, new) for old, new in zip(texts, texts[1:]))
+        for changes in history:
+            if changes:
+                lines.extend(storage.encode_revision({"username": "user", "ip_address": "127.0.0.1",
+                                                      "changes": changes}))
+        doc = Document.from_lines(lines)
+        assert doc.content.splitlines() == texts[-1].splitlines()
+        assert doc.revision_count == revisions + 1
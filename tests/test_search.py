@@ -0,0 +1,68 @@
+"""전문 검색 색인 검사: 상위 k개만 구하는 검색(SearchIndex._top)이 모든 결과를 점수 매긴 순서와 같은지 확인
+
+사용법: python -m pytest tests
+속도 측정은 benchmarks/bench_search.py 에 있다.
+"""
+import math
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rev_system.search_index import SearchIndex, tokenize
+
+WORDS = ["위키", "문서", "편집", "리비전", "wiki", "page", "edit", "python", "검색", "링크"]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    rng = random.Random(3)
+    index = SearchIndex(str(tmp_path_factory.mktemp("search") / "search.db"))
+    for number in range(600):
+        vocabulary = WORDS[:rng.randint(3, len(WORDS))]
+        content = " ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 200)))
+        index.update(f"doc{number}", f"{rng.choice(WORDS)} {rng.choice(WORDS)}{number}", content)
+    index.update("OpenWiki", "OpenWiki", "도움말")
+    yield index
+    index.close()
+
+
+def ranked_by_brute_force(index: SearchIndex, terms: list) -> list:
+    """검색어의 모든 단어를 포함하는 문서를 모두 점수 매겨 정렬한 문서 ID 목록"""
+    doc_count = dict(index.conn.execute("SELECT key, value FROM stats"))["doc_count"]
+    postings = [dict(index.conn.execute("SELECT doc_id, impact FROM postings WHERE term = ?", (term,)))
+                for term in terms]
+    scores = {}
+    for doc_id in set(postings[0]).intersection(*postings[1:]):
+        scores[doc_id] = sum(math.log(1 + (doc_count - len(impacts) + 0.5) / (len(impacts) + 0.5)) * impacts[doc_id]
+                             for impacts in postings)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda x: (-x[1], x[0]))]
+
+
+@pytest.mark.parametrize("query", ["wiki", "위키", "page edit", "위", "문서 편집 wiki", "python", "리비전"])
+def test_top_results_match_full_ranking(index, query):
+    expected = ranked_by_brute_force(index, list(dict.fromkeys(tokenize(query))))
+    for page in (1, 2, 7):
+        total, results = index.search(query, page=page, per_page=10)
+        assert [result["id"] for result in results if result["relevance"] > 0] == \
+            expected[(page - 1) * 10:page * 10]
+        if len(expected) > page * 10:
+            assert total > page * 10
+
+
+def test_title_substring_follows_word_results(index):
+    total, results = index.search("enwik")
+    assert total == 1 and results[0]["id"] == "OpenWiki" and results[0]["match_type"] == "title"
+    # "wiki"라는 단어가 없는 OpenWiki는 단어 검색 결과가 모두 끝난 뒤에 온다
+    total, _ = index.search("wiki", per_page=100)
+    results = []
+    for page in range(1, (total + 99) // 100 + 1):
+        results += index.search("wiki", page=page, per_page=100)[1]
+    assert len(results) == total
+    relevances = [result["relevance"] for result in results]
+    assert relevances == sorted(relevances, reverse=True)
+    assert "OpenWiki" in [result["id"] for result in results if result["relevance"] == 0.0]
+    assert index.search("없는말") == (0, [])